@@ -0,0 +1,193 @@
+import argparse
+import gc
+import io
+import json
+import platform
+import sys
+import time
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from datetime import datetime
+from statistics import median
+from typing import Any, Callable, Dict, List
+
+from stock_stats.client import StockClient
+from stock_stats.command_line import print_json
+from stock_stats.streaming import decode_dataset
+
+from .synthetic import generate_dataset, symbol_names
+
+
+def _time(function: Callable[[], Any], repeat: int) -> List[float]:
+    """
+    :return: Seconds taken by each of `repeat` calls
+    """
+    timings = []
+    # As timeit does, keep collection pauses out of the numbers
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - started)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return timings
+
+
+def _encode(dataset: Dict[str, Any], columns: List[str] = None) -> bytes:
+    """
+    :param columns: Leave out all but the date and these columns, as the
+        server does when asked for a single column
+    :return: The response body the data.json endpoint would send
+    """
+    if columns is not None:
+        headers = dataset['column_names']
+        indexes = [0] + [headers.index(name) for name in columns]
+        dataset = {
+            'column_names': [headers[i] for i in indexes],
+            'data': [[row[i] for i in indexes] for row in dataset['data']],
+        }
+    return json.dumps({'dataset_data': dataset}).encode('utf-8')
+
+
+def _print_quietly(data: Any) -> None:
+    with redirect_stdout(io.StringIO()):
+        print_json(data)
+
+
+def run(symbols: int, years: int, repeat: int, seed: int = 0) \
+        -> Dict[str, Any]:
+    """
+    Times each step of an analysis over synthetic data for `symbols` symbols
+    with `years` years of history each.
+
+    :return: JSON-able results, including the settings and environment
+    """
+    client = StockClient(None, "KEY")
+    names = symbol_names(symbols)
+    datasets = [generate_dataset(name, years, seed=seed) for name in names]
+    # Bodies are decoded as they would be off the network
+    bodies = [_encode(d) for d in datasets]
+    volumes = [_encode(d, [client.COL_VOLUME]) for d in datasets]
+    series = [decode_dataset(io.BytesIO(b), client.COL_DATE) for b in bodies]
+    rows = sum(len(s) for s in series)
+    report = {name: client.get_report(s, False)
+              for name, s in zip(names, series)}
+
+    benchmarks = OrderedDict([
+        ('decode_dataset',
+         lambda: [decode_dataset(io.BytesIO(b), client.COL_DATE)
+                  for b in bodies]),
+        ('decode_one_column',
+         lambda: [decode_dataset(io.BytesIO(b), client.COL_DATE,
+                                 columns=[client.COL_VOLUME])
+                  for b in volumes]),
+        ('group_by_month',
+         lambda: [client._group_by_month(s) for s in series]),
+        ('get_monthly_averages',
+         lambda: [client.get_monthly_averages(s, False) for s in series]),
+        ('get_top_variance_day',
+         lambda: [client.get_top_variance_day(s, False) for s in series]),
+        ('get_busy_days',
+         lambda: [client.get_busy_days(s, False) for s in series]),
+        ('get_losing_day_count',
+         lambda: [client.get_losing_day_count(s, False) for s in series]),
+        ('print_json', lambda: _print_quietly(report)),
+    ])  # type: Dict[str, Callable[[], Any]]
+
+    results = OrderedDict()
+    for name, function in benchmarks.items():
+        timings = _time(function, repeat)
+        best = min(timings)
+        results[name] = {
+            'best':            best,
+            'median':          median(timings),
+            'rows_per_second': rows / best if best else None,
+        }
+
+    return {
+        'created':     datetime.now().isoformat(timespec='seconds'),
+        'config':      {'symbols': symbols, 'years': years, 'repeat': repeat,
+                        'seed': seed, 'rows': rows},
+        'environment': {'python': platform.python_version(),
+                        'implementation': platform.python_implementation(),
+                        'machine': platform.machine(),
+                        'system': platform.system()},
+        'benchmarks':  results,
+    }
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any],
+            tolerance: float) -> List[str]:
+    """
+    Prints how the best time of each benchmark changed on STDERR.
+
+    :param tolerance: Ratio of new to old time beyond which a benchmark
+        counts as having regressed
+    :return: Names of the benchmarks that regressed
+    """
+    if current['config'] != previous['config']:
+        print("Warning: comparing runs with different settings",
+              file=sys.stderr)
+    regressed = []
+    for name, result in current['benchmarks'].items():
+        before = previous['benchmarks'].get(name)
+        if before is None or not before['best']:
+            continue
+        ratio = result['best'] / before['best']
+        flag = ''
+        if ratio > tolerance:
+            regressed.append(name)
+            flag = '  REGRESSED'
+        print("%-22s %10.3fms -> %10.3fms  x%.2f%s"
+              % (name, before['best'] * 1000, result['best'] * 1000, ratio,
+                 flag), file=sys.stderr)
+    return regressed
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Times the analysis steps over synthetic market data.")
+    parser.add_argument('--symbols', type=int, default=20,
+                        help="Number of symbols. Default: %(default)s")
+    parser.add_argument('--years', type=int, default=10,
+                        help="Years of history per symbol. "
+                             "Default: %(default)s")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Timed runs per benchmark, of which the best "
+                             "counts. Default: %(default)s")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Varies the synthetic data. Default: %(default)s")
+    parser.add_argument('--output', metavar='FILE',
+                        help="Save results as JSON, rather than printing them")
+    parser.add_argument('--compare', metavar='FILE',
+                        help="Results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=1.2,
+                        help="With --compare, fail if any benchmark takes "
+                             "this many times as long as before. "
+                             "Default: %(default)s")
+    return parser
+
+
+def main(args: Any) -> int:
+    results = run(args.symbols, args.years, args.repeat, args.seed)
+    out = json.dumps(results, indent=4, separators=(',', ': '))
+    if args.output:
+        with open(args.output, 'wt', encoding='utf-8') as fh:
+            fh.write(out + '\n')
+    else:
+        print(out)
+
+    if args.compare:
+        with open(args.compare, 'rt', encoding='utf-8') as fh:
+            previous = json.load(fh)
+        if compare(results, previous, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(create_parser().parse_args()))
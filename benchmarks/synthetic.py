@@ -0,0 +1,76 @@
+import random
+import zlib
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+COLUMN_NAMES = [
+    'Date', 'Open', 'High', 'Low', 'Close', 'Volume', 'Ex-Dividend',
+    'Split Ratio', 'Adj. Open', 'Adj. High', 'Adj. Low', 'Adj. Close',
+    'Adj. Volume',
+]
+
+DEFAULT_END = date(2017, 12, 29)
+
+
+def symbol_names(count: int) -> List[str]:
+    """
+    :return: Made-up ticker symbols, AAAA, AAAB and so on
+    """
+    names = []
+    for i in range(count):
+        letters = []
+        for _ in range(4):
+            i, letter = divmod(i, 26)
+            letters.append(chr(ord('A') + letter))
+        names.append(''.join(reversed(letters)))
+    return names
+
+
+def generate_dataset(symbol: str, years: int, end: date = DEFAULT_END,
+                     seed: int = 0) -> Dict[str, Any]:
+    """
+    Makes up a plausible `dataset_data` payload, as the data.json endpoint
+    would return it: weekdays only, newest first, with a random walk for the
+    prices. The same arguments always give the same payload.
+
+    :param years: How many years of history, ending at `end`
+    """
+    rng = random.Random(seed * 1000003 + zlib.crc32(symbol.encode('ascii')))
+    try:
+        anniversary = end.replace(year=end.year - years)
+    except ValueError:
+        # There's no 29th of February that year
+        anniversary = end.replace(year=end.year - years, day=28)
+    start = anniversary + timedelta(days=1)
+
+    rows = []
+    price = rng.uniform(10.0, 500.0)
+    volume = rng.uniform(1e5, 1e7)
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            open_ = round(price, 2)
+            close = round(max(0.01, price * rng.gauss(1.0, 0.02)), 2)
+            high = round(max(open_, close) * (1 + abs(rng.gauss(0, 0.01))), 4)
+            low = round(min(open_, close) * (1 - abs(rng.gauss(0, 0.01))), 4)
+            shares = float(int(volume * rng.lognormvariate(0, 0.3)))
+            # Adjusted values as if there had been a 2:1 split since
+            rows.append([day.isoformat(), open_, high, low, close, shares,
+                         0.0, 1.0, open_ / 2, high / 2, low / 2, close / 2,
+                         shares * 2])
+            price = close
+        day += timedelta(days=1)
+    rows.reverse()
+
+    return {
+        'column_names': list(COLUMN_NAMES),
+        'data':         rows,
+        'start_date':   start.isoformat(),
+        'end_date':     end.isoformat(),
+        'frequency':    'daily',
+        'order':        None,
+        'limit':        None,
+        'collapse':     None,
+        'transform':    None,
+        'column_index': None,
+    }
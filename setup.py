@@ -25,6 +25,4 @@ setup(
         'console_scripts': ['stock_stats=stock_stats.command_line:shell_entry'],
     },
     python_requires='>3.6.0',
-    # Tooling warns that dateutil is necessary, but I'm not sure if it's
-    # available through setuptools or not...
 )
@@ -0,0 +1,173 @@
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from .client import StockClient, StockException
+from .queries import Query, QueryError
+
+
+def read_jobs(text: str) -> List[Any]:
+    """
+    :param text: A JSON array of jobs, or newline-delimited JSON with a job
+        per line
+    :return: The jobs, each of which should be an object like those Query
+        parses, plus an "action" naming the analysis
+    :raises ValueError: If the text isn't JSON of either kind
+    """
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class FetchPlan(object):
+    """
+    The date ranges a set of queries need per symbol, merged so that each
+    day of each symbol is fetched once, however many queries use it.
+
+    Ranges that overlap or touch are fetched as one. Ranges with a gap
+    between them stay apart, rather than fetching the days nobody asked for.
+    """
+
+    def __init__(self):
+        # In order of first use
+        self._ranges = OrderedDict()  # type: Dict[str, List[List[date]]]
+
+    def add(self, symbol: str, start: date, end: date) -> None:
+        self._ranges.setdefault(symbol, []).append([start, end])
+
+    def fetches(self) -> Iterator[Tuple[str, date, date]]:
+        """
+        :return: (symbol, start, end) of each fetch to make, with the
+            symbols in order of first use
+        """
+        for symbol, ranges in self._ranges.items():
+            merged = []  # type: List[List[date]]
+            for start, end in sorted(ranges):
+                if merged and start <= merged[-1][1] + timedelta(days=1):
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            for start, end in merged:
+                yield symbol, start, end
+
+
+class _PlannedClient(object):
+    """
+    Stands in for a StockClient while a batch runs, answering requests for
+    timeseries from the planned fetches, and passing everything else on.
+    """
+
+    def __init__(self, client: StockClient):
+        self._client = client
+        # Futures of the series of the fetches made and still of use, by
+        # symbol, then start and end
+        self.fetched = {}  # type: Dict[str, Dict[Tuple[date, date], Any]]
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def get_standard_timeseries(self, symbol: str, start: date, end: date,
+                                columns: Sequence[str] = None):
+        # Every column was fetched, so there is no need to pick any out
+        for (fetch_start, fetch_end), series in \
+                self.fetched.get(symbol, {}).items():
+            if fetch_start <= start and end <= fetch_end:
+                return series.result().between(start, end)
+        return self._client.get_standard_timeseries(symbol, start, end,
+                                                    columns)
+
+
+def run_batch(client: StockClient, jobs: List[Any], workers: int = 1) \
+        -> Iterator[Dict[str, Any]]:
+    """
+    Runs many queries, fetching each symbol's days only once between them.
+
+    Every fetch is planned up-front, and made by up to `workers` threads in
+    plan order. Only a few more fetches than there are workers are made
+    ahead of the queries, so that long batches don't hold every series at
+    once. Each query then takes its part of the shared series, and a series
+    is let go once the last query using it is done.
+
+    :param jobs: As from read_jobs()
+    :return: For each job in order, {"result": ...} with what its
+        sub-command would print, or {"error": ...} saying why it failed
+    """
+    # Each job's Query, or the exception saying why it can't run
+    queries = []  # type: List[Any]
+    symbols = []  # type: List[List[str]]
+    plan = FetchPlan()
+    for job in jobs:
+        try:
+            if not isinstance(job, dict):
+                raise QueryError("Expected a JSON object")
+            query = Query.parse(job.get('action'), job)
+            needed = query.planned_symbols(client)
+        except (QueryError, StockException) as e:
+            query, needed = e, []
+        for symbol in needed:
+            plan.add(symbol, query.start_date, query.end_date)
+        queries.append(query)
+        symbols.append(needed)
+
+    fetches = list(plan.fetches())
+    by_symbol = {}  # type: Dict[str, List[int]]
+    for position, (symbol, _, _) in enumerate(fetches):
+        by_symbol.setdefault(symbol, []).append(position)
+
+    # Which fetches each query reads, and which query reads each one last
+    reads = []  # type: List[List[int]]
+    done = {}  # type: Dict[int, List[int]]
+    last_use = {}  # type: Dict[int, int]
+    for index, (query, needed) in enumerate(zip(queries, symbols)):
+        reads.append([position for symbol in needed
+                      for position in by_symbol[symbol]
+                      if fetches[position][1] <= query.start_date and
+                      query.end_date <= fetches[position][2]])
+        for position in reads[-1]:
+            last_use[position] = index
+    for position, index in last_use.items():
+        done.setdefault(index, []).append(position)
+
+    planned = _PlannedClient(client)
+    window = 2 * max(1, workers)
+    submitted = released = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        try:
+            for index, query in enumerate(queries):
+                # Keep the workers busy, and always make what this query
+                # reads, however far ahead of the window that is
+                needed_upto = max(reads[index], default=-1) + 1
+                while submitted < len(fetches) and (
+                        submitted - released < window or
+                        submitted < needed_upto):
+                    symbol, start, end = fetches[submitted]
+                    planned.fetched.setdefault(symbol, OrderedDict())[
+                        start, end] = executor.submit(
+                            client.get_standard_timeseries, symbol, start,
+                            end)
+                    submitted += 1
+
+                if isinstance(query, Exception):
+                    yield {'error': str(query)}
+                    continue
+                try:
+                    entry = {'result': query.run(planned)}
+                except StockException as e:
+                    entry = {'error': str(e)}
+                except Exception as e:
+                    # Whatever went wrong with one job, such as a bug or a
+                    # locked cache file, the others still get their results
+                    entry = {'error': "Internal error: %s" % (e,)}
+                finally:
+                    for position in done.get(index, []):
+                        symbol, start, end = fetches[position]
+                        del planned.fetched[symbol][start, end]
+                        released += 1
+                yield entry
+        finally:
+            # Don't wait for fetches nobody will read, should we stop early
+            for pending in planned.fetched.values():
+                for series in pending.values():
+                    series.cancel()
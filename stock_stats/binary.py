@@ -0,0 +1,255 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from .store import LocalStore, StoreException
+from .timeseries import Timeseries
+
+# Epoch-day of each record is stored as an int32, followed by 4 bytes of
+# padding so that the float64 columns after it are 8-byte aligned.
+RECORD = struct.Struct('<i4x12d')
+RECORD_SIZE = RECORD.size
+DOUBLES_PER_RECORD = RECORD_SIZE // 8
+INTS_PER_RECORD = RECORD_SIZE // 4
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+_COLUMN_INDEX = {name: i for i, name in enumerate(LocalStore.VALUE_COLUMNS)}
+
+# Memoryview casts use the machine's byte order, and our files are
+# little-endian.
+_NATIVE_LAYOUT = sys.byteorder == 'little'
+
+
+def _epoch_days(mapped: mmap.mmap, count: int):
+    """
+    :return: Epoch-day of each of the first `count` records, oldest first
+    """
+    days = memoryview(mapped)[:count * RECORD_SIZE].cast('i')
+    days = days[::INTS_PER_RECORD]
+    if not _NATIVE_LAYOUT:
+        days = array('i', days)
+        days.byteswap()
+    return days
+
+
+class MappedTimeseries(object):
+    """
+    Read-only timeseries backed by a memory-mapped binary price file.
+
+    Value columns are strided views straight into the mapped file, so
+    nothing is copied or decoded until a value is actually used. Rows are
+    presented newest-first, like the API and Timeseries, even though the file
+    itself is sorted oldest-first.
+    """
+
+    def __init__(self, mapped: Optional[mmap.mmap], first: int, last: int):
+        """
+        :param mapped: The whole mapped file, or None for an empty series
+        :param first: Index of the oldest record to include
+        :param last: Index after the newest record to include
+        """
+        self.date_column = 'Date'
+        self._mapped = mapped
+        self._first = first
+        self._last = last
+        self._ordinals = None  # type: Optional[array]
+        self._columns = {}  # type: Dict[str, object]
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(BinaryPriceStore.VALUE_COLUMNS)
+
+    @property
+    def columns(self) -> Dict[str, object]:
+        return {name: self.column(name) for name in self.column_names}
+
+    def __len__(self) -> int:
+        return self._last - self._first
+
+    def _strided(self, fmt: str, per_record: int, offset: int):
+        if self._mapped is None or self._first == self._last:
+            return memoryview(array(fmt))
+        view = memoryview(self._mapped)[:self._last * RECORD_SIZE].cast(fmt)
+        start = self._first * per_record + offset
+        stop = self._last * per_record
+        return view[start:stop:per_record][::-1]
+
+    def column(self, name: str):
+        """
+        :param name: Column name, such as "Open"
+        :return: All values of that column, newest first
+        :raises KeyError: If there is no such column
+        """
+        found = self._columns.get(name)
+        if found is None:
+            index = _COLUMN_INDEX[name]
+            found = self._strided('d', DOUBLES_PER_RECORD, 1 + index)
+            if not _NATIVE_LAYOUT:
+                found = array('d', found)
+                found.byteswap()
+            self._columns[name] = found
+        return found
+
+    @property
+    def ordinals(self) -> array:
+        """
+        Dates as from date.toordinal(), newest first. Unlike the value
+        columns this is a (small, integer) copy, since the file holds epoch
+        days.
+        """
+        if self._ordinals is None:
+            days = array('i', self._strided('i', INTS_PER_RECORD, 0))
+            if not _NATIVE_LAYOUT:
+                days.byteswap()
+            self._ordinals = array('l', [d + EPOCH_ORDINAL for d in days])
+        return self._ordinals
+
+    def date(self, index: int) -> date:
+        return date.fromordinal(self.ordinals[index])
+
+    def between(self, start: date, end: date) -> 'MappedTimeseries':
+        """
+        :return: The rows dated within the inclusive range, mapping the same
+            file. If that is every row, the series itself.
+        """
+        if self._mapped is None:
+            return self
+        days = _epoch_days(self._mapped, self._last)
+        first = max(self._first,
+                    bisect_left(days, start.toordinal() - EPOCH_ORDINAL))
+        last = min(self._last,
+                   bisect_right(days, end.toordinal() - EPOCH_ORDINAL))
+        if (first, last) == (self._first, self._last):
+            return self
+        return MappedTimeseries(self._mapped, first, max(first, last))
+
+
+class BinaryPriceStore(object):
+    """
+    Directory of fixed-width binary price files, one per symbol, each sorted
+    oldest-first. Every record is an int32 epoch-day followed by float64
+    values for the standard WIKI columns.
+
+    Files are memory-mapped when read, and a date window is located by binary
+    search over the date column, so opening even a decades-long series costs
+    next to nothing.
+    """
+    VALUE_COLUMNS = LocalStore.VALUE_COLUMNS
+    SUFFIX = '.bin'
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def path(self, symbol: str) -> str:
+        if not symbol or os.sep in symbol or symbol.startswith('.'):
+            raise StoreException("Invalid symbol %r" % symbol)
+        return os.path.join(self.directory, symbol + self.SUFFIX)
+
+    def _records(self, series: Timeseries, after: int = None) -> List[bytes]:
+        try:
+            columns = [series.column(name) for name in self.VALUE_COLUMNS]
+        except KeyError as e:
+            raise StoreException("Series lacks column %s" % e) from e
+        order = sorted(range(len(series)), key=series.ordinals.__getitem__)
+        records = []
+        for i in order:
+            day = series.ordinals[i] - EPOCH_ORDINAL
+            if after is not None and day <= after:
+                continue
+            records.append(RECORD.pack(day, *[c[i] for c in columns]))
+        return records
+
+    def write(self, symbol: str, series: Timeseries) -> int:
+        """
+        Replaces the file for a symbol with the rows of a series.
+
+        :return: Number of records written
+        """
+        path = self.path(symbol)
+        records = self._records(series)
+        temp_path = '%s.%d.tmp' % (path, os.getpid())
+        with open(temp_path, 'wb') as fh:
+            fh.writelines(records)
+        os.replace(temp_path, path)
+        return len(records)
+
+    def append(self, symbol: str, series: Timeseries) -> Tuple[int, int]:
+        """
+        Adds the rows of a series that are newer than anything already held.
+
+        :return: Number of records and of bytes added
+        """
+        path = self.path(symbol)
+        last = self.last_day(symbol)
+        records = self._records(series, after=last)
+        with open(path, 'ab') as fh:
+            # Drop any partial record left by an interrupted append first
+            size = fh.tell()
+            if size % RECORD_SIZE:
+                fh.truncate(size - size % RECORD_SIZE)
+            fh.writelines(records)
+        return len(records), len(records) * RECORD_SIZE
+
+    def last_day(self, symbol: str) -> Optional[int]:
+        """
+        :return: Epoch-day of the newest record, or None if there are none
+        """
+        try:
+            with open(self.path(symbol), 'rb') as fh:
+                size = fh.seek(0, os.SEEK_END)
+                count = size // RECORD_SIZE
+                if count == 0:
+                    return None
+                fh.seek((count - 1) * RECORD_SIZE)
+                return RECORD.unpack(fh.read(RECORD_SIZE))[0]
+        except FileNotFoundError:
+            return None
+
+    def symbols(self) -> List[str]:
+        return sorted(name[:-len(self.SUFFIX)]
+                      for name in os.listdir(self.directory)
+                      if name.endswith(self.SUFFIX))
+
+    def get_timeseries(self, symbol: str, start: date, end: date) \
+            -> MappedTimeseries:
+        """
+        :return: Rows for the symbol within the inclusive range, newest first
+        :raises StoreException: If there is no file for the symbol
+        """
+        path = self.path(symbol)
+        try:
+            with open(path, 'rb') as fh:
+                size = os.fstat(fh.fileno()).st_size
+                if size < RECORD_SIZE:
+                    return MappedTimeseries(None, 0, 0)
+                # The mapping stays valid after the file is closed
+                mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError as e:
+            raise StoreException("No local data for symbol %s" % symbol) \
+                from e
+
+        # A trailing partial record, say from an interrupted append, is ignored
+        days = _epoch_days(mapped, size // RECORD_SIZE)
+        first = bisect_left(days, start.toordinal() - EPOCH_ORDINAL)
+        last = bisect_right(days, end.toordinal() - EPOCH_ORDINAL)
+        return MappedTimeseries(mapped, first, last)
+
+    def export(self, store: LocalStore) -> int:
+        """
+        Writes a binary file for every symbol in a local price database.
+
+        :return: Number of files written
+        """
+        written = 0
+        for symbol in store.symbols():
+            series = store.get_timeseries(symbol, date.min, date.max)
+            self.write(symbol, series)
+            written += 1
+        return written
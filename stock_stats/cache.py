@@ -0,0 +1,324 @@
+import json
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from .timeseries import Timeseries
+
+
+class TimeseriesCache(object):
+    """
+    On-disk SQLite store of previously downloaded daily rows, keyed by symbol
+    and date.
+
+    Besides the rows themselves we remember which date ranges have been asked
+    for, because a range with no rows (weekends, holidays, before a listing)
+    is still a range we don't need to ask for again. Callers use
+    missing_ranges() to find what still has to be downloaded, store() the
+    results, and then load() the merged series.
+
+    When the stored rows grow beyond max_bytes, whole symbols are evicted in
+    least-recently-used order.
+    """
+    FILE_NAME = 'timeseries.sqlite3'
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        :param directory: Where to keep the cache, created if necessary
+        :param max_bytes: Approximate cap on the size of the stored rows
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, self.FILE_NAME)
+        self.max_bytes = max_bytes
+
+        # Analysis commands may download from several threads at once, so one
+        # connection is shared behind a lock.
+        self._lock = threading.Lock()
+        # Imported here so that the listing and memory caches don't pay for it
+        import sqlite3
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._db:
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS symbols (
+                    symbol       TEXT PRIMARY KEY,
+                    column_names TEXT NOT NULL,
+                    last_used    REAL NOT NULL,
+                    size         INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS coverage (
+                    symbol TEXT NOT NULL,
+                    first  INTEGER NOT NULL,
+                    last   INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS coverage_symbol
+                    ON coverage (symbol);
+                CREATE TABLE IF NOT EXISTS rows (
+                    symbol  TEXT NOT NULL,
+                    ordinal INTEGER NOT NULL,
+                    data    BLOB NOT NULL,
+                    PRIMARY KEY (symbol, ordinal)
+                ) WITHOUT ROWID;
+            """)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _coverage(self, symbol: str) -> List[Tuple[int, int]]:
+        cursor = self._db.execute(
+            "SELECT first, last FROM coverage WHERE symbol = ? ORDER BY first",
+            (symbol,))
+        return cursor.fetchall()
+
+    def missing_ranges(self, symbol: str, start: date, end: date) \
+            -> List[Tuple[date, date]]:
+        """
+        :return: Inclusive (start, end) sub-ranges not yet held for the symbol,
+            in chronological order.
+        """
+        with self._lock:
+            covered = self._coverage(symbol)
+
+        missing = []
+        cursor = start.toordinal()
+        last = end.toordinal()
+        for first_held, last_held in covered:
+            if cursor > last:
+                break
+            if last_held < cursor:
+                continue
+            if first_held > cursor:
+                missing.append((cursor, min(first_held - 1, last)))
+            cursor = max(cursor, last_held + 1)
+        if cursor <= last:
+            missing.append((cursor, last))
+
+        return [(date.fromordinal(a), date.fromordinal(b))
+                for (a, b) in missing]
+
+    def store(self, symbol: str, series: Timeseries, start: date, end: date
+              ) -> None:
+        """
+        Saves the rows of a freshly-downloaded series, and records the range
+        that was requested for it as being held.
+
+        Days from today onward are not marked as held, since the data source
+        may not have final values for them yet.
+        """
+        column_names = json.dumps(series.column_names)
+        columns = list(series.columns.values())
+        rows = (
+            (symbol, ordinal, array('d', [c[i] for c in columns]).tobytes())
+            for i, ordinal in enumerate(series.ordinals)
+        )
+        first = start.toordinal()
+        last = min(end, date.today() - timedelta(days=1)).toordinal()
+
+        with self._lock, self._db:
+            existing = self._db.execute(
+                "SELECT column_names FROM symbols WHERE symbol = ?",
+                (symbol,)).fetchone()
+            if existing is not None and existing[0] != column_names:
+                # Layout changed upstream, nothing held so far can be merged
+                self._delete_symbol(symbol)
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO rows (symbol, ordinal, data) "
+                "VALUES (?, ?, ?)", rows)
+
+            if first <= last:
+                self._add_coverage(symbol, first, last)
+
+            size = self._db.execute(
+                "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM rows "
+                "WHERE symbol = ?", (symbol,)).fetchone()[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO symbols "
+                "(symbol, column_names, last_used, size) VALUES (?, ?, ?, ?)",
+                (symbol, column_names, time.time(), size))
+
+            self._evict(keep=symbol)
+
+    def load(self, symbol: str, start: date, end: date) -> Timeseries:
+        """
+        :return: The held rows of the symbol within the inclusive range, in
+            reverse-chronological order like the API itself returns them.
+        :raises KeyError: If nothing at all is held for the symbol
+        """
+        with self._lock, self._db:
+            found = self._db.execute(
+                "SELECT column_names FROM symbols WHERE symbol = ?",
+                (symbol,)).fetchone()
+            if found is None:
+                raise KeyError(symbol)
+            self._db.execute(
+                "UPDATE symbols SET last_used = ? WHERE symbol = ?",
+                (time.time(), symbol))
+            rows = self._db.execute(
+                "SELECT ordinal, data FROM rows WHERE symbol = ? "
+                "AND ordinal BETWEEN ? AND ? ORDER BY ordinal DESC",
+                (symbol, start.toordinal(), end.toordinal())).fetchall()
+
+        series = Timeseries(json.loads(found[0]))
+        for ordinal, data in rows:
+            values = array('d')
+            values.frombytes(data)
+            series.append(ordinal, values)
+        return series
+
+    def _add_coverage(self, symbol: str, first: int, last: int) -> None:
+        # Merge with any overlapping or adjacent ranges so the table stays small
+        collapsed = []
+        for held_first, held_last in sorted(self._coverage(symbol) +
+                                            [(first, last)]):
+            if collapsed and held_first <= collapsed[-1][1] + 1:
+                collapsed[-1][1] = max(collapsed[-1][1], held_last)
+            else:
+                collapsed.append([held_first, held_last])
+
+        self._db.execute("DELETE FROM coverage WHERE symbol = ?", (symbol,))
+        self._db.executemany(
+            "INSERT INTO coverage (symbol, first, last) VALUES (?, ?, ?)",
+            [(symbol, a, b) for (a, b) in collapsed])
+
+    def _delete_symbol(self, symbol: str) -> None:
+        for table in ('rows', 'coverage', 'symbols'):
+            self._db.execute("DELETE FROM %s WHERE symbol = ?" % table,
+                             (symbol,))
+
+    def _evict(self, keep: str) -> None:
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM symbols").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        candidates = self._db.execute(
+            "SELECT symbol, size FROM symbols WHERE symbol != ? "
+            "ORDER BY last_used", (keep,)).fetchall()
+        for symbol, size in candidates:
+            if total <= self.max_bytes:
+                break
+            self._delete_symbol(symbol)
+            total -= size
+
+
+class ListingCache(object):
+    """
+    Keeps the most recent symbol listing on disk, along with the validators
+    (ETag and Last-Modified) the server sent with it.
+
+    A listing younger than the TTL is used as-is. An older one is revalidated
+    with a conditional request, and re-used if the server answers 304.
+    """
+    FILE_NAME = 'symbols.json'
+    DEFAULT_TTL = 24 * 60 * 60
+
+    def __init__(self, directory: str, ttl: float = DEFAULT_TTL):
+        """
+        :param directory: Where to keep the listing, created if necessary
+        :param ttl: Seconds a listing is trusted without asking the server
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, self.FILE_NAME)
+        self.ttl = ttl
+
+    def load(self) -> Optional[Dict]:
+        """
+        :return: The stored entry, with "fetched_at", "etag", "last_modified"
+            and "symbols" keys, or None if there isn't a usable one.
+        """
+        try:
+            with open(self.path, 'rt', encoding='utf-8') as fh:
+                entry = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or 'symbols' not in entry:
+            return None
+        return entry
+
+    def is_fresh(self, entry: Dict) -> bool:
+        return time.time() - entry.get('fetched_at', 0) < self.ttl
+
+    def conditional_headers(self, entry: Dict) -> Dict[str, str]:
+        """
+        :return: Request headers asking for the listing only if it changed
+        """
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def save(self, symbols: List[Tuple[str, str]],
+             headers: Dict[str, str]) -> None:
+        """
+        :param symbols: Symbol and description pairs, in listing order
+        :param headers: Response headers the listing arrived with
+        """
+        # Header names are case-insensitive
+        lowered = {k.lower(): v for k, v in headers.items()}
+        self._write({
+            'fetched_at':    time.time(),
+            'etag':          lowered.get('etag'),
+            'last_modified': lowered.get('last-modified'),
+            'symbols':       symbols,
+        })
+
+    def touch(self, entry: Dict) -> None:
+        """
+        Marks a stored listing as just having been confirmed current.
+        """
+        entry = dict(entry, fetched_at=time.time())
+        self._write(entry)
+
+    def _write(self, entry: Dict) -> None:
+        # Only the listing's own commands need this
+        from tempfile import mkstemp
+
+        # Write-then-rename, so readers never see half a file. Each writer,
+        # thread or process, gets a temporary file of its own.
+        fd, temp_path = mkstemp(dir=os.path.dirname(self.path),
+                                prefix=self.FILE_NAME + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wt', encoding='utf-8') as fh:
+                json.dump(entry, fh)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+class MemoryCache(object):
+    """
+    Bounded in-memory map of recently used values, such as decoded
+    timeseries, for long-running processes that get asked about the same
+    symbols over and over. The least recently used entries are dropped first.
+    """
+    DEFAULT_MAX_ENTRIES = 256
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # type: OrderedDict
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            found = self._entries.get(key)
+            if found is not None:
+                self._entries.move_to_end(key)
+            return found
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -1,13 +1,25 @@
-import csv
-import json
+import operator
+from array import array
 from collections import OrderedDict
-from datetime import date
-from functools import reduce
-from io import TextIOWrapper
-from typing import Any, Dict, List, Union
-from zipfile import BadZipfile, LargeZipFile, ZipFile
-
-from .http import HttpClient, HttpException
+from datetime import date, timedelta
+from itertools import accumulate, chain, compress, repeat
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterator, List, \
+    Sequence, Tuple, Union
+
+from . import crosssection, rolling
+from .engine import ReportAccumulator
+from .profiling import Profiler
+from .streaming import decode_dataset
+from .timeseries import Timeseries
+
+# The modules for storage and networking are only imported by the methods
+# that need them, so that a command which reads binary price files, say,
+# never loads SQLite or http.client.
+if TYPE_CHECKING:
+    from .binary import BinaryPriceStore
+    from .cache import ListingCache, MemoryCache, TimeseriesCache
+    from .http import HttpClient, HttpException
+    from .store import LocalStore
 
 
 class StockException(Exception):
@@ -41,11 +53,57 @@ class StockClient(object):
     COL_VOLUME = 'Volume'
     COL_ADJ_VOLUME = 'Adj. Volume'
 
-    def __init__(self, http_client: HttpClient, api_key: str,
-                 base_url: str = None):
+    # Extra attempts at a chunk whose response broke off part-way, when there
+    # is no scheduler to set how many
+    CHUNK_RETRIES = 2
+
+    # Selects a single column by its position within WIKI rows
+    PARAM_COLUMN = 'column_index'
+    WIKI_COLUMNS = [COL_DATE, COL_OPEN, COL_HIGH, COL_LOW, COL_CLOSE,
+                    COL_VOLUME, 'Ex-Dividend', 'Split Ratio', COL_ADJ_OPEN,
+                    COL_ADJ_HIGH, COL_ADJ_LOW, COL_ADJ_CLOSE, COL_ADJ_VOLUME]
+
+    # The columns each analysis reads, unadjusted and adjusted. Note that the
+    # older analyses have always read high/low and volume from the opposite
+    # kind, which is kept so that their output doesn't change.
+    ANALYSIS_COLUMNS = {
+        'monthly_averages': ((COL_OPEN, COL_CLOSE),
+                             (COL_ADJ_OPEN, COL_ADJ_CLOSE)),
+        'top_variance_day': ((COL_ADJ_HIGH, COL_ADJ_LOW),
+                             (COL_HIGH, COL_LOW)),
+        'busy_days':        ((COL_ADJ_VOLUME,),
+                             (COL_VOLUME,)),
+        'losing_day_count': ((COL_OPEN, COL_CLOSE),
+                             (COL_ADJ_OPEN, COL_ADJ_CLOSE)),
+        'report':           ((COL_OPEN, COL_CLOSE, COL_ADJ_LOW, COL_ADJ_HIGH,
+                              COL_ADJ_VOLUME),
+                             (COL_ADJ_OPEN, COL_ADJ_CLOSE, COL_LOW, COL_HIGH,
+                              COL_VOLUME)),
+        'rolling_stats':    ((COL_CLOSE, COL_LOW, COL_HIGH, COL_VOLUME),
+                             (COL_ADJ_CLOSE, COL_ADJ_LOW, COL_ADJ_HIGH,
+                              COL_ADJ_VOLUME)),
+        'cross_section':    ((COL_OPEN, COL_CLOSE, COL_VOLUME),
+                             (COL_ADJ_OPEN, COL_ADJ_CLOSE, COL_ADJ_VOLUME)),
+    }  # type: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]]
+
+    def __init__(self, http_client: 'HttpClient', api_key: str,
+                 base_url: str = None, cache: 'TimeseriesCache' = None,
+                 listing_cache: 'ListingCache' = None, offline: bool = False,
+                 store: Union['LocalStore', 'BinaryPriceStore'] = None,
+                 memory: 'MemoryCache' = None, profiler: Profiler = None,
+                 chunk_jobs: int = 1):
         """
         :param api_key: The API key
         :param base_url: The base URL to use, such as https://www.quandl.com/api
+        :param cache: Optional on-disk store of previously downloaded rows
+        :param listing_cache: Optional on-disk copy of the symbol listing
+        :param offline: Use the cached symbol listing however old it is
+        :param store: Local price database or binary files to read timeseries
+            from instead of the API
+        :param memory: Optional in-memory cache of recently used timeseries
+        :param profiler: Records where the time goes, per symbol
+        :param chunk_jobs: Split downloads spanning several years into up to
+            this many chunks of whole years, downloaded in parallel
         """
         if base_url is None:
             base_url = self.DEFAULT_BASE_URL
@@ -54,66 +112,99 @@ class StockClient(object):
         self.http = http_client
         self.base_url = base_url
         self.api_key = api_key
+        self.cache = cache
+        self.listing_cache = listing_cache
+        self.offline = offline
+        self.store = store
+        self.memory = memory
+        self.profiler = profiler if profiler is not None \
+            else Profiler(enabled=False)
+        self.chunk_jobs = chunk_jobs
 
     def _headers_indicate_zipfile(self, headers: Dict[str, str]) -> bool:
         actual = headers.get(self.HEADER_CONTENT_TYPE, None)
         return actual == self.CONTENT_TYPE_ZIP
 
-    def _parse_csv_file(self, path: str, is_zip: bool = False) -> List[List]:
+    def _iter_csv_rows(self, body: BinaryIO, is_zip: bool = False) \
+            -> Iterator[List[str]]:
         """
-        :param path: Path to temporary file on disk
-        :param is_zip: File is zip, expect single CSV inside
-        :return: Row-data
+        :param body: Readable binary response body
+        :param is_zip: Body is a zip-file, expect single CSV inside
+        :return: Row-data, parsed as it is read
         """
+        import csv
+        from io import BytesIO, TextIOWrapper
+        from zipfile import BadZipfile, LargeZipFile, ZipFile
+
         try:
             if is_zip:
-                archive = ZipFile(path, 'r')
+                # Zip-files keep their table of contents at the end, so we
+                # need the whole (compressed) archive. Keeping it in memory
+                # avoids a round-trip through a temporary file, and the CSV
+                # inside is still decompressed a piece at a time.
+                archive = ZipFile(BytesIO(body.read()), 'r')
                 names = archive.namelist()
                 if len(names) != 1:
                     raise StockException(
                         "Unexpectedly got multiple files from API in zip-file")
-                csv_handle = archive.open(names[0])
-
-                # Workaround for ZipFile.open() not supporting text-mode
-                # Closing wrapper closes wrapped object as well
-                csv_handle = TextIOWrapper(csv_handle)
-            else:
-                csv_handle = open(path, "rt")
+                body = archive.open(names[0])
+            # Closing wrapper closes wrapped object as well
+            csv_handle = TextIOWrapper(body, encoding='utf-8', newline='')
         except (BadZipfile, LargeZipFile) as e:
             raise StockException("Error extracting ZIP data") from e
 
         try:
             with csv_handle:
-                reader = csv.reader(csv_handle, csv.excel)
-                rows = list(reader)
-            return rows
-        except csv.Error as e:
+                yield from csv.reader(csv_handle, csv.excel)
+        except (csv.Error, BadZipfile, UnicodeDecodeError) as e:
             raise StockException("Error parsing CSV") from e
 
-    def _convert_timeseries(self, dataset: Dict) \
-            -> List[Dict[str, Union[float, date]]]:
-
-        headers = dataset['column_names']
-        converted = []
-        for row in dataset['data']:
-            kv = dict(zip(headers, row))
-            parts = [int(s) for s in kv[self.COL_DATE].split("-")]
-            kv[self.COL_DATE] = date(*parts)
-            # Convert from a string to date-object
-            converted.append(kv)
-
-        # Shouldn't need to sort, server already returns our rows in reverse-
-        # chronological order
-
-        return converted
+    @staticmethod
+    def _month_bounds(ordinal: int) -> Tuple[int, int, int]:
+        """
+        :return: The integer key (year*12 + month-1) of the month containing
+            the given date ordinal, and the ordinals of its first and last day
+        """
+        day = date.fromordinal(ordinal)
+        key = day.year * 12 + day.month - 1
+        first = ordinal - day.day + 1
+        following_year, following_month = divmod(key + 1, 12)
+        last = date(following_year, following_month + 1, 1).toordinal() - 1
+        return key, first, last
+
+    def _group_by_month(self, series: Timeseries) \
+            -> Dict[int, List[Tuple[int, int]]]:
+        """
+        :return: For each month, keyed by year*12 + month-1, the (start, stop)
+            row ranges that fall within it. Date-sorted input, newest or
+            oldest first, yields a single range per month.
+        """
+        ordinals = series.ordinals
+        count = len(ordinals)
+        is_sorted = all(map(operator.ge, ordinals, ordinals[1:])) or \
+            all(map(operator.le, ordinals, ordinals[1:]))
 
-    def _group_by_month(self, days: List[Dict]) -> Dict[str, Dict]:
         by_month = {}
-        for row in days:
-            key = row[self.COL_DATE].strftime('%Y-%m')
-            if key not in by_month:
-                by_month[key] = []
-            by_month[key].append(row)
+        start = 0
+        while start < count:
+            key, first, last = self._month_bounds(ordinals[start])
+            if is_sorted:
+                # The rest of this month is a contiguous run, so binary search
+                # for where it ends.
+                lo, hi = start + 1, count
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if first <= ordinals[mid] <= last:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                stop = lo
+            else:
+                stop = start + 1
+                while stop < count and first <= ordinals[stop] <= last:
+                    stop += 1
+            by_month.setdefault(key, []).append((start, stop))
+            start = stop
         return by_month
 
     def get_symbols(self) -> Dict[str, str]:
@@ -121,55 +212,280 @@ class StockClient(object):
         :return: Retrieves a dictionary of stock symbols and descriptions.
         :raises StockException: On error, including network errors
         """
+        from .http import HttpNotModified
+
+        if self.listing_cache is None:
+            return OrderedDict(self.iter_symbols())
+
+        cache = self.listing_cache
+        entry = cache.load()
+        if entry is not None and (self.offline or cache.is_fresh(entry)):
+            return OrderedDict(entry['symbols'])
+        if self.offline:
+            raise StockException("No cached symbol listing to use offline")
+
+        request_headers = {}
+        if entry is not None:
+            request_headers = cache.conditional_headers(entry)
+        try:
+            headers = {}
+            symbols = list(self.iter_symbols(request_headers, headers))
+        except StockException as e:
+            if isinstance(e.__cause__, HttpNotModified) and entry is not None:
+                cache.touch(entry)
+                return OrderedDict(entry['symbols'])
+            raise
+        cache.save(symbols, headers)
+        return OrderedDict(symbols)
+
+    def get_universe(self) -> List[str]:
+        """
+        :return: Every symbol that analyses can be run on: those held locally
+            when reading from a store, otherwise the whole API listing
+        :raises StockException: On error, including network errors
+        """
+        if self.store is not None:
+            return self.store.symbols()
+        return list(self.get_symbols())
+
+    def iter_symbols(self, request_headers: Dict[str, str] = None,
+                     response_headers: Dict[str, str] = None) \
+            -> Iterator[Tuple[str, str]]:
+        """
+        :param request_headers: Extra headers to send, such as If-None-Match
+        :param response_headers: If given, filled with the response headers
+        :return: Stock symbols and descriptions, yielded as they are parsed
+        :raises StockException: On error, including network errors
+        """
+        from .http import HttpException
+
         try:
             params = {
                 'api_key': self.api_key
             }
             url = "%s/v3/databases/WIKI/codes" % (self.base_url,)
-            temp_file, headers = self.http.download(url, params)
-            is_zip = self._headers_indicate_zipfile(headers)
-            rows = self._parse_csv_file(temp_file, is_zip)
-
-            result = OrderedDict()
-            for (symbol, desc) in rows:
-                # Intitial output seems to be in form DATABASE/DATASET, so we
-                # want to strip the WIKI/ part out.
-                short_name = symbol.split("/")[1]
-                result[short_name] = desc
-
-            return result
+            with self.profiler.phase(Profiler.DECODE) as counters, \
+                    self.http.stream(url, params, request_headers) \
+                    as (body, headers):
+                if response_headers is not None:
+                    response_headers.update(headers)
+                is_zip = self._headers_indicate_zipfile(headers)
+                for (symbol, desc) in self._iter_csv_rows(body, is_zip):
+                    # Intitial output seems to be in form DATABASE/DATASET, so
+                    # we want to strip the WIKI/ part out.
+                    short_name = symbol.split("/")[1]
+                    counters['rows'] += 1
+                    yield short_name, desc
         except HttpException as e:
             raise StockException("Network error") from e
 
-    def get_monthly_averages(self, timeseries, adjusted: bool) \
+    def get_monthly_averages(self, timeseries: Timeseries, adjusted: bool) \
             -> Dict[str, Dict[str, float]]:
 
         by_month = self._group_by_month(timeseries)
 
-        if adjusted:
-            open_column = self.COL_ADJ_OPEN
-            close_column = self.COL_ADJ_CLOSE
-        else:
-            open_column = self.COL_OPEN
-            close_column = self.COL_CLOSE
+        open_column, close_column = self.columns_for('monthly_averages',
+                                                     adjusted)
+
+        # With prefix sums, the total of any run of rows is one subtraction
+        open_sums = array('d', chain((0.0,), accumulate(
+            timeseries.column(open_column))))
+        close_sums = array('d', chain((0.0,), accumulate(
+            timeseries.column(close_column))))
 
         results = {}  # Keyed by month
-        for key, timeseries in by_month.items():
-            open_total = 0.0
-            close_total = 0.0
-            day_count = 0.0
-            assert len(timeseries) > 0
-            for day in timeseries:
-                open_total += day[open_column]
-                close_total += day[close_column]
-                day_count += 1
-            results[key] = {
+        for key, ranges in by_month.items():
+            day_count = sum(stop - start for (start, stop) in ranges)
+            assert day_count > 0
+            open_total = sum(open_sums[stop] - open_sums[start]
+                             for (start, stop) in ranges)
+            close_total = sum(close_sums[stop] - close_sums[start]
+                              for (start, stop) in ranges)
+            year, month_index = divmod(key, 12)
+            results["%04d-%02d" % (year, month_index + 1)] = {
                 'average_open':  open_total / day_count,
                 'average_close': close_total / day_count,
             }
         return results
 
-    def get_standard_timeseries(self, symbol: str, start: date, end: date):
+    def columns_for(self, analysis: str, adjusted: bool) -> Tuple[str, ...]:
+        """
+        :param analysis: Name of an analysis, such as "busy_days" for
+            get_busy_days()
+        :return: The columns it reads, in the order it uses them
+        """
+        return self.ANALYSIS_COLUMNS[analysis][bool(adjusted)]
+
+    def get_standard_timeseries(self, symbol: str, start: date, end: date,
+                                columns: Sequence[str] = None) -> Timeseries:
+        """
+        :param columns: The only columns needed, such as from columns_for().
+            Others may be left out, but needn't be.
+        :return: Daily rows for the symbol within the inclusive date range,
+            newest first. With a cache, only the parts of the range that have
+            not been downloaded before are requested.
+        :raises StockException: On error, including network errors
+        """
+        columns = tuple(columns) if columns else None
+        with self.profiler.symbol(symbol):
+            if self.memory is None:
+                return self._load_timeseries(symbol, start, end, columns)
+
+            key = (symbol, start, end, columns)
+            series = self.memory.get(key)
+            if series is None:
+                series = self._load_timeseries(symbol, start, end, columns)
+                # Today's prices may still change, earlier days won't
+                if end < date.today():
+                    self.memory.put(key, series)
+            return series
+
+    def _load_timeseries(self, symbol: str, start: date, end: date,
+                         columns: Tuple[str, ...] = None) -> Timeseries:
+        # Local data has every column to hand, and binary files only read
+        # the ones that get used anyway.
+        if self.store is not None:
+            from .store import StoreException
+            try:
+                with self.profiler.phase(Profiler.STORE) as counters:
+                    series = self.store.get_timeseries(symbol, start, end)
+                    counters['rows'] = len(series)
+                return series
+            except StoreException as e:
+                raise StockException("Local data error") from e
+
+        if self.cache is None:
+            return self._download_timeseries(symbol, start, end, columns)
+
+        # The server can only be asked for one column, or all of them. Cached
+        # rows are kept whole, so that any later analysis can use them, and
+        # single columns are kept apart from those.
+        key = symbol
+        if columns is not None and len(columns) == 1:
+            key = '%s#%s' % (symbol, columns[0])
+        else:
+            columns = None
+
+        # Downloads are timed on their own, and left out of the cache's time
+        with self.profiler.phase(Profiler.CACHE) as counters:
+            for (gap_start, gap_end) in self.cache.missing_ranges(key, start,
+                                                                  end):
+                part = self._download_timeseries(symbol, gap_start, gap_end,
+                                                 columns)
+                self.cache.store(key, part, gap_start, gap_end)
+            try:
+                series = self.cache.load(key, start, end)
+            except KeyError:
+                # Another thread or process evicted the symbol since we
+                # stored it, so fetch the whole range again instead
+                series = self._download_timeseries(symbol, start, end,
+                                                   columns)
+            counters['rows'] = len(series)
+        return series
+
+    def refresh(self, symbol: str, target: 'BinaryPriceStore', since: date,
+                until: date) -> Tuple[int, int]:
+        """
+        Fetches only the days after the newest one already held for a symbol,
+        and appends them to its binary price file.
+
+        :param target: Binary files to bring up to date
+        :param since: First day to fetch for a symbol with no file yet
+        :param until: Last day to fetch. Nothing from today onward is
+            fetched, since today's prices may still change and rows are
+            never fetched again once appended.
+        :return: Number of rows and of bytes added
+        :raises StockException: On error, including network errors
+        """
+        from .binary import EPOCH_ORDINAL
+        from .store import StoreException
+
+        until = min(until, date.today() - timedelta(days=1))
+        try:
+            last = target.last_day(symbol)
+            if last is not None:
+                since = date.fromordinal(last + EPOCH_ORDINAL + 1)
+            if since > until:
+                return 0, 0
+            series = self.get_standard_timeseries(symbol, since, until)
+            return target.append(symbol, series)
+        except (OSError, StoreException) as e:
+            raise StockException("Local data error") from e
+
+    def _chunks(self, start: date, end: date) -> List[Tuple[date, date]]:
+        """
+        :return: Inclusive ranges of whole calendar years (or what part of
+            them lies within the range) to download separately, newest first
+        """
+        years = end.year - start.year + 1
+        if self.chunk_jobs <= 1 or years < 2:
+            return [(start, end)]
+        per_chunk = -(-years // self.chunk_jobs)
+        return [(max(start, date(year, 1, 1)),
+                 min(end, date(year + per_chunk - 1, 12, 31)))
+                for year in reversed(range(start.year, end.year + 1,
+                                           per_chunk))]
+
+    def _download_timeseries(self, symbol: str, start: date, end: date,
+                             columns: Tuple[str, ...] = None) -> Timeseries:
+        """
+        Downloads a long range in chunks of years, up to `chunk_jobs` of them
+        at a time, rather than as one long response. A chunk that fails is
+        retried by itself, without losing the others.
+
+        :param columns: Decode only these. A single column is all the server
+            is asked for.
+        """
+        chunks = self._chunks(start, end)
+        if len(chunks) == 1:
+            return self._download_range(symbol, start, end, columns)
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        def download(chunk: Tuple[date, date]) -> Timeseries:
+            # Measurements made by this thread still belong to the symbol
+            with self.profiler.symbol(symbol):
+                return self._download_range(symbol, chunk[0], chunk[1],
+                                            columns, retry_broken=True)
+
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            parts = list(executor.map(download, chunks))
+        series = parts[0]
+        try:
+            for part in parts[1:]:
+                series.extend(part)
+        except ValueError as e:
+            # Columns changed from one chunk to the next
+            raise StockException("Data encoding error") from e
+        return series
+
+    def _retry_broken(self, error: 'HttpException', attempt: int) -> bool:
+        """
+        Decides whether to ask again for a response that broke off after its
+        body began to arrive, which the scheduler can't retry by itself.
+        Such retries count against its budget, and wait out its backoff.
+
+        :param attempt: Retries made so far
+        """
+        # A connection that failed is worth another go, a response we
+        # couldn't make sense of is not
+        if error.status is not None or \
+                not isinstance(error.__cause__, OSError):
+            return False
+        wait_before_retry = getattr(self.http, 'wait_before_retry', None)
+        if wait_before_retry is not None:
+            return wait_before_retry(error, attempt)
+        return attempt < self.CHUNK_RETRIES
+
+    def _download_range(self, symbol: str, start: date, end: date,
+                        columns: Tuple[str, ...] = None,
+                        retry_broken: bool = False) -> Timeseries:
+        """
+        :param columns: Decode only these. A single column is all the server
+            is asked for.
+        :param retry_broken: Ask again if the connection fails part-way
+            through the response
+        """
         url = "%s/v3/datasets/WIKI/%s/data.json" % (self.base_url, symbol)
         params = {
             self.PARAM_KEY:   self.api_key,
@@ -180,77 +496,226 @@ class StockClient(object):
             # there may be gaps in days when market is closed, so we won't know
             # how much to divide.
         }
-        try:
-            body, headers = self.http.get(url, params)
-            if isinstance(body, bytes):
-                body = body.decode("utf-8")
-            json_body = json.loads(body)
-            days = self._convert_timeseries(json_body['dataset_data'])
-        except HttpException as e:
-            raise StockException("Network error") from e
-        except json.decoder.JSONDecodeError as e:
-            raise StockException("Data encoding error") from e
-        return days
-
-    def get_top_variance_day(self, timeseries, adjusted: bool) \
+        if columns is not None and len(columns) == 1 and \
+                columns[0] in self.WIKI_COLUMNS:
+            params[self.PARAM_COLUMN] = self.WIKI_COLUMNS.index(columns[0])
+        from .http import HttpException
+
+        attempt = 0
+        while True:
+            opened = False
+            try:
+                # Rows are decoded while the rest of the response is still
+                # arriving, rather than after buffering all of it.
+                with self.profiler.phase(Profiler.DECODE) as counters, \
+                        self.http.stream(url, params) as (body, headers):
+                    opened = True
+                    days = decode_dataset(body, self.COL_DATE,
+                                          columns=columns,
+                                          profiler=self.profiler)
+                    counters['rows'] = len(days)
+            except HttpException as e:
+                # Failures before the body arrives are the scheduler's to
+                # retry
+                if retry_broken and opened and \
+                        self._retry_broken(e, attempt):
+                    attempt += 1
+                    continue
+                raise StockException("Network error") from e
+            except ValueError as e:
+                # Includes json.decoder.JSONDecodeError
+                raise StockException("Data encoding error") from e
+            return days
+
+    def get_top_variance_day(self, timeseries: Timeseries, adjusted: bool) \
             -> Dict[str, Any]:
 
-        if adjusted:
-            lo_column = self.COL_LOW
-            hi_column = self.COL_HIGH
-        else:
-            lo_column = self.COL_ADJ_LOW
-            hi_column = self.COL_ADJ_HIGH
+        hi_column, lo_column = self.columns_for('top_variance_day', adjusted)
 
         top_variance = 0.0
         top_day = None
 
-        for day in timeseries:
-            variance = day[hi_column] - day[lo_column]
-            if variance > top_variance:
-                top_variance = variance
-                top_day = day
+        variances = list(map(operator.sub,
+                             timeseries.column(hi_column),
+                             timeseries.column(lo_column)))
+        if variances:
+            # The first day with the largest variance wins ties
+            biggest = max(variances)
+            if biggest > top_variance:
+                top_variance = biggest
+                top_day = timeseries.date(variances.index(biggest))
 
         return {
-            "date":   top_day[self.COL_DATE],
+            "date":   top_day,
             "variance": top_variance
         }
 
-    def get_busy_days(self, timeseries, adjusted: bool) -> Dict[str, Any]:
+    def get_busy_days(self, timeseries: Timeseries, adjusted: bool,
+                      trailing_window: int = None) -> Dict[str, Any]:
+        """
+        :param trailing_window: If given, a day is busy relative to the mean
+            volume of this many trading days before it, rather than the mean
+            of the whole series. Days without that much history are skipped.
+        """
 
-        if adjusted:
-            vol_column = self.COL_VOLUME
+        vol_column, = self.columns_for('busy_days', adjusted)
+
+        volumes = timeseries.column(vol_column)
+        if not volumes:
+            # No trading days, as get_report() answers too
+            return {
+                "average_volume": None,
+                "busy_days":      {}
+            }
+        mean_volume = sum(volumes) / len(volumes)
+        if trailing_window is None:
+            threshold = mean_volume * 1.10
+            busy_indexes = compress(range(len(volumes)),
+                                    map(threshold.__lt__, volumes))
         else:
-            vol_column = self.COL_ADJ_VOLUME
-
-        total_volume = reduce(lambda a, b: a + b,
-                              map(lambda d: d[vol_column], timeseries))
-        mean_volume = total_volume / len(timeseries)
-        threshold = mean_volume * 1.10
-        busy_days = {}
-        for day in timeseries:
-            if day[vol_column] > threshold:
-                busy_days[day[self.COL_DATE]] = day[vol_column]
+            order = rolling.chronological(timeseries.ordinals)
+            means = rolling.trailing_mean(
+                rolling.in_order(volumes, order), trailing_window)
+            busy = [i for i, mean in zip(order, means)
+                    if mean is not None and volumes[i] > mean * 1.10]
+            busy_indexes = sorted(busy)  # Back into series order
+        busy_days = {
+            timeseries.date(i): volumes[i] for i in busy_indexes
+        }
         return {
             "average_volume": mean_volume,
             "busy_days":      busy_days
         }
 
-    def get_losing_day_count(self, timeseries, adjusted: bool) -> int:
+    def get_losing_day_count(self, timeseries: Timeseries, adjusted: bool) \
+            -> int:
 
-        if adjusted:
-            open_column = self.COL_ADJ_OPEN
-            close_column = self.COL_ADJ_CLOSE
-        else:
-            open_column = self.COL_OPEN
-            close_column = self.COL_CLOSE
-
-        # bad_days = len(list(filter(None,
-        # map(lambda d: d[close_column] < d[open_column], timeseries)
-        # ))
-        bad_days = 0
-        for day in timeseries:
-            if day[close_column] < day[open_column]:
-                bad_days += 1
-
-        return bad_days
+        open_column, close_column = self.columns_for('losing_day_count',
+                                                     adjusted)
+
+        # Element-wise close < open, summed as booleans
+        return sum(map(operator.lt,
+                       timeseries.column(close_column),
+                       timeseries.column(open_column)))
+
+    def get_report(self, timeseries: Timeseries, adjusted: bool) \
+            -> Dict[str, Any]:
+        """
+        Computes the results of get_monthly_averages, get_top_variance_day,
+        get_busy_days and get_losing_day_count together, in one pass.
+        """
+        # Each statistic reads the same columns its stand-alone method does
+        open_column, close_column, lo_column, hi_column, vol_column = \
+            self.columns_for('report', adjusted)
+
+        accumulator = ReportAccumulator()
+        add = accumulator.add
+        for row in zip(timeseries.ordinals,
+                       timeseries.column(open_column),
+                       timeseries.column(close_column),
+                       timeseries.column(lo_column),
+                       timeseries.column(hi_column),
+                       timeseries.column(vol_column)):
+            add(*row)
+        return accumulator.result()
+
+    def get_rolling_stats(self, timeseries: Timeseries, adjusted: bool,
+                          window: int) -> Dict[date, Dict[str, float]]:
+        """
+        :param window: Number of trading days per window
+        :return: For each day with a full window behind it, oldest first: the
+            moving average and standard deviation of the close, the highest
+            high and lowest low, their difference, and the average volume.
+        """
+        close_column, lo_column, hi_column, vol_column = \
+            self.columns_for('rolling_stats', adjusted)
+
+        order = rolling.chronological(timeseries.ordinals)
+        closes = rolling.in_order(timeseries.column(close_column), order)
+        stats = zip(
+            order,
+            rolling.rolling_mean(closes, window),
+            rolling.rolling_variance(closes, window),
+            rolling.rolling_max(
+                rolling.in_order(timeseries.column(hi_column), order), window),
+            rolling.rolling_min(
+                rolling.in_order(timeseries.column(lo_column), order), window),
+            rolling.rolling_mean(
+                rolling.in_order(timeseries.column(vol_column), order),
+                window),
+        )
+
+        results = OrderedDict()
+        for i, mean, variance, high, low, volume in stats:
+            if mean is None:
+                continue
+            results[timeseries.date(i)] = {
+                'average_close':  mean,
+                'stddev_close':   variance ** 0.5,
+                'high':           high,
+                'low':            low,
+                'range':          high - low,
+                'average_volume': volume,
+            }
+        return results
+
+    def get_cross_section(self, timeseries: Dict[str, Timeseries],
+                          adjusted: bool) -> Dict[str, Any]:
+        """
+        Compares symbols with each other, over every day any of them traded.
+
+        :param timeseries: Series of each symbol, in the order to list them
+        :return: The correlation of daily returns between each pair of
+            symbols, over the days both have. Then for each day, newest
+            first: the share of the symbols trading that closed below their
+            open, and those symbols ranked by volume relative to their own
+            mean, highest first.
+        """
+        open_column, close_column, vol_column = \
+            self.columns_for('cross_section', adjusted)
+
+        symbols = list(timeseries)
+        index = crosssection.date_index(
+            series.ordinals for series in timeseries.values())
+
+        # One row per symbol, aligned on the shared index
+        changes, declining, trading, relative = [], [], [], []
+        for series in timeseries.values():
+            ordinals = series.ordinals
+            closes = series.column(close_column)
+            changes.append(crosssection.align(
+                index, ordinals[:-1], crosssection.returns(closes)))
+            declining.append(crosssection.align(
+                index, ordinals,
+                map(operator.lt, closes, series.column(open_column)), 0.0))
+            trading.append(crosssection.align(
+                index, ordinals, repeat(1.0, len(series)), 0.0))
+            volumes = series.column(vol_column)
+            mean_volume = sum(volumes) / len(volumes) if len(volumes) \
+                else 0.0
+            if mean_volume > 0:
+                relative.append(crosssection.align(
+                    index, ordinals, map(mean_volume.__rtruediv__, volumes)))
+            else:
+                relative.append(array('d', repeat(crosssection.NAN,
+                                                  len(index))))
+
+        matrix = crosssection.correlation_matrix(changes)
+        correlation = OrderedDict(
+            (symbol, OrderedDict(zip(symbols, row)))
+            for symbol, row in zip(symbols, matrix))
+
+        days = OrderedDict()
+        for ordinal, down, count, ranked in zip(
+                index, crosssection.column_sums(declining),
+                crosssection.column_sums(trading),
+                crosssection.rank_columns(relative)):
+            days[date.fromordinal(ordinal)] = {
+                'declining':    down / count,
+                'symbols':      int(count),
+                'volume_ranks': [symbols[i] for i in ranked],
+            }
+        return {
+            'correlation': correlation,
+            'days':        days,
+        }
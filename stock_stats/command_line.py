@@ -1,14 +1,28 @@
 import argparse
+import heapq
 import json
+import operator
 import re
 import sys
-from datetime import date
-from typing import Any, List
+from collections import OrderedDict
+from datetime import date, timedelta
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, ContextManager, Dict, \
+    Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-from dateutil.relativedelta import relativedelta
+from .client import StockClient, StockException
+from .jsonout import dumps, iter_json
+from .paths import default_binary_dir, default_cache_dir, default_store_path
+from .profiling import Profiler
 
-from .client import StockClient
-from .http import HttpClient
+# Sub-commands are run many times in a row by scripts, so modules that only
+# some of them need, such as http.client, multiprocessing or the caches and
+# price stores, are imported where they are used rather than here. See also
+# tests/test_startup.py.
+if TYPE_CHECKING:
+    from .binary import BinaryPriceStore
+    from .cache import ListingCache, MemoryCache, TimeseriesCache
+    from .store import LocalStore
 
 
 def _parse_month_begin(val: str) -> date:
@@ -24,16 +38,39 @@ def _parse_month(val: str, ending: bool = True) -> date:
     if m is None:
         raise argparse.ArgumentTypeError("Invalid year-month")
     try:
-        d = date(int(m.group(1)), int(m.group(2)), 1)
+        year, month = int(m.group(1)), int(m.group(2))
+        d = date(year, month, 1)
         if ending:
             # Last day of same month. Not the first day of the next month,
             # because the API we work against uses inclusive date ranges.
-            d = d + relativedelta(months=1, days=-1)
+            following_year, following_month = divmod(year * 12 + month, 12)
+            d = date(following_year, following_month + 1, 1) - \
+                timedelta(days=1)
         return d
     except ValueError as e:
         raise argparse.ArgumentTypeError("Invalid year-month") from e
 
 
+def _parse_positive_int(val: str) -> int:
+    try:
+        number = int(val)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError("Invalid number") from e
+    if number < 1:
+        raise argparse.ArgumentTypeError("Must be at least 1")
+    return number
+
+
+def _parse_positive_float(val: str) -> float:
+    try:
+        number = float(val)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Not a number: %r" % val)
+    if not number > 0:
+        raise argparse.ArgumentTypeError("Must be more than 0")
+    return number
+
+
 def _add_parser_global_args(parsers: List[argparse.ArgumentParser]) -> None:
     # The -h/--help options should already be generated for us unless the
     # (sub)parser has used add_help=False in its constructor.
@@ -46,18 +83,86 @@ def _add_parser_global_args(parsers: List[argparse.ArgumentParser]) -> None:
                                help="Quandl API key")
         parser.add_argument('--pretty', action='store_true',
                             help="Use pretty-printing in JSON output")
+        parser.add_argument('--profile', action='store_true',
+                            help="Report the time spent in each phase, per "
+                                 "symbol, as JSON on STDERR")
+        parser.add_argument('--max-rate', type=_parse_positive_float,
+                            metavar='REQUESTS', default=20.0,
+                            help="Send at most this many API requests per "
+                                 "second on average. Default: %(default)s")
+
+
+def _add_parser_cache_args(parsers: List[argparse.ArgumentParser]) -> None:
+    for parser in parsers:
+        parser.add_argument('--cache-dir', metavar='DIR',
+                            default=default_cache_dir(),
+                            help="Where to keep previously downloaded data. "
+                                 "Default: %(default)s")
+        parser.add_argument('--no-cache', action='store_true',
+                            help="Always download, don't read or write the "
+                                 "cache")
 
 
-def _add_parser_analysis_args(parsers: List[argparse.ArgumentParser]) -> None:
+def _add_parser_store_args(parsers: List[argparse.ArgumentParser]) -> None:
+    for parser in parsers:
+        parser.add_argument('--store', metavar='FILE',
+                            default=default_store_path(),
+                            help="Local price database. Default: %(default)s")
+        parser.add_argument('--binary-dir', metavar='DIR',
+                            default=default_binary_dir(),
+                            help="Directory of memory-mapped binary price "
+                                 "files. Default: %(default)s")
+
+
+def _add_parser_analysis_args(parsers: List[argparse.ArgumentParser],
+                              symbol_nargs: str = '+') -> None:
     for parser in parsers:
         parser.add_argument('start_month', type=_parse_month_begin,
                             help="Start month inclusive. Ex: 2017-01")
         parser.add_argument('end_month', type=_parse_month_end,
                             help="End month inclusive. Ex: 2017-06")
-        parser.add_argument('symbol', nargs='+',
+        parser.add_argument('symbol', nargs=symbol_nargs,
                             help="Stock symbol. Ex: GOOGL")
         parser.add_argument('--adjusted', action='store_true',
                             help="Use adjusted values where applicable")
+    _add_parser_source_args(parsers)
+
+
+def _add_parser_format_args(parsers: List[argparse.ArgumentParser]) -> None:
+    for parser in parsers:
+        parser.add_argument('--format', choices=['json', 'ndjson'],
+                            default='json',
+                            help="Print one JSON object once every symbol is "
+                                 "done, or a JSON line per symbol as soon as "
+                                 "it is done. Default: %(default)s")
+
+
+def _add_parser_chunk_args(parsers: List[argparse.ArgumentParser]) -> None:
+    for parser in parsers:
+        parser.add_argument('--chunk-jobs', type=_parse_positive_int,
+                            default=1, metavar='N',
+                            help="Split each download spanning several years "
+                                 "into up to N chunks, downloaded in "
+                                 "parallel. Default: %(default)s")
+
+
+def _add_parser_source_args(parsers: List[argparse.ArgumentParser]) -> None:
+    for parser in parsers:
+        parser.add_argument('--jobs', type=_parse_positive_int, default=1,
+                            metavar='N',
+                            help="Download up to N symbols in parallel")
+        _add_parser_chunk_args([parser])
+        parser.add_argument('--cache-size', type=_parse_positive_int,
+                            metavar='MB', default=512,
+                            help="Evict cached data beyond this size. "
+                                 "Default: %(default)s")
+        parser.add_argument('--source', choices=['api', 'local', 'binary'],
+                            default='api',
+                            help="Download prices from the API, or read them "
+                                 "from the database or binary files built "
+                                 "with the ingest sub-command. "
+                                 "Default: %(default)s")
+        _add_parser_store_args([parser])
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -109,141 +214,861 @@ def create_parser() -> argparse.ArgumentParser:
         help="Determine which symbol had the most days where closing was lower "
              "than opening."
     )
+
+    report = subparsers.add_parser(
+        'report',
+        help="Computes all of the above statistics at once, downloading each "
+             "symbol only one time."
+    )
+
+    ingest = subparsers.add_parser(
+        'ingest',
+        help="Loads a WIKI prices bulk export (CSV, or zipped CSV) into a "
+             "local database, for use with --source local."
+    )
+    ingest.add_argument('export', help="Path of the bulk export file")
+    ingest.add_argument('--binary', action='store_true',
+                        help="Also write binary price files, for use with "
+                             "--source binary")
+    ingest.add_argument('--pretty', action='store_true',
+                        help="Use pretty-printing in JSON output")
+    _add_parser_store_args([ingest])
+
+    refresh = subparsers.add_parser(
+        'refresh',
+        help="Brings binary price files up to date, downloading only the days "
+             "after the newest one each file already holds."
+    )
+    refresh.add_argument('symbol', nargs='*',
+                         help="Stock symbol. Default: every symbol that has "
+                              "a binary price file")
+    refresh.add_argument('--since', type=_parse_month_begin, metavar='MONTH',
+                         help="Start month for symbols without a file yet. "
+                              "Default: their whole history")
+    refresh.add_argument('--jobs', type=_parse_positive_int, default=1,
+                         metavar='N',
+                         help="Download up to N symbols in parallel")
+    _add_parser_chunk_args([refresh])
+    refresh.add_argument('--binary-dir', metavar='DIR',
+                         default=default_binary_dir(),
+                         help="Directory of binary price files. "
+                              "Default: %(default)s")
+
+    serve = subparsers.add_parser(
+        'serve',
+        help="Answers queries for the analysis sub-commands over HTTP, "
+             "keeping connections and recently used data warm in between."
+    )
+    serve.add_argument('--host', default='127.0.0.1',
+                       help="Address to listen on. Default: %(default)s")
+    serve.add_argument('--port', type=int, default=8421,
+                       help="Port to listen on. Default: %(default)s")
+    serve.add_argument('--memory-size', type=_parse_positive_int,
+                       metavar='N',
+                       help="Keep up to N recently used series in memory. "
+                            "Default: 256")
+    _add_parser_source_args([serve])
+
+    batch = subparsers.add_parser(
+        'batch',
+        help="Runs many analysis queries from a job file, downloading each "
+             "day of each symbol only once between them."
+    )
+    batch.add_argument('jobs_file', metavar='JOBS',
+                       help="JSON array, or newline-delimited JSON, of "
+                            "queries such as {\"action\": \"busy-days\", "
+                            "\"symbols\": [\"GOOGL\"], \"start_month\": "
+                            "\"2017-01\", \"end_month\": \"2017-06\"}. "
+                            "Use - for STDIN.")
+
+    cross_section = subparsers.add_parser(
+        'cross-section',
+        help="Compares symbols with each other: the correlation of their "
+             "daily returns, and for each day the share that closed lower "
+             "than opening, and their ranks by relative volume."
+    )
+
+    rolling = subparsers.add_parser(
+        'rolling',
+        help="For each symbol and day, calculates moving averages, high-low "
+             "ranges and average volumes over a trailing window of days."
+    )
+    rolling.add_argument('--window', type=_parse_positive_int, default=20,
+                         metavar='DAYS',
+                         help="Trading days per window. Default: %(default)s")
+    biggest_loser.add_argument('--all-symbols', action='store_true',
+                               help="Rank every listed symbol, or every "
+                                    "local one with --source local/binary, "
+                                    "spreading the work over --jobs "
+                                    "processes")
+    biggest_loser.add_argument('--top', type=_parse_positive_int, metavar='K',
+                               help="List the K symbols with the most losing "
+                                    "days, rather than only the worst")
+    busy_days.add_argument('--trailing-window', type=_parse_positive_int,
+                           metavar='DAYS',
+                           help="Compare each day to the average of this many "
+                                "days before it, instead of the whole span")
+
     _add_parser_global_args([
         listing,
         month_average,
         top_variance_days,
         busy_days,
-        biggest_loser
+        biggest_loser,
+        report,
+        rolling,
+        cross_section,
+        refresh,
+        serve,
+        batch
     ])
 
+    _add_parser_cache_args([
+        listing,
+        month_average,
+        top_variance_days,
+        busy_days,
+        biggest_loser,
+        report,
+        rolling,
+        cross_section,
+        serve,
+        batch
+    ])
+
+    listing.add_argument('--listing-ttl', type=_parse_positive_int,
+                         metavar='SECONDS',
+                         help="Re-use a cached listing this young without "
+                              "asking the server. Default: a day")
+    listing.add_argument('--offline', action='store_true',
+                         help="Use the cached listing however old it is")
+
     _add_parser_analysis_args([
         month_average,
         top_variance_days,
         busy_days,
-        biggest_loser
+        report,
+        rolling,
+        cross_section
+    ])
+
+    _add_parser_format_args([
+        month_average,
+        top_variance_days,
+        busy_days,
+        report,
+        rolling,
+        batch
     ])
 
+    _add_parser_source_args([batch])
+
+    # Symbols are optional here, with --all-symbols
+    _add_parser_analysis_args([biggest_loser], symbol_nargs='*')
+
     return main_parser
 
 
-def print_json(data: Any, pretty=False):
-    # I tried to use cls= and default= parameters to do custom serialization of
-    # date objects, but unfortunately it only works if they are NOT dictionary
-    # keys!
-    #
-    # See: https://bugs.python.org/issue18820
+def print_json(data: Any, pretty=False, profiler: Profiler = None):
+    # Dates, even as dictionary keys, are written as ISO-8601 strings
+    with _output_phase(profiler):
+        out = dumps(data, pretty)
 
-    if pretty:
-        out = json.dumps(data, sort_keys=True, indent=4, separators=(',', ': '))
-    else:
-        out = json.dumps(data)
+        # Trying to flush immediately doesn't seem to fix the stack trace of:
+        # BrokenPipeError: [Errno 32] Broken pipe
+        # ... which can be encountered when piping output to head.
+        try:
+            print(out)
+        except BrokenPipeError:
+            pass
 
-    # Trying to flush immediately doesn't seem to fix the stack trace of:
-    # BrokenPipeError: [Errno 32] Broken pipe
-    # ... which can be encountered when piping output to head.
-    try:
-        print(out)
-    except BrokenPipeError:
-        pass
+
+def print_json_line(data: Any, profiler: Profiler = None) -> None:
+    """
+    Writes one line of newline-delimited JSON, flushed so that whoever reads
+    our output can start on it straight away.
+    """
+    with _output_phase(profiler):
+        try:
+            sys.stdout.write(''.join(iter_json(data)) + '\n')
+            sys.stdout.flush()
+        except BrokenPipeError:
+            pass
+
+
+def _output_phase(profiler: Optional[Profiler]) -> ContextManager:
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    return profiler.phase(Profiler.OUTPUT)
+
+
+def _fetch_timeseries(client: StockClient, symbols: List[str],
+                      start_date: date, end_date: date, jobs: int = 1,
+                      ordered: bool = True, columns: Sequence[str] = None
+                      ) -> Iterator[Tuple[str, Any]]:
+    """
+    Yields (symbol, timeseries) pairs, downloading up to `jobs` of them
+    concurrently.
+
+    :param ordered: Yield in the same order as the given symbols. Otherwise
+        each one is yielded as soon as it has arrived.
+    :param columns: The only columns needed, if not all of them
+    """
+    def fetch(symbol: str):
+        return client.get_standard_timeseries(symbol, start_date, end_date,
+                                              columns)
+
+    if jobs <= 1 or len(symbols) <= 1:
+        for symbol in symbols:
+            yield symbol, fetch(symbol)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    with ThreadPoolExecutor(max_workers=min(jobs, len(symbols))) as executor:
+        if ordered:
+            # Executor.map() hands back results in submission order, which
+            # keeps our output identical to the serial version. If any
+            # download fails, the exception is re-raised here once we reach
+            # that symbol.
+            yield from zip(symbols, executor.map(fetch, symbols))
+        else:
+            futures = {executor.submit(fetch, symbol): symbol
+                       for symbol in symbols}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
+def _analyze(client: StockClient, symbols: List[str], start_date: date,
+             end_date: date, jobs: int, analysis: Callable[[Any], Any],
+             ordered: bool = True, columns: Sequence[str] = None
+             ) -> Iterator[Tuple[str, Any]]:
+    """
+    :param analysis: Called with each timeseries
+    :param columns: The only columns the analysis reads, if not all of them
+    :return: (symbol, result) pairs
+    """
+    for symbol, series in _fetch_timeseries(client, symbols, start_date,
+                                            end_date, jobs, ordered, columns):
+        yield symbol, _run_analysis(client, symbol, series, analysis)
+
+
+def _run_analysis(client: StockClient, symbol: str, series: Any,
+                  analysis: Callable[[Any], Any]) -> Any:
+    profiler = client.profiler
+    with profiler.symbol(symbol), \
+            profiler.phase(Profiler.ANALYSIS) as counters:
+        counters['rows'] = len(series)
+        return analysis(series)
+
+
+def _print_results(results: Callable[[bool], Iterator[Tuple[str, Any]]],
+                   pretty: bool, output_format: str,
+                   profiler: Profiler = None) -> None:
+    """
+    :param results: Called with whether to keep symbols in order, returns
+        (symbol, result) pairs
+    :param output_format: "json" for one object keyed by symbol, once every
+        symbol is done, or "ndjson" for a line per symbol as each is done
+    """
+    if output_format == 'ndjson':
+        for symbol, result in results(False):
+            print_json_line({'symbol': symbol, 'result': result}, profiler)
+    else:
+        print_json(OrderedDict(results(True)), pretty, profiler)
 
 
 def action_symbols(client: StockClient, pretty: bool = False) -> int:
     symbols = client.get_symbols()
-    print_json(symbols, pretty)
+    print_json(symbols, pretty, client.profiler)
     return 0
 
 
+def _month_averages(client: StockClient, symbols: List[str],
+                    start_date: date, end_date: date, adjusted: bool,
+                    jobs: int, ordered: bool = True
+                    ) -> Iterator[Tuple[str, Any]]:
+    return _analyze(
+        client, symbols, start_date, end_date, jobs,
+        lambda series: client.get_monthly_averages(series, adjusted),
+        ordered, client.columns_for('monthly_averages', adjusted))
+
+
+def compute_month_averages(client: StockClient, symbols: List[str],
+                           start_date: date, end_date: date,
+                           adjusted: bool = False, jobs: int = 1
+                           ) -> Dict[str, Any]:
+    return OrderedDict(_month_averages(client, symbols, start_date, end_date,
+                                       adjusted, jobs))
+
+
 def action_month_averages(client: StockClient, symbols: List[str],
                           start_date: date, end_date: date,
-                          adjusted: bool = False, pretty: bool = False
-                          ) -> int:
-    results = {}
-    for symbol in symbols:
-        series = client.get_standard_timeseries(symbol, start_date, end_date)
-        results[symbol] = client.get_monthly_averages(series, adjusted)
-    print_json(results, pretty)
+                          adjusted: bool = False, pretty: bool = False,
+                          jobs: int = 1, output_format: str = 'json') -> int:
+    _print_results(partial(_month_averages, client, symbols, start_date,
+                           end_date, adjusted, jobs),
+                   pretty, output_format, client.profiler)
     return 0
 
 
+def _top_variance_days(client: StockClient, symbols: List[str],
+                       start_date: date, end_date: date, adjusted: bool,
+                       jobs: int, ordered: bool = True
+                       ) -> Iterator[Tuple[str, Any]]:
+    return _analyze(
+        client, symbols, start_date, end_date, jobs,
+        lambda series: client.get_top_variance_day(series, adjusted),
+        ordered, client.columns_for('top_variance_day', adjusted))
+
+
+def compute_top_variance_days(client: StockClient, symbols: List[str],
+                              start_date: date, end_date: date,
+                              adjusted: bool = False, jobs: int = 1
+                              ) -> Dict[str, Any]:
+    return OrderedDict(_top_variance_days(client, symbols, start_date,
+                                          end_date, adjusted, jobs))
+
+
 def action_top_variance_days(client: StockClient, symbols: List[str],
                              start_date: date, end_date: date,
-                             adjusted: bool = False, pretty: bool = False
+                             adjusted: bool = False, pretty: bool = False,
+                             jobs: int = 1, output_format: str = 'json'
                              ) -> int:
-    results = {}
-    for symbol in symbols:
-        series = client.get_standard_timeseries(symbol, start_date, end_date)
-        result = client.get_top_variance_day(series, adjusted)
-        # Adjust to make it JSON-able
-        result['date'] = result['date'].isoformat()
-        results[symbol] = result
-
-    print_json(results, pretty)
+    _print_results(partial(_top_variance_days, client, symbols, start_date,
+                           end_date, adjusted, jobs),
+                   pretty, output_format, client.profiler)
     return 0
 
 
+def _busy_days(client: StockClient, symbols: List[str], start_date: date,
+               end_date: date, adjusted: bool, jobs: int,
+               trailing_window: Optional[int], ordered: bool = True
+               ) -> Iterator[Tuple[str, Any]]:
+    return _analyze(
+        client, symbols, start_date, end_date, jobs,
+        lambda series: client.get_busy_days(series, adjusted,
+                                            trailing_window),
+        ordered, client.columns_for('busy_days', adjusted))
+
+
+def compute_busy_days(client: StockClient, symbols: List[str],
+                      start_date: date, end_date: date,
+                      adjusted: bool = False, jobs: int = 1,
+                      trailing_window: int = None) -> Dict[str, Any]:
+    return OrderedDict(_busy_days(client, symbols, start_date, end_date,
+                                  adjusted, jobs, trailing_window))
+
+
 def action_busy_days(client: StockClient, symbols: List[str],
                      start_date: date, end_date: date,
-                     adjusted: bool = False, pretty: bool = False
-                     ) -> int:
-    results = {}
-    for symbol in symbols:
-        series = client.get_standard_timeseries(symbol, start_date, end_date)
-        result = client.get_busy_days(series, adjusted)
-        # Adjust to make it JSON-able
-        # Custom encoder won't work due to https://bugs.python.org/issue18820
-        result['busy_days'] = {
-            k.isoformat(): result['busy_days'][k]
-            for k in result['busy_days']
-        }
-        results[symbol] = result
-
-    print_json(results, pretty)
+                     adjusted: bool = False, pretty: bool = False,
+                     jobs: int = 1, trailing_window: int = None,
+                     output_format: str = 'json') -> int:
+    _print_results(partial(_busy_days, client, symbols, start_date, end_date,
+                           adjusted, jobs, trailing_window),
+                   pretty, output_format, client.profiler)
     return 0
 
 
-def action_biggest_loser(client: StockClient, symbols: List[str],
-                         start_date: date, end_date: date,
-                         adjusted: bool = False, pretty: bool = False
-                         ) -> int:
+def _worst_performers(counts: Iterable[Tuple[str, int]]) \
+        -> Dict[str, Any]:
+    """
+    :param counts: Pairs of symbol and losing-day count
+    :return: The highest count, and every symbol that had it
+    """
     worst_performers = []  # There might be ties
     worst_count = -1
-    for symbol in symbols:
-        series = client.get_standard_timeseries(symbol, start_date, end_date)
-        count = client.get_losing_day_count(series, adjusted)
+    for symbol, count in counts:
         if count > worst_count:
             worst_performers = [symbol]
             worst_count = count
         elif count == worst_count:
             worst_performers.append(symbol)
-    results = {
+    return {
         'days':    worst_count,
         'symbols': worst_performers
     }
+
+
+def _top_losers(counts: Iterable[Tuple[str, int]], top: int) \
+        -> List[Dict[str, Any]]:
+    """
+    :param counts: Pairs of symbol and losing-day count
+    :return: The `top` symbols with the highest counts, highest first. Only
+        that many are held at once, however many symbols there are. Ties go
+        to the symbol seen first.
+    """
+    ranked = heapq.nlargest(top, counts, key=operator.itemgetter(1))
+    return [{'symbol': symbol, 'days': count} for symbol, count in ranked]
+
+
+# Clients of the current worker process, by the arguments they were built from
+_worker_clients = {}  # type: Dict[str, StockClient]
+
+
+def _worker_client(args: Any) -> StockClient:
+    # Connections and database handles can't be shared between processes, so
+    # each worker builds a client of its own from the command-line arguments,
+    # the first time it is handed a symbol.
+    key = repr(args)
+    client = _worker_clients.get(key)
+    if client is None:
+        client = _worker_clients[key] = _create_client(args, share=args.jobs)
+    return client
+
+
+def _count_losing_days(client: StockClient, symbol: str, start_date: date,
+                       end_date: date, adjusted: bool, skip_errors: bool
+                       ) -> Tuple[str, Optional[int]]:
+    try:
+        series = client.get_standard_timeseries(
+            symbol, start_date, end_date,
+            client.columns_for('losing_day_count', adjusted))
+    except StockException:
+        if not skip_errors:
+            raise
+        return symbol, None
+    return symbol, _run_analysis(
+        client, symbol, series,
+        lambda s: client.get_losing_day_count(s, adjusted))
+
+
+def _count_losing_days_in_worker(args: Any, params: tuple, symbol: str) \
+        -> Tuple[str, Optional[int]]:
+    return _count_losing_days(_worker_client(args), symbol, *params)
+
+
+def _losing_day_counts(client: StockClient, symbols: List[str],
+                       start_date: date, end_date: date, adjusted: bool,
+                       jobs: int = 1, worker_args: Any = None,
+                       skip_errors: bool = False
+                       ) -> Iterator[Tuple[str, Optional[int]]]:
+    """
+    Yields (symbol, losing-day count) pairs in the same order as the given
+    symbols. Up to `jobs` symbols are handled at once, by threads sharing the
+    client, or by processes with clients built from `worker_args` if given.
+
+    :param skip_errors: Yield a count of None for symbols that can't be
+        fetched, rather than raising
+    """
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    params = (start_date, end_date, adjusted, skip_errors)
+    if jobs <= 1 or len(symbols) <= 1:
+        for symbol in symbols:
+            yield _count_losing_days(client, symbol, *params)
+        return
+
+    workers = min(jobs, len(symbols))
+    if worker_args is None:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(
+                lambda symbol: _count_losing_days(client, symbol, *params),
+                symbols)
+        return
+
+    # Hand out symbols a few at a time to keep inter-process traffic down,
+    # while still letting results trickle back in order.
+    chunk_size = max(1, min(32, len(symbols) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(
+            partial(_count_losing_days_in_worker, worker_args, params),
+            symbols, chunksize=chunk_size)
+
+
+def _with_progress(counts: Iterable[Tuple[str, Optional[int]]], total: int,
+                   every: int = 100) -> Iterator[Tuple[str, Optional[int]]]:
+    """
+    Passes counts through, noting on STDERR how many of the `total` symbols
+    are done every so often.
+    """
+    done = 0
+    for done, item in enumerate(counts, start=1):
+        if done % every == 0 or done == total:
+            print("%d/%d symbols" % (done, total), file=sys.stderr, flush=True)
+        yield item
+
+
+def compute_biggest_loser(client: StockClient, symbols: List[str],
+                          start_date: date, end_date: date,
+                          adjusted: bool = False, jobs: int = 1,
+                          top: int = None, all_symbols: bool = False,
+                          worker_args: Any = None, progress: bool = False
+                          ) -> Dict[str, Any]:
+    """
+    :param top: List this many of the worst symbols, not only those tied for
+        the most losing days
+    :param all_symbols: Ignore `symbols` and rank the whole universe instead.
+        Symbols that can't be fetched are listed as failed.
+    :param worker_args: Command-line arguments to build a client from in each
+        of `jobs` worker processes. Without them, threads are used.
+    :param progress: Report how many symbols are done on STDERR
+    """
+    if all_symbols:
+        symbols = client.get_universe()
+    counts = _losing_day_counts(client, symbols, start_date, end_date,
+                                adjusted, jobs, worker_args,
+                                skip_errors=all_symbols)
+    if progress:
+        counts = _with_progress(counts, len(symbols))
+
+    failed = []
+
+    def successful_counts() -> Iterator[Tuple[str, int]]:
+        for symbol, count in counts:
+            if count is None:
+                failed.append(symbol)
+            else:
+                yield symbol, count
+
+    if top is None:
+        results = _worst_performers(successful_counts())
+    else:
+        results = {'losers': _top_losers(successful_counts(), top)}
+    if all_symbols:
+        results['failed'] = failed
+    return results
+
+
+def action_biggest_loser(client: StockClient, symbols: List[str],
+                         start_date: date, end_date: date,
+                         adjusted: bool = False, pretty: bool = False,
+                         jobs: int = 1, top: int = None,
+                         all_symbols: bool = False,
+                         worker_args: Any = None) -> int:
+    # Ranking a whole universe takes a while, so show how far along it is
+    print_json(compute_biggest_loser(client, symbols, start_date, end_date,
+                                     adjusted, jobs, top, all_symbols,
+                                     worker_args, progress=all_symbols),
+               pretty, client.profiler)
+    return 0
+
+
+def _reports(client: StockClient, symbols: List[str], start_date: date,
+             end_date: date, adjusted: bool, jobs: int, ordered: bool = True
+             ) -> Iterator[Tuple[str, Any]]:
+    return _analyze(
+        client, symbols, start_date, end_date, jobs,
+        lambda series: client.get_report(series, adjusted),
+        ordered, client.columns_for('report', adjusted))
+
+
+def compute_report(client: StockClient, symbols: List[str],
+                   start_date: date, end_date: date,
+                   adjusted: bool = False, jobs: int = 1) -> Dict[str, Any]:
+    per_symbol = OrderedDict(_reports(client, symbols, start_date, end_date,
+                                      adjusted, jobs))
+    results = {
+        'symbols':       per_symbol,
+        'biggest_loser': _worst_performers(
+            (symbol, result['losing_days'])
+            for symbol, result in per_symbol.items()
+        ),
+    }
+    return results
+
+
+def action_report(client: StockClient, symbols: List[str],
+                  start_date: date, end_date: date,
+                  adjusted: bool = False, pretty: bool = False,
+                  jobs: int = 1, output_format: str = 'json') -> int:
+    if output_format != 'ndjson':
+        print_json(compute_report(client, symbols, start_date, end_date,
+                                  adjusted, jobs), pretty, client.profiler)
+        return 0
+
+    # A line per symbol, then one for the biggest loser among them all
+    losing_days = []
+    for symbol, result in _reports(client, symbols, start_date, end_date,
+                                   adjusted, jobs, ordered=False):
+        print_json_line({'symbol': symbol, 'result': result},
+                        client.profiler)
+        losing_days.append((symbol, result['losing_days']))
+    # Symbols arrive in any order, but ties are listed in the given order
+    position = {symbol: i for i, symbol in enumerate(symbols)}
+    losing_days.sort(key=lambda pair: position[pair[0]])
+    print_json_line({'biggest_loser': _worst_performers(losing_days)},
+                    client.profiler)
+    return 0
+
+
+def _rolling(client: StockClient, symbols: List[str], start_date: date,
+             end_date: date, adjusted: bool, jobs: int, window: int,
+             ordered: bool = True) -> Iterator[Tuple[str, Any]]:
+    return _analyze(
+        client, symbols, start_date, end_date, jobs,
+        lambda series: client.get_rolling_stats(series, adjusted, window),
+        ordered, client.columns_for('rolling_stats', adjusted))
+
+
+def compute_rolling(client: StockClient, symbols: List[str],
+                    start_date: date, end_date: date,
+                    adjusted: bool = False, jobs: int = 1, window: int = 20
+                    ) -> Dict[str, Any]:
+    return OrderedDict(_rolling(client, symbols, start_date, end_date,
+                                adjusted, jobs, window))
+
+
+def action_rolling(client: StockClient, symbols: List[str],
+                   start_date: date, end_date: date,
+                   adjusted: bool = False, pretty: bool = False,
+                   jobs: int = 1, window: int = 20,
+                   output_format: str = 'json') -> int:
+    _print_results(partial(_rolling, client, symbols, start_date, end_date,
+                           adjusted, jobs, window),
+                   pretty, output_format, client.profiler)
+    return 0
+
+
+def compute_cross_section(client: StockClient, symbols: List[str],
+                          start_date: date, end_date: date,
+                          adjusted: bool = False, jobs: int = 1
+                          ) -> Dict[str, Any]:
+    # Repeated symbols would only repeat rows of the matrix
+    symbols = list(OrderedDict.fromkeys(symbols))
+    series = OrderedDict(_fetch_timeseries(
+        client, symbols, start_date, end_date, jobs,
+        columns=client.columns_for('cross_section', adjusted)))
+    with client.profiler.phase(Profiler.ANALYSIS) as counters:
+        counters['rows'] = sum(len(s) for s in series.values())
+        return client.get_cross_section(series, adjusted)
+
+
+def action_cross_section(client: StockClient, symbols: List[str],
+                         start_date: date, end_date: date,
+                         adjusted: bool = False, pretty: bool = False,
+                         jobs: int = 1) -> int:
+    print_json(compute_cross_section(client, symbols, start_date, end_date,
+                                     adjusted, jobs),
+               pretty, client.profiler)
+    return 0
+
+
+# Where a full-history refresh starts, earlier than any WIKI data
+HISTORY_START = date(1900, 1, 1)
+
+
+def action_refresh(client: StockClient, target: 'BinaryPriceStore',
+                   symbols: List[str], since: date, until: date,
+                   pretty: bool = False, jobs: int = 1) -> int:
+    """
+    Appends newly available days to the binary price file of each symbol,
+    reporting the rows and bytes added, or why that failed.
+
+    :param symbols: Symbols to refresh, or none for every one with a file
+    :return: 1 if any symbol failed, otherwise 0
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not symbols:
+        symbols = target.symbols()
+
+    def refresh(symbol: str) -> Dict[str, Any]:
+        try:
+            rows, size = client.refresh(symbol, target, since, until)
+        except StockException as e:
+            return {'error': str(e)}
+        return {'rows': rows, 'bytes': size}
+
+    # Each symbol has a file of its own, so appends never contend
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(symbols)))) \
+            as executor:
+        results = dict(zip(symbols, executor.map(refresh, symbols)))
+    print_json(results, pretty, client.profiler)
+    return 1 if any('error' in r for r in results.values()) else 0
+
+
+def action_batch(client: StockClient, jobs_path: str, pretty: bool = False,
+                 jobs: int = 1, output_format: str = 'json') -> int:
+    """
+    Prints the result of each query in a job file, in order.
+
+    :param jobs_path: Path of the job file, or "-" for STDIN
+    :return: 1 if any query failed, 2 if the file couldn't be read,
+        otherwise 0
+    """
+    from .batch import read_jobs, run_batch
+
+    try:
+        if jobs_path == '-':
+            records = read_jobs(sys.stdin.read())
+        else:
+            with open(jobs_path, 'rt', encoding='utf-8') as fh:
+                records = read_jobs(fh.read())
+    except (OSError, ValueError) as e:
+        print("Can't read jobs: %s" % e, file=sys.stderr)
+        return 2
+    if not isinstance(records, list):
+        print("Can't read jobs: expected a list", file=sys.stderr)
+        return 2
+
+    failed = False
+    if output_format == 'ndjson':
+        for result in run_batch(client, records, jobs):
+            failed = failed or 'error' in result
+            print_json_line(result, client.profiler)
+    else:
+        results = list(run_batch(client, records, jobs))
+        failed = any('error' in result for result in results)
+        print_json(results, pretty, client.profiler)
+    return 1 if failed else 0
+
+
+def action_ingest(store: 'LocalStore', export_path: str,
+                  pretty: bool = False,
+                  binary_store: 'BinaryPriceStore' = None) -> int:
+    rows = store.ingest(export_path)
+    results = {
+        'rows':    rows,
+        'symbols': store.symbol_count(),
+    }
+    if binary_store is not None:
+        results['binary_files'] = binary_store.export(store)
     print_json(results, pretty)
     return 0
 
 
+def _create_cache(args: Any) -> Optional['TimeseriesCache']:
+    # Only the analysis sub-commands have a cache size
+    if getattr(args, 'no_cache', False) or not hasattr(args, 'cache_size') or \
+            getattr(args, 'source', 'api') != 'api':
+        return None
+    from .cache import TimeseriesCache
+    return TimeseriesCache(args.cache_dir, args.cache_size * 1024 * 1024)
+
+
+def _create_store(args: Any) \
+        -> Union['LocalStore', 'BinaryPriceStore', None]:
+    source = getattr(args, 'source', 'api')
+    if source == 'local':
+        from .store import LocalStore
+        return LocalStore(args.store)
+    elif source == 'binary':
+        return _create_binary_store(args)
+    return None
+
+
+def _create_binary_store(args: Any) -> 'BinaryPriceStore':
+    from .binary import BinaryPriceStore
+    return BinaryPriceStore(args.binary_dir)
+
+
+def _create_listing_cache(args: Any) -> Optional['ListingCache']:
+    if getattr(args, 'no_cache', False) or not hasattr(args, 'listing_ttl'):
+        return None
+    from .cache import ListingCache
+    if args.listing_ttl is None:
+        return ListingCache(args.cache_dir)
+    return ListingCache(args.cache_dir, args.listing_ttl)
+
+
+def _create_memory(args: Any) -> Optional['MemoryCache']:
+    # Only worth it for a long-running server
+    if not hasattr(args, 'memory_size'):
+        return None
+    from .cache import MemoryCache
+    if args.memory_size is None:
+        return MemoryCache()
+    return MemoryCache(args.memory_size)
+
+
+def _create_client(args: Any, share: int = 1) -> StockClient:
+    """
+    :param share: Number of processes making requests with these arguments,
+        which split the request rate between them
+    """
+    profiler = Profiler(enabled=getattr(args, 'profile', False))
+    http_client = None
+    # Local sources only need the network for the symbol listing, which only
+    # the server can be asked for.
+    if getattr(args, 'source', 'api') == 'api' or args.action == 'serve':
+        from .http import HttpClient
+        from .scheduler import RequestScheduler
+        # Keep enough connections alive for every parallel download
+        jobs = getattr(args, 'jobs', 1) * getattr(args, 'chunk_jobs', 1)
+        http_client = RequestScheduler(
+            HttpClient(max(HttpClient.DEFAULT_POOL_SIZE, jobs),
+                       profiler=profiler),
+            rate=args.max_rate / share, max_concurrency=-(-jobs // share))
+    return StockClient(http_client, args.key,
+                       cache=_create_cache(args),
+                       listing_cache=_create_listing_cache(args),
+                       offline=getattr(args, 'offline', False),
+                       store=_create_store(args),
+                       memory=_create_memory(args),
+                       profiler=profiler,
+                       chunk_jobs=getattr(args, 'chunk_jobs', 1))
+
+
 def main(args: Any) -> int:
-    http_client = HttpClient()
-    client = StockClient(http_client, args.key)
+    if args.action == 'ingest':
+        # Works on local files only, no API client needed
+        from .store import LocalStore
+        binary_store = None
+        if args.binary:
+            binary_store = _create_binary_store(args)
+        return action_ingest(LocalStore(args.store), args.export, args.pretty,
+                             binary_store)
+
+    if args.action == 'biggest-loser' and \
+            bool(args.symbol) == args.all_symbols:
+        print("Give either some symbols or --all-symbols", file=sys.stderr)
+        return 2
+
+    client = _create_client(args)
+    try:
+        return _run_action(client, args)
+    finally:
+        if client.profiler.enabled:
+            print(json.dumps(client.profiler.report()), file=sys.stderr)
+
 
+def _run_action(client: StockClient, args: Any) -> int:
     if args.action == 'list-symbols':
         # No additional arguments needed for this command
         return action_symbols(client, args.pretty)
     elif args.action == 'month-averages':
         return action_month_averages(client, args.symbol, args.start_month,
-                                     args.end_month, args.adjusted, args.pretty)
+                                     args.end_month, args.adjusted, args.pretty,
+                                     args.jobs, args.format)
     elif args.action == 'top-variance-days':
         return action_top_variance_days(client, args.symbol, args.start_month,
                                         args.end_month, args.adjusted,
-                                        args.pretty)
+                                        args.pretty, args.jobs, args.format)
     elif args.action == 'busy-days':
         return action_busy_days(client, args.symbol, args.start_month,
-                                args.end_month, args.adjusted, args.pretty)
+                                args.end_month, args.adjusted, args.pretty,
+                                args.jobs, args.trailing_window, args.format)
     elif args.action == 'biggest-loser':
+        # Only a whole universe is worth the start-up cost of processes
+        worker_args = args if args.all_symbols else None
         return action_biggest_loser(client, args.symbol, args.start_month,
-                                    args.end_month, args.adjusted, args.pretty)
+                                    args.end_month, args.adjusted, args.pretty,
+                                    args.jobs, args.top, args.all_symbols,
+                                    worker_args)
+    elif args.action == 'report':
+        return action_report(client, args.symbol, args.start_month,
+                             args.end_month, args.adjusted, args.pretty,
+                             args.jobs, args.format)
+    elif args.action == 'rolling':
+        return action_rolling(client, args.symbol, args.start_month,
+                              args.end_month, args.adjusted, args.pretty,
+                              args.jobs, args.window, args.format)
+    elif args.action == 'cross-section':
+        return action_cross_section(client, args.symbol, args.start_month,
+                                    args.end_month, args.adjusted,
+                                    args.pretty, args.jobs)
+    elif args.action == 'serve':
+        from .server import serve
+        return serve(client, args.host, args.port, args.jobs, args.pretty)
+    elif args.action == 'batch':
+        return action_batch(client, args.jobs_file, args.pretty, args.jobs,
+                            args.format)
+    elif args.action == 'refresh':
+        return action_refresh(client, _create_binary_store(args),
+                              args.symbol, args.since or HISTORY_START,
+                              date.today(), args.pretty, args.jobs)
 
     return 4  # Nothing matched
 
@@ -0,0 +1,141 @@
+import heapq
+import operator
+from array import array
+from itertools import compress, groupby, repeat
+from math import sqrt
+from typing import Iterable, List, Optional, Sequence
+
+NAN = float('nan')
+
+
+def date_index(ordinals: Iterable[Sequence[int]]) -> List[int]:
+    """
+    Merges the dates of several series into one index, as the first half of
+    a sorted merge join.
+
+    :param ordinals: Dates of each series, newest first
+    :return: Every date any of them has, newest first, each once
+    """
+    # Symbols on the same exchange mostly share their days, and those only
+    # need merging once
+    calendars = {tuple(days): days for days in ordinals}
+    if len(calendars) == 1:
+        return list(next(iter(calendars)))
+    merged = heapq.merge(*calendars.values(), reverse=True)
+    return [day for day, _ in groupby(merged)]
+
+
+def align(index: Sequence[int], ordinals: Sequence[int],
+          values: Iterable[float], missing: float = NAN) -> array:
+    """
+    :param index: As from date_index()
+    :param ordinals: Dates of the values, all of which are in the index
+    :return: The values laid out along the index, with `missing` on days
+        the series has no row
+    """
+    if len(ordinals) == len(index):
+        # The series has every day, as most on the same exchange do
+        return array('d', values)
+    by_day = dict(zip(ordinals, values))
+    return array('d', map(by_day.get, index, repeat(missing)))
+
+
+def returns(closes: Sequence[float]) -> array:
+    """
+    :param closes: Closing prices, newest first
+    :return: The change on each day since the day before it, newest first,
+        and one shorter than the prices. NaN where there is no price to
+        compare with.
+    """
+    return array('d', [close / previous - 1 if previous else NAN
+                       for close, previous in zip(closes, closes[1:])])
+
+
+def _dot(left: Sequence[float], right: Sequence[float]) -> float:
+    return sum(map(operator.mul, left, right))
+
+
+def _fill(values: Sequence[float]) -> List[float]:
+    # Zeroes drop out of the dot products that missing values would spoil
+    return [0.0 if value != value else value for value in values]
+
+
+def correlation_matrix(rows: Sequence[Sequence[float]]) \
+        -> List[List[Optional[float]]]:
+    """
+    Pearson correlation between every pair of rows, each taken over only the
+    positions where neither has a NaN.
+
+    Each entry is built from dot products of whole rows, which sum() runs
+    without a Python-level step per position. Rows with NaN in the same
+    positions, such as symbols trading on the same days, are standardized
+    over those positions up-front, so that a pair of them takes a single dot
+    product.
+
+    :return: Square matrix in the order of the rows, with None where fewer
+        than two positions are shared or either row doesn't vary on them
+    """
+    # Lists rather than arrays, whose values would be boxed again for
+    # every product
+    count = len(rows)
+    filled = [_fill(row) for row in rows]
+    masks = [bytes(map(operator.eq, row, row)) for row in rows]
+    present = [list(map(float, mask)) for mask in masks]
+    squares = [list(map(operator.mul, row, row)) for row in filled]
+
+    # Zero outside the row's positions, and None if it doesn't vary
+    standard = [None] * count  # type: List[Optional[List[float]]]
+    for i, (row, mask) in enumerate(zip(filled, present)):
+        having = sum(mask)
+        if having < 2:
+            continue
+        mean = sum(row) / having
+        centred = [(value - mean) * flag for value, flag in zip(row, mask)]
+        norm = sqrt(_dot(centred, centred))
+        if norm > 0:
+            standard[i] = [value / norm for value in centred]
+
+    matrix = [[None] * count
+              for _ in range(count)]  # type: List[List[Optional[float]]]
+    for i in range(count):
+        for j in range(i, count):
+            if masks[i] == masks[j]:
+                if standard[i] is None or standard[j] is None:
+                    continue
+                value = _dot(standard[i], standard[j])
+            else:
+                # Sums over the positions both rows have. Daily returns are
+                # small, so sums of squares keep enough precision.
+                shared = _dot(present[i], present[j])
+                if shared < 2:
+                    continue
+                sum_x = _dot(filled[i], present[j])
+                sum_y = _dot(filled[j], present[i])
+                var_x = _dot(squares[i], present[j]) - sum_x * sum_x / shared
+                var_y = _dot(squares[j], present[i]) - sum_y * sum_y / shared
+                if var_x <= 0 or var_y <= 0:
+                    continue
+                covariance = _dot(filled[i], filled[j]) - \
+                    sum_x * sum_y / shared
+                value = covariance / sqrt(var_x * var_y)
+            matrix[i][j] = matrix[j][i] = max(-1.0, min(1.0, value))
+    return matrix
+
+
+def column_sums(rows: Sequence[Sequence[float]]) -> List[float]:
+    """
+    :return: The total of each position across all rows
+    """
+    return list(map(sum, zip(*rows)))
+
+
+def rank_columns(rows: Sequence[Sequence[float]]) -> List[List[int]]:
+    """
+    :return: For each position, the indexes of the rows that have a value
+        there (not NaN), highest value first. Ties keep row order.
+    """
+    ranks = []
+    for column in zip(*rows):
+        having = compress(range(len(column)), map(operator.eq, column, column))
+        ranks.append(sorted(having, key=column.__getitem__, reverse=True))
+    return ranks
@@ -0,0 +1,124 @@
+from array import array
+from datetime import date
+from typing import Any, Dict
+
+
+class ReportAccumulator(object):
+    """
+    Computes every per-symbol statistic in a single pass over a series, so
+    that one download can feed all of them.
+
+    Rows are fed in with add() in whatever order the data arrives, and the
+    results are read with result(). The statistics match the stand-alone
+    StockClient.get_* methods:
+
+    * Average open and close for each month
+    * The first day with the greatest high-low variance
+    * The average volume, and days with more than 10% above that average
+    * How many days closed lower than they opened
+
+    The busy-day threshold depends on the final average, so the volumes are
+    retained in a compact array and filtered once at the end.
+    """
+    BUSY_FACTOR = 1.10
+
+    def __init__(self):
+        self._month_keys = []
+        self._month_sums = {}  # Keyed by year*12 + month-1: [open, close, days]
+
+        # Ordinal range of the month we last saw, to skip date conversion for
+        # consecutive rows of the same month.
+        self._month_first = 0
+        self._month_last = -1
+        self._month_sum = None
+
+        self._top_variance = 0.0
+        self._top_ordinal = None
+
+        self._ordinals = array('l')
+        self._volumes = array('d')
+        self._volume_total = 0.0
+
+        self._losing_days = 0
+
+    def add(self, ordinal: int, open_value: float, close_value: float,
+            low: float, high: float, volume: float) -> None:
+
+        if not self._month_first <= ordinal <= self._month_last:
+            self._enter_month(ordinal)
+        month_sum = self._month_sum
+        month_sum[0] += open_value
+        month_sum[1] += close_value
+        month_sum[2] += 1
+
+        variance = high - low
+        if variance > self._top_variance:
+            self._top_variance = variance
+            self._top_ordinal = ordinal
+
+        self._ordinals.append(ordinal)
+        self._volumes.append(volume)
+        self._volume_total += volume
+
+        if close_value < open_value:
+            self._losing_days += 1
+
+    def _enter_month(self, ordinal: int) -> None:
+        day = date.fromordinal(ordinal)
+        first = day.replace(day=1)
+        if day.month == 12:
+            following = date(day.year + 1, 1, 1)
+        else:
+            following = date(day.year, day.month + 1, 1)
+        self._month_first = first.toordinal()
+        self._month_last = following.toordinal() - 1
+
+        key = day.year * 12 + day.month - 1
+        month_sum = self._month_sums.get(key)
+        if month_sum is None:
+            month_sum = [0.0, 0.0, 0]
+            self._month_sums[key] = month_sum
+            self._month_keys.append(key)
+        self._month_sum = month_sum
+
+    def result(self) -> Dict[str, Any]:
+        """
+        :return: The same shapes as StockClient.get_monthly_averages,
+            get_top_variance_day, get_busy_days and get_losing_day_count,
+            under the keys "month_averages", "top_variance_day", "busy_days"
+            and "losing_days".
+        """
+        month_averages = {}
+        for key in self._month_keys:
+            open_total, close_total, day_count = self._month_sums[key]
+            year, month_index = divmod(key, 12)
+            month_averages["%04d-%02d" % (year, month_index + 1)] = {
+                'average_open':  open_total / day_count,
+                'average_close': close_total / day_count,
+            }
+
+        top_day = None
+        if self._top_ordinal is not None:
+            top_day = date.fromordinal(self._top_ordinal)
+
+        busy_days = {}
+        mean_volume = None
+        if self._volumes:
+            mean_volume = self._volume_total / len(self._volumes)
+            threshold = mean_volume * self.BUSY_FACTOR
+            for ordinal, volume in zip(self._ordinals, self._volumes):
+                if volume > threshold:
+                    busy_days[date.fromordinal(ordinal)] = volume
+
+        return {
+            "month_averages": month_averages,
+            "top_variance_day": {
+                "date":     top_day,
+                "variance": self._top_variance,
+            },
+            "busy_days": {
+                "average_volume": mean_volume,
+                "busy_days":      busy_days,
+            },
+            "losing_days": self._losing_days,
+        }
@@ -1,24 +1,170 @@
+import gzip
+import io
+import os
+import threading
+import time
+import zlib
 from collections import OrderedDict
-from typing import Dict, Tuple
-from urllib import parse, request
-from urllib.error import ContentTooShortError, HTTPError, URLError
+from contextlib import contextmanager
+from http import client as http_client
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+from urllib import parse
+
+from .profiling import Profiler
 
 
 class HttpException(Exception):
+    """
+    Raised for any failure to retrieve a URL. When the server did answer, but
+    with an error, its status code and headers are kept as well.
+    """
+
+    def __init__(self, message: str = None, status: int = None,
+                 headers: Dict[str, str] = None):
+        super().__init__(*([message] if message else []))
+        self.status = status
+        self.headers = headers if headers is not None else {}
+
+
+class HttpNotModified(HttpException):
+    """
+    Raised when a conditional request finds that the resource has not changed
+    since the copy the caller already has.
+    """
     pass
 
 
+# Errors that may come up while talking to a server or decoding its response
+_TRANSPORT_ERRORS = (OSError, EOFError, zlib.error,
+                     http_client.HTTPException)
+
+
+class _SafeReader(io.RawIOBase):
+    """
+    Wraps a response so that errors while reading the body surface as
+    HttpException, just like errors while connecting do.
+    """
+
+    def __init__(self, response):
+        super().__init__()
+        self._response = response
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        try:
+            return self._response.readinto(buffer)
+        except _TRANSPORT_ERRORS as e:
+            raise HttpException from e
+
+
+class _Meter(object):
+    """
+    Counts the bytes read from a response, and the time spent waiting for
+    them.
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def read(self, size: int = -1) -> bytes:
+        started = time.perf_counter()
+        data = self._response.read(size)
+        self.seconds += time.perf_counter() - started
+        self.bytes += len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        started = time.perf_counter()
+        count = self._response.readinto(buffer)
+        self.seconds += time.perf_counter() - started
+        self.bytes += count or 0
+        return count
+
+
+class _ConnectionPool(object):
+    """
+    Idle keep-alive connections to a single scheme/host/port.
+
+    Any number of connections may be in use at a time, but at most `size` of
+    them are kept around for re-use once they are released.
+    """
+
+    def __init__(self, scheme: str, netloc: str, size: int, timeout: float):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.size = size
+        self.timeout = timeout
+        self._idle = []  # type: List[http_client.HTTPConnection]
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Tuple[http_client.HTTPConnection, bool]:
+        """
+        :return: A connection, and whether it has been used before
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self.connect(), False
+
+    def connect(self) -> http_client.HTTPConnection:
+        """
+        :return: A new connection, not yet opened
+        """
+        if self.scheme == 'https':
+            return http_client.HTTPSConnection(self.netloc,
+                                               timeout=self.timeout)
+        return http_client.HTTPConnection(self.netloc, timeout=self.timeout)
+
+    def release(self, conn: http_client.HTTPConnection, reusable: bool) \
+            -> None:
+        if reusable:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
 class HttpClient(object):
     """
-    Exists primarily to encapsulate urllib and to allow for convenient 
-    unit-testing.
-    
-    There are other methods to monkey-patch urllib or to install custom
-    "openers", but adding this layer of indirection seemed cleaner.
+    Exists primarily to encapsulate the HTTP transport and to allow for
+    convenient unit-testing.
+
+    Connections are kept alive and re-used between requests to the same host,
+    which saves a DNS lookup, TCP connect and TLS handshake per request.
+    Responses are requested gzip-compressed and decompressed transparently.
     """
+    DEFAULT_POOL_SIZE = 4
+    MAX_REDIRECTS = 5
 
-    def __init__(self):
-        pass
+    # Bytes we're willing to read past the end of what a caller consumed, so
+    # that the connection can be returned to the pool.
+    DRAIN_LIMIT = 64 * 1024
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = None, profiler: Profiler = None):
+        """
+        :param pool_size: Idle connections to keep per host
+        :param timeout: Socket timeout in seconds, or None for the default
+        :param profiler: Records the time, bytes and retries of each request
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.profiler = profiler if profiler is not None \
+            else Profiler(enabled=False)
+        self._pools = {}  # type: Dict[Tuple[str, str], _ConnectionPool]
+        self._pools_lock = threading.Lock()
+        self._tempfiles = []  # type: List[str]
 
     def _get_final_url(self, url: str, extra_params: Dict = None) -> str:
         if extra_params is None:
@@ -39,31 +185,189 @@ class HttpClient(object):
 
         return parse.urlunparse(url_components)
 
+    def _get_pool(self, scheme: str, netloc: str) -> _ConnectionPool:
+        key = (scheme, netloc)
+        with self._pools_lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = _ConnectionPool(scheme, netloc, self.pool_size,
+                                       self.timeout)
+                self._pools[key] = pool
+            return pool
+
+    def _request_headers(self, extra_headers: Dict[str, str] = None) \
+            -> Dict[str, str]:
+        headers = {
+            'Accept-Encoding': 'gzip',
+            'Connection':      'keep-alive',
+        }
+        if extra_headers:
+            headers.update(extra_headers)
+        return headers
+
+    def _send(self, pool: _ConnectionPool, target: str,
+              headers: Dict[str, str]):
+        """
+        :return: The response, the connection it arrived on, and whether
+            the request had to be retried
+        """
+        conn, reused = pool.acquire()
+        try:
+            conn.request('GET', target, headers=headers)
+            return conn.getresponse(), conn, False
+        except _TRANSPORT_ERRORS:
+            conn.close()
+            if not reused:
+                raise
+
+        # The server had already dropped the idle connection we picked, so
+        # try once more on a new one.
+        conn = pool.connect()
+        try:
+            conn.request('GET', target, headers=headers)
+            return conn.getresponse(), conn, True
+        except _TRANSPORT_ERRORS:
+            conn.close()
+            raise
+
+    def _finish(self, pool: _ConnectionPool, conn, response) -> None:
+        """
+        Returns a connection to its pool if the response on it has been read
+        to the end (or nearly so), otherwise closes it.
+        """
+        try:
+            remaining = self.DRAIN_LIMIT
+            while not response.isclosed() and remaining > 0:
+                chunk = response.read(min(remaining, 8192))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+            reusable = response.isclosed() and not response.will_close
+        except _TRANSPORT_ERRORS:
+            reusable = False
+        pool.release(conn, reusable)
+
+    @contextmanager
+    def _open(self, final_url: str, extra_headers: Dict[str, str] = None) \
+            -> Iterator[Tuple[BinaryIO, Dict[str, str]]]:
+        headers = self._request_headers(extra_headers)
+        started = time.perf_counter()
+        retries = 0
+        for _ in range(self.MAX_REDIRECTS + 1):
+            parts = parse.urlsplit(final_url)
+            if parts.scheme not in ('http', 'https'):
+                raise HttpException("Unsupported URL: %s" % final_url)
+            pool = self._get_pool(parts.scheme, parts.netloc)
+            target = parse.urlunsplit(('', '', parts.path or '/',
+                                       parts.query, ''))
+            try:
+                response, conn, retried = self._send(pool, target, headers)
+            except _TRANSPORT_ERRORS as e:
+                raise HttpException from e
+            retries += retried
+
+            status = response.status
+            response_headers = dict(response.getheaders())
+            location = response.getheader('Location')
+
+            if status == 304:
+                self._finish(pool, conn, response)
+                raise HttpNotModified("Not modified: %s" % final_url,
+                                      status, response_headers)
+            if 300 <= status < 400 and location:
+                self._finish(pool, conn, response)
+                final_url = parse.urljoin(final_url, location)
+                continue
+            if status >= 400:
+                self._finish(pool, conn, response)
+                raise HttpException("HTTP %d for %s" % (status, final_url),
+                                    status, response_headers)
+            break
+        else:
+            raise HttpException("Too many redirects for %s" % final_url)
+
+        waited = time.perf_counter() - started
+        body = response  # type: BinaryIO
+        meter = None
+        if self.profiler.enabled:
+            body = meter = _Meter(response)
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.GzipFile(fileobj=body, mode='rb')
+            # Callers see the decoded body, so don't describe the encoded one
+            for name in list(response_headers):
+                if name.lower() in ('content-encoding', 'content-length'):
+                    del response_headers[name]
+
+        try:
+            yield io.BufferedReader(_SafeReader(body)), response_headers
+        finally:
+            self._finish(pool, conn, response)
+            if meter is not None:
+                # Bytes as they came over the wire, before decompression
+                self.profiler.record(Profiler.NETWORK, waited + meter.seconds,
+                                     bytes=meter.bytes, retries=retries)
+
     def get(self, url: str, extra_params: Dict = None) \
             -> Tuple[bytes, Dict[str, str]]:
 
         final_url = self._get_final_url(url, extra_params)
-        try:
-            with request.urlopen(final_url) as result:
-                return result.read(), dict(result.info())
-        except (HTTPError, URLError, ContentTooShortError) as e:
-            raise HttpException from e
+        with self._open(final_url) as (body, headers):
+            return body.read(), headers
+
+    @contextmanager
+    def stream(self, url: str, extra_params: Dict = None,
+               headers: Dict[str, str] = None) \
+            -> Iterator[Tuple[BinaryIO, Dict[str, str]]]:
+        """
+        Like get(), but rather than reading the whole body up-front, provides
+        a file-like object to read it from while it arrives. For use in a
+        with-statement, which releases the connection afterwards.
+
+        :param url: URL to GET
+        :param extra_params: Key-values to append to URL
+        :param headers: Additional request headers, such as If-None-Match
+        :return: Readable body and HTTP headers
+        :raises HttpNotModified: If a conditional request got a 304
+        """
+        final_url = self._get_final_url(url, extra_params)
+        with self._open(final_url, headers) as (body, response_headers):
+            yield body, response_headers
 
     def download(self, url: str, extra_params: Dict = None) \
             -> Tuple[str, Dict[str, str]]:
-        """        
-        Behaves similarly to urllib.request.urlretrieve()
+        """
+        Behaves similarly to urllib.request.urlretrieve(). The file is removed
+        by cleanup().
+
         :param url: URL to GET
         :param extra_params: Key-values to append to URL
         :return: File path and HTTP headers
         """
+        # Nothing streams through temporary files any more, so don't make
+        # every caller import these
+        import shutil
+        from tempfile import mkstemp
+
         final_url = self._get_final_url(url, extra_params)
-        try:
-            # Docs suggest urlretrieve API may be deprecated in future
-            temp_file, headers = request.urlretrieve(final_url)
-            return temp_file, headers
-        except (HTTPError, URLError, ContentTooShortError) as e:
-            raise HttpException from e
+        (fd, temp_file) = mkstemp()
+        self._tempfiles.append(temp_file)
+        with os.fdopen(fd, 'wb') as fh:
+            with self._open(final_url) as (body, headers):
+                shutil.copyfileobj(body, fh)
+        return temp_file, headers
+
+    def close(self) -> None:
+        """
+        Closes any idle connections.
+        """
+        with self._pools_lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
 
     def cleanup(self):
-        request.urlcleanup()
+        while self._tempfiles:
+            try:
+                os.unlink(self._tempfiles.pop())
+            except FileNotFoundError:
+                pass
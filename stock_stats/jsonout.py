@@ -0,0 +1,162 @@
+import json
+from datetime import date
+from json.encoder import encode_basestring_ascii
+from typing import Any, Iterator, Optional
+
+INFINITY = float('inf')
+
+
+def dumps(value: Any, pretty: bool = False) -> str:
+    """
+    Encodes a whole document with json.dumps(), which is much faster than
+    iter_json() when nothing needs to be written before the end. Dates are
+    written as ISO-8601 strings, as keys as well as values.
+
+    :param pretty: Sort keys and indent by four spaces
+    """
+    value = _iso_keys(value)
+    if pretty:
+        return json.dumps(value, sort_keys=True, indent=4,
+                          separators=(',', ': '), default=_iso_date)
+    return json.dumps(value, default=_iso_date)
+
+
+def _iso_date(value: Any) -> str:
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError("Object of type %s is not JSON serializable"
+                    % type(value).__name__)
+
+
+def _iso_keys(value: Any) -> Any:
+    """
+    :return: The value, with any dictionaries in it copied so that their date
+        keys are ISO-8601 strings. The standard encoders can only call back
+        for values, not keys. See: https://bugs.python.org/issue18820
+    """
+    if isinstance(value, dict):
+        return {key.isoformat() if isinstance(key, date) else key:
+                _iso_keys(item) for key, item in value.items()}
+    elif isinstance(value, (list, tuple)):
+        return [_iso_keys(item) if isinstance(item, (dict, list, tuple))
+                else item for item in value]
+    return value
+
+
+def iter_json(value: Any, pretty: bool = False) -> Iterator[str]:
+    """
+    Encodes a value as JSON a piece at a time. The output is what
+    json.dumps() gives with the options print_json() uses, except that dates
+    become ISO-8601 strings along the way, as keys as well as values. The
+    standard encoders only accept them as values, so analysis results would
+    otherwise have to be copied with their dates converted first.
+
+    :param pretty: Sort keys and indent by four spaces
+    """
+    if pretty:
+        return _iter_value(value, '\n', 0)
+    return _iter_value(value, None, 0)
+
+
+def _float(value: float) -> str:
+    # Same spellings as json.dumps()
+    if value != value:
+        return 'NaN'
+    elif value == INFINITY:
+        return 'Infinity'
+    elif value == -INFINITY:
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+def _key(key: Any) -> str:
+    if isinstance(key, str):
+        return key
+    elif isinstance(key, date):
+        return key.isoformat()
+    elif key is True:
+        return 'true'
+    elif key is False:
+        return 'false'
+    elif key is None:
+        return 'null'
+    elif isinstance(key, int):
+        return int.__repr__(key)
+    elif isinstance(key, float):
+        return _float(key)
+    raise TypeError("Keys must be str, date, int, float, bool or None, not %s"
+                    % type(key).__name__)
+
+
+def _iter_value(value: Any, newline: Optional[str], level: int) \
+        -> Iterator[str]:
+    # Scalars first, most common first
+    if isinstance(value, str):
+        yield encode_basestring_ascii(value)
+    elif isinstance(value, float):
+        yield _float(value)
+    elif value is True:
+        yield 'true'
+    elif value is False:
+        yield 'false'
+    elif isinstance(value, int):
+        yield int.__repr__(value)
+    elif value is None:
+        yield 'null'
+    elif isinstance(value, date):
+        yield '"%s"' % value.isoformat()
+    elif isinstance(value, dict):
+        yield from _iter_dict(value, newline, level)
+    elif isinstance(value, (list, tuple)):
+        yield from _iter_list(value, newline, level)
+    else:
+        raise TypeError("Object of type %s is not JSON serializable"
+                        % type(value).__name__)
+
+
+def _iter_dict(value: dict, newline: Optional[str], level: int) \
+        -> Iterator[str]:
+    if not value:
+        yield '{}'
+        return
+    if newline is None:
+        items = value.items()
+        opening, separator, closing = '{', ', ', '}'
+    else:
+        items = sorted(value.items())
+        inner = newline + '    ' * (level + 1)
+        opening, separator = '{' + inner, ',' + inner
+        closing = newline + '    ' * level + '}'
+
+    yield opening
+    first = True
+    for key, item in items:
+        if not first:
+            yield separator
+        first = False
+        yield encode_basestring_ascii(_key(key))
+        yield ': '
+        yield from _iter_value(item, newline, level + 1)
+    yield closing
+
+
+def _iter_list(value: list, newline: Optional[str], level: int) \
+        -> Iterator[str]:
+    if not value:
+        yield '[]'
+        return
+    if newline is None:
+        opening, separator, closing = '[', ', ', ']'
+    else:
+        inner = newline + '    ' * (level + 1)
+        opening, separator = '[' + inner, ',' + inner
+        closing = newline + '    ' * level + ']'
+
+    yield opening
+    first = True
+    for item in value:
+        if not first:
+            yield separator
+        first = False
+        yield from _iter_value(item, newline, level + 1)
+    yield closing
@@ -0,0 +1,27 @@
+import os
+
+
+# Kept apart from the modules that use these locations, so that building the
+# command-line parser doesn't have to import any of them.
+
+def default_cache_dir() -> str:
+    """
+    :return: Per-user cache location, honoring XDG_CACHE_HOME when set.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'stock_stats')
+
+
+def default_store_path() -> str:
+    """
+    :return: Per-user location of the local price store, next to the cache
+    """
+    return os.path.join(default_cache_dir(), 'wiki_prices.sqlite3')
+
+
+def default_binary_dir() -> str:
+    """
+    :return: Per-user location of the binary price files, next to the cache
+    """
+    return os.path.join(default_cache_dir(), 'binary')
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List
+
+COUNTERS = ('bytes', 'rows', 'retries')
+
+
+class Profiler(object):
+    """
+    Collects wall time and counters (bytes, rows, retries) for each phase of
+    a run, per symbol: network transfers, waiting out rate limits, decoding,
+    conversion, analysis and output.
+
+    Phases may nest, and each one's time excludes that of the phases and
+    measurements made inside it on the same thread. So streaming decoding,
+    which waits on the network as it goes, is only charged for the decoding.
+
+    The symbol being worked on is tracked per thread with symbol(), so that
+    lower layers such as HttpClient needn't know about symbols at all.
+
+    Hooks are called with every measurement as it is made, say to feed
+    another metrics system. A disabled profiler measures nothing, and costs
+    next to nothing.
+    """
+    NETWORK = 'network'
+    THROTTLE = 'throttle'
+    DECODE = 'decode'
+    CONVERT = 'convert'
+    CACHE = 'cache'
+    STORE = 'store'
+    ANALYSIS = 'analysis'
+    OUTPUT = 'output'
+
+    def __init__(self, enabled: bool = True,
+                 hooks: List[Callable[[Dict[str, Any]], None]] = None):
+        self.enabled = enabled
+        self.hooks = list(hooks or [])
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Keyed by symbol (None for work not about any one symbol), then phase
+        self._stats = OrderedDict()  # type: Dict[Any, Dict]
+
+    def _state(self) -> threading.local:
+        local = self._local
+        if not hasattr(local, 'nested'):
+            local.symbol = None
+            local.nested = []  # Time measured inside each open phase
+        return local
+
+    @contextmanager
+    def symbol(self, symbol: str) -> Iterator[None]:
+        """
+        Attributes everything measured on this thread to a symbol, until the
+        with-block ends.
+        """
+        if not self.enabled:
+            yield
+            return
+        state = self._state()
+        previous, state.symbol = state.symbol, symbol
+        try:
+            yield
+        finally:
+            state.symbol = previous
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Dict[str, int]]:
+        """
+        Times the with-block as the named phase.
+
+        :return: Counters for the block to add to, such as 'rows'
+        """
+        counters = dict.fromkeys(COUNTERS, 0)
+        if not self.enabled:
+            yield counters
+            return
+        state = self._state()
+        state.nested.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = state.nested.pop()
+            if state.nested:
+                state.nested[-1] += elapsed
+            self._add(state, name, elapsed - nested, counters)
+
+    def record(self, name: str, seconds: float, **counters: int) -> None:
+        """
+        Adds a measurement made some other way than with phase(), for
+        instance by summing the time of many small reads.
+        """
+        if self.enabled:
+            state = self._state()
+            if state.nested:
+                state.nested[-1] += seconds
+            self._add(state, name, seconds, counters)
+
+    def _add(self, state: threading.local, name: str, seconds: float,
+             counters: Dict[str, int]) -> None:
+        with self._lock:
+            phases = self._stats.setdefault(state.symbol, OrderedDict())
+            stats = phases.get(name)
+            if stats is None:
+                stats = phases[name] = dict(seconds=0.0, calls=0,
+                                            **dict.fromkeys(COUNTERS, 0))
+            stats['seconds'] += seconds
+            stats['calls'] += 1
+            for key, value in counters.items():
+                stats[key] += value
+
+        if self.hooks:
+            measurement = dict(symbol=state.symbol, phase=name,
+                               seconds=seconds, **counters)
+            for hook in self.hooks:
+                hook(measurement)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        :return: Totals per symbol and phase, and per phase over everything
+        """
+        with self._lock:
+            totals = OrderedDict()  # type: Dict[str, Dict]
+            symbols = OrderedDict()
+            for symbol, phases in self._stats.items():
+                if symbol is not None:
+                    symbols[symbol] = {k: dict(v) for k, v in phases.items()}
+                for name, stats in phases.items():
+                    total = totals.setdefault(name, dict.fromkeys(stats, 0))
+                    for key, value in stats.items():
+                        total[key] += value
+        return {'symbols': symbols, 'totals': totals}
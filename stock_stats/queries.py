@@ -0,0 +1,109 @@
+import argparse
+from datetime import date
+from typing import Any, Callable, Dict, List
+
+from .client import StockClient
+from .command_line import compute_biggest_loser, compute_busy_days, \
+    compute_cross_section, compute_month_averages, compute_report, \
+    compute_rolling, compute_top_variance_days, _parse_month_begin, \
+    _parse_month_end, _parse_positive_int
+
+
+class QueryError(Exception):
+    """
+    A query can't be answered as asked.
+    """
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+# For each analysis, its function and the extra options it accepts, with how
+# to check each one.
+_ANALYSES = {
+    'month-averages':    (compute_month_averages, {}),
+    'top-variance-days': (compute_top_variance_days, {}),
+    'busy-days':         (compute_busy_days,
+                          {'trailing_window': _parse_positive_int}),
+    'biggest-loser':     (compute_biggest_loser,
+                          {'top': _parse_positive_int, 'all_symbols': bool}),
+    'report':            (compute_report, {}),
+    'rolling':           (compute_rolling, {'window': _parse_positive_int}),
+    'cross-section':     (compute_cross_section, {}),
+}
+
+
+def _parse_param(params: Dict[str, Any], name: str, parse: Callable) -> Any:
+    try:
+        if parse is bool:
+            return bool(params[name])
+        # Re-use the command-line checks, which expect strings
+        return parse(str(params[name]))
+    except (KeyError, argparse.ArgumentTypeError) as e:
+        raise QueryError("Invalid or missing %s" % name) from e
+
+
+class Query(object):
+    """
+    One run of an analysis sub-command, with its arguments given as a JSON
+    object rather than on the command line. For example:
+
+        {"symbols": ["GOOGL"], "start_month": "2017-01",
+         "end_month": "2017-06", "adjusted": false, "trailing_window": 50}
+    """
+
+    def __init__(self, action: str, symbols: List[str], start_date: date,
+                 end_date: date, adjusted: bool = False,
+                 options: Dict[str, Any] = None):
+        """
+        :param action: Name of the sub-command, such as "busy-days"
+        :param options: Extra keyword arguments for its compute function
+        """
+        self.action = action
+        self.symbols = symbols
+        self.start_date = start_date
+        self.end_date = end_date
+        self.adjusted = adjusted
+        self.options = options if options is not None else {}
+
+    @classmethod
+    def parse(cls, action: str, params: Dict[str, Any]) -> 'Query':
+        """
+        :raises QueryError: If there is no such analysis, or the arguments
+            are malformed
+        """
+        if action not in _ANALYSES:
+            raise QueryError("Unknown query %s" % action, status=404)
+        _, options = _ANALYSES[action]
+
+        symbols = params.get('symbols', [])
+        if not isinstance(symbols, list) or \
+                not all(isinstance(s, str) for s in symbols):
+            raise QueryError("Expected a list of symbols")
+        extra = {name: _parse_param(params, name, parse)
+                 for name, parse in options.items() if name in params}
+        if not symbols and not extra.get('all_symbols'):
+            raise QueryError("No symbols given")
+
+        return cls(action, symbols,
+                   _parse_param(params, 'start_month', _parse_month_begin),
+                   _parse_param(params, 'end_month', _parse_month_end),
+                   bool(params.get('adjusted', False)), extra)
+
+    def planned_symbols(self, client: StockClient) -> List[str]:
+        """
+        :return: Every symbol the query will fetch
+        :raises StockException: If the universe of symbols can't be listed
+        """
+        if self.options.get('all_symbols'):
+            return client.get_universe()
+        return self.symbols
+
+    def run(self, client: StockClient, jobs: int = 1) -> Any:
+        """
+        :return: The JSON-able result the sub-command would print
+        :raises StockException: If the analysis fails
+        """
+        compute, _ = _ANALYSES[self.action]
+        return compute(client, self.symbols, self.start_date, self.end_date,
+                       self.adjusted, jobs, **self.options)
@@ -0,0 +1,108 @@
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+
+def chronological(ordinals: Sequence[int]) -> range:
+    """
+    :param ordinals: Dates of a series sorted either way, such as the newest-
+        first order the API uses
+    :return: Row indexes from oldest to newest
+    """
+    count = len(ordinals)
+    if count > 1 and ordinals[0] > ordinals[-1]:
+        return range(count - 1, -1, -1)
+    return range(count)
+
+
+def rolling_mean(values: Iterable[float], window: int) \
+        -> Iterator[Optional[float]]:
+    """
+    Yields, for each value, the mean of the window ending with it, or None
+    while fewer than `window` values have been seen. A running total makes
+    each step O(1).
+    """
+    history = deque()
+    total = 0.0
+    for value in values:
+        history.append(value)
+        total += value
+        if len(history) > window:
+            total -= history.popleft()
+        yield total / window if len(history) == window else None
+
+
+def rolling_variance(values: Iterable[float], window: int) \
+        -> Iterator[Optional[float]]:
+    """
+    Yields the population variance of each full window, or None before the
+    first one. Uses Welford-style add/remove updates rather than sums of
+    squares, which lose precision for large prices.
+    """
+    history = deque()
+    mean = 0.0
+    squares = 0.0  # Sum of squared differences from the mean
+    for value in values:
+        history.append(value)
+        count = len(history)
+        delta = value - mean
+        mean += delta / count
+        squares += delta * (value - mean)
+        if count > window:
+            old = history.popleft()
+            count -= 1
+            delta = old - mean
+            mean -= delta / count
+            squares -= delta * (old - mean)
+        yield max(squares, 0.0) / window if count == window else None
+
+
+def _rolling_extreme(values: Iterable[float], window: int, better) \
+        -> Iterator[Optional[float]]:
+    # The deque holds (index, value) candidates in order of arrival, whose
+    # values get strictly worse from front to back. Each value enters and
+    # leaves it at most once, so the whole series costs O(n).
+    candidates = deque()
+    for i, value in enumerate(values):
+        while candidates and not better(candidates[-1][1], value):
+            candidates.pop()
+        candidates.append((i, value))
+        if candidates[0][0] <= i - window:
+            candidates.popleft()
+        yield candidates[0][1] if i + 1 >= window else None
+
+
+def rolling_max(values: Iterable[float], window: int) \
+        -> Iterator[Optional[float]]:
+    """
+    Yields the maximum of each full window, or None before the first one.
+    """
+    return _rolling_extreme(values, window, lambda kept, new: kept > new)
+
+
+def rolling_min(values: Iterable[float], window: int) \
+        -> Iterator[Optional[float]]:
+    """
+    Yields the minimum of each full window, or None before the first one.
+    """
+    return _rolling_extreme(values, window, lambda kept, new: kept < new)
+
+
+def trailing_mean(values: Iterable[float], window: int) \
+        -> Iterator[Optional[float]]:
+    """
+    Like rolling_mean(), but each mean covers the `window` values before the
+    current one, not including it.
+    """
+    previous = None
+    for mean in rolling_mean(values, window):
+        yield previous
+        previous = mean
+
+
+def in_order(column: Sequence[float], order: range) -> List[float]:
+    """
+    :return: The column's values rearranged into the given row order
+    """
+    if order.step < 0:
+        return list(reversed(column))
+    return list(column)
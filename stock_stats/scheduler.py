@@ -0,0 +1,272 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+from .http import HttpClient, HttpException, HttpNotModified
+from .profiling import Profiler
+
+
+class TokenBucket(object):
+    """
+    Spaces requests out to an average of `rate` per second, while letting up
+    to `burst` of them through at once after a quiet spell.
+    """
+
+    def __init__(self, rate: float, burst: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Takes a token, borrowing against future ones if there are none left.
+
+        :return: Seconds to wait before the token may be used
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(float(self.burst), self._tokens +
+                               (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class RequestScheduler(object):
+    """
+    Sits in front of an HttpClient, with the same interface, and keeps our
+    requests within the server's rate limits.
+
+    - A token bucket caps the request rate.
+    - The number of requests in flight adapts to how the server copes: it
+      grows by one per round of successful requests, and halves whenever the
+      server is overloaded (429 or 5xx) or the connection fails.
+    - Such requests are retried after a capped exponential backoff with full
+      jitter, so that parallel downloads don't all retry in lockstep. If the
+      server says how long to wait with Retry-After, every request waits at
+      least that long.
+
+    Only failures before a response body arrives are retried. Once a caller
+    has begun reading a stream, errors are theirs to handle, though they may
+    ask wait_before_retry() whether to try again.
+    """
+    DEFAULT_RATE = 20.0
+    DEFAULT_CONCURRENCY = 4
+    DEFAULT_RETRIES = 5
+    DEFAULT_BACKOFF = 0.5
+    DEFAULT_MAX_BACKOFF = 30.0
+
+    def __init__(self, http_client: HttpClient, rate: float = DEFAULT_RATE,
+                 max_concurrency: int = DEFAULT_CONCURRENCY,
+                 max_retries: int = DEFAULT_RETRIES,
+                 backoff: float = DEFAULT_BACKOFF,
+                 max_backoff: float = DEFAULT_MAX_BACKOFF):
+        """
+        :param rate: Requests per second to stay under on average
+        :param max_concurrency: Most requests to have in flight at a time
+        :param max_retries: Retries per request before giving up
+        :param backoff: Seconds before the first retry, doubled for each
+            retry after it
+        :param max_backoff: Longest to wait before a retry. If Retry-After
+            asks for longer, the request fails instead.
+        """
+        self.http = http_client
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.profiler = getattr(http_client, 'profiler', None) \
+            or Profiler(enabled=False)
+        self._bucket = TokenBucket(rate, burst=self.max_concurrency)
+        self._limit = float(self.max_concurrency)
+        self._in_flight = 0
+        self._resume_at = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def concurrency(self) -> int:
+        """
+        :return: How many requests may currently be in flight
+        """
+        return max(1, int(self._limit))
+
+    def _acquire(self) -> None:
+        started = time.monotonic()
+        with self._condition:
+            while True:
+                pause = self._resume_at - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self._in_flight < self.concurrency:
+                    break
+                else:
+                    self._condition.wait()
+            self._in_flight += 1
+
+        delay = self._bucket.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.profiler.record(Profiler.THROTTLE, waited)
+
+    def _release(self, error: HttpException = None,
+                 succeeded: bool = True) -> None:
+        """
+        :param error: Why the request failed, if it did
+        :param succeeded: Whether a request without an error counts as a
+            success. Not if it was the caller that gave up on it.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            if error is None and succeeded:
+                # Additive increase, of one per round of requests
+                self._limit = min(float(self.max_concurrency),
+                                  self._limit + 1 / self._limit)
+            elif error is not None and self._is_retryable(error):
+                # Multiplicative decrease
+                self._limit = max(1.0, self._limit / 2)
+            self._condition.notify_all()
+
+    @staticmethod
+    def _is_retryable(error: HttpException) -> bool:
+        if isinstance(error, HttpNotModified):
+            return False
+        if error.status is None:
+            # We never got an answer. Worth another try if the connection
+            # failed or timed out, not if the URL or the response itself
+            # was bad.
+            return isinstance(error.__cause__, OSError)
+        return error.status == 429 or error.status >= 500
+
+    @staticmethod
+    def _retry_after(headers: Dict[str, str]) -> Optional[float]:
+        """
+        :return: Seconds the server asked us to wait, if it did
+        """
+        value = next((v for k, v in headers.items()
+                      if k.lower() == 'retry-after'), None)
+        if value is None:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        from email.utils import parsedate_to_datetime
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+    def _retry_delay(self, error: HttpException, attempt: int) \
+            -> Optional[float]:
+        """
+        :param attempt: Retries made so far
+        :return: Seconds to wait before retrying, or None to give up
+        """
+        if not self._is_retryable(error) or attempt >= self.max_retries:
+            return None
+        delay = random.uniform(0, min(self.max_backoff,
+                                      self.backoff * 2 ** attempt))
+        retry_after = self._retry_after(error.headers)
+        if retry_after is not None:
+            if retry_after > self.max_backoff:
+                return None
+            # Hold back every request, not only this one
+            with self._condition:
+                self._resume_at = max(self._resume_at,
+                                      time.monotonic() + retry_after)
+            delay = max(delay, retry_after)
+        return delay
+
+    def _wait_to_retry(self, delay: float) -> None:
+        time.sleep(delay)
+        self.profiler.record(Profiler.THROTTLE, delay, retries=1)
+
+    def wait_before_retry(self, error: HttpException, attempt: int) -> bool:
+        """
+        For callers retrying a failure this scheduler couldn't retry by
+        itself, such as a stream breaking off part-way through its body.
+        Waits out the same backoff, within the same number of retries.
+
+        :param attempt: Retries the caller has made so far
+        :return: Whether to try again
+        """
+        delay = self._retry_delay(error, attempt)
+        if delay is None:
+            return False
+        self._wait_to_retry(delay)
+        return True
+
+    def _call(self, function: Callable[[], Any]) -> Any:
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                result = function()
+            except HttpException as e:
+                self._release(e)
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                self._wait_to_retry(delay)
+                attempt += 1
+                continue
+            self._release()
+            return result
+
+    def get(self, url: str, extra_params: Dict = None) \
+            -> Tuple[bytes, Dict[str, str]]:
+        return self._call(lambda: self.http.get(url, extra_params))
+
+    @contextmanager
+    def stream(self, url: str, extra_params: Dict = None,
+               headers: Dict[str, str] = None) \
+            -> Iterator[Tuple[BinaryIO, Dict[str, str]]]:
+        """
+        See HttpClient.stream(). The request counts as in flight until the
+        with-block ends.
+        """
+        attempt = 0
+        while True:
+            self._acquire()
+            opened = False
+            try:
+                with self.http.stream(url, extra_params, headers) as result:
+                    opened = True
+                    yield result
+            except HttpException as e:
+                self._release(e)
+                delay = None if opened else self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                self._wait_to_retry(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # The caller's own failure says nothing about the server
+                self._release(succeeded=False)
+                raise
+            self._release()
+            return
+
+    def download(self, url: str, extra_params: Dict = None) \
+            -> Tuple[str, Dict[str, str]]:
+        return self._call(lambda: self.http.download(url, extra_params))
+
+    def close(self) -> None:
+        self.http.close()
+
+    def cleanup(self) -> None:
+        self.http.cleanup()
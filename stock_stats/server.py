@@ -0,0 +1,103 @@
+import json
+import sys
+import traceback
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, Tuple
+
+from .client import StockClient, StockException
+from .jsonout import dumps
+from .queries import Query, QueryError
+
+
+class QueryServer(ThreadingMixIn, HTTPServer):
+    """
+    Answers the queries of the analysis sub-commands over HTTP. Requests are
+    handled concurrently, by one StockClient, so its connections, caches and
+    recently used series stay warm from one query to the next.
+
+    Each query is a POST to /<sub-command> with a JSON object of arguments
+    (see Query), and the answer is the JSON the sub-command would print.
+
+    The symbol listing is available as a POST to /list-symbols.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], client: StockClient,
+                 jobs: int = 1, pretty: bool = False):
+        """
+        :param jobs: Download up to this many symbols in parallel per query
+        :param pretty: Use pretty-printing in JSON responses
+        """
+        super().__init__(address, QueryHandler)
+        self.client = client
+        self.jobs = jobs
+        self.pretty = pretty
+
+    def run_query(self, action: str, params: Dict[str, Any]) -> Any:
+        """
+        :return: The JSON-able result of a query
+        :raises QueryError: If the query is malformed
+        :raises StockException: If the analysis fails
+        """
+        if action == 'list-symbols':
+            return self.client.get_symbols()
+        return Query.parse(action, params).run(self.client, self.jobs)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    # Let callers that send many queries keep their connection open
+    protocol_version = 'HTTP/1.1'
+
+    server = None  # type: QueryServer
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length)
+            try:
+                params = json.loads(body.decode('utf-8')) if body else {}
+            except ValueError as e:
+                raise QueryError("Invalid JSON") from e
+            if not isinstance(params, dict):
+                raise QueryError("Expected a JSON object")
+            status = 200
+            result = self.server.run_query(self.path.strip('/'), params)
+        except QueryError as e:
+            status, result = e.status, {'error': str(e)}
+        except StockException as e:
+            status, result = 502, {'error': str(e)}
+        except Exception as e:
+            # A bug of ours, but the caller is still owed an answer
+            traceback.print_exc(file=sys.stderr)
+            status, result = 500, {'error': "Internal error: %s" % (e,)}
+        self._send_json(status, result)
+
+    def _send_json(self, status: int, data: Any) -> None:
+        payload = dumps(data, self.server.pretty).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args) -> None:
+        # A line per query would drown out anything worth reading
+        pass
+
+
+def serve(client: StockClient, host: str, port: int, jobs: int = 1,
+          pretty: bool = False) -> int:
+    """
+    Runs a QueryServer until interrupted.
+    """
+    server = QueryServer((host, port), client, jobs, pretty)
+    print("Serving on http://%s:%d/" % server.server_address[:2],
+          file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
@@ -0,0 +1,220 @@
+import os
+import threading
+from datetime import date
+from typing import Iterator, List, Optional, Sequence
+
+from .timeseries import Timeseries
+
+
+class StoreException(Exception):
+    """
+    Something is wrong with a bulk export or the local price store.
+    """
+    pass
+
+
+class LocalStore(object):
+    """
+    SQLite database of daily prices for every symbol, loaded from a WIKI bulk
+    export, so that analyses can run without any network access.
+
+    Columns are stored under the same names the API uses, and series come back
+    newest-first, so results match those computed from downloaded data.
+    """
+
+    # API column names, in the order bulk exports list them after the ticker
+    # and date.
+    VALUE_COLUMNS = [
+        'Open', 'High', 'Low', 'Close', 'Volume', 'Ex-Dividend', 'Split Ratio',
+        'Adj. Open', 'Adj. High', 'Adj. Low', 'Adj. Close', 'Adj. Volume',
+    ]
+
+    # Header spellings used by bulk exports, for the columns above
+    EXPORT_HEADERS = [
+        'open', 'high', 'low', 'close', 'volume', 'ex-dividend', 'split_ratio',
+        'adj_open', 'adj_high', 'adj_low', 'adj_close', 'adj_volume',
+    ]
+
+    SQL_COLUMNS = ['c%d' % i for i in range(len(VALUE_COLUMNS))]
+
+    DEFAULT_CHUNK_ROWS = 10000
+
+    def __init__(self, path: str):
+        """
+        :param path: Database file, created if necessary
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+
+        # Analyses may read from several threads at once
+        self._lock = threading.Lock()
+        # Imported here so that binary price files, which borrow our column
+        # names, don't pay for it
+        import sqlite3
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS prices (
+                    symbol  TEXT NOT NULL,
+                    ordinal INTEGER NOT NULL,
+                    %s,
+                    PRIMARY KEY (symbol, ordinal)
+                ) WITHOUT ROWID
+            """ % ",\n".join("%s REAL" % c for c in self.SQL_COLUMNS))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def has_symbol(self, symbol: str) -> bool:
+        with self._lock:
+            found = self._db.execute(
+                "SELECT 1 FROM prices WHERE symbol = ? LIMIT 1",
+                (symbol,)).fetchone()
+        return found is not None
+
+    def get_timeseries(self, symbol: str, start: date, end: date) \
+            -> Timeseries:
+        """
+        :return: Rows for the symbol within the inclusive range, newest first
+        :raises StoreException: If the store has no data for the symbol
+        """
+        if not self.has_symbol(symbol):
+            raise StoreException("No local data for symbol %s" % symbol)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT ordinal, %s FROM prices WHERE symbol = ? "
+                "AND ordinal BETWEEN ? AND ? ORDER BY ordinal DESC"
+                % ", ".join(self.SQL_COLUMNS),
+                (symbol, start.toordinal(), end.toordinal())).fetchall()
+
+        series = Timeseries(self.VALUE_COLUMNS)
+        for row in rows:
+            series.append(row[0], row[1:])
+        return series
+
+    def ingest(self, path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+        """
+        Loads a bulk export, which may be a CSV file or a zip-file holding a
+        single CSV. Rows are read and written in chunks, so memory use does
+        not depend on the size of the export. Rows already in the store are
+        replaced.
+
+        :param path: Location of the export
+        :param chunk_rows: Rows to insert per transaction
+        :return: How many rows were loaded
+        :raises StoreException: If the export can't be read
+        """
+        insert = "INSERT OR REPLACE INTO prices (symbol, ordinal, %s) " \
+                 "VALUES (?, ?, %s)" % (", ".join(self.SQL_COLUMNS),
+                                        ", ".join("?" * len(self.SQL_COLUMNS)))
+        total = 0
+        chunk = []  # type: List[Sequence]
+        with self._lock:
+            # The export can always be loaded again, so trade durability for
+            # speed while we do it.
+            self._db.execute("PRAGMA synchronous = OFF")
+            try:
+                for row in self._read_export(path):
+                    chunk.append(row)
+                    if len(chunk) >= chunk_rows:
+                        with self._db:
+                            self._db.executemany(insert, chunk)
+                        total += len(chunk)
+                        chunk = []
+                if chunk:
+                    with self._db:
+                        self._db.executemany(insert, chunk)
+                    total += len(chunk)
+            finally:
+                self._db.execute("PRAGMA synchronous = FULL")
+        return total
+
+    def _read_export(self, path: str) -> Iterator[Sequence]:
+        # Only ingesting needs these
+        import csv
+        from io import TextIOWrapper
+        from zipfile import BadZipfile, LargeZipFile, ZipFile, is_zipfile
+
+        try:
+            if is_zipfile(path):
+                archive = ZipFile(path, 'r')
+                names = archive.namelist()
+                if len(names) != 1:
+                    raise StoreException("Expected a single file in %s" % path)
+                handle = TextIOWrapper(archive.open(names[0]),
+                                       encoding='utf-8', newline='')
+            else:
+                handle = open(path, 'rt', encoding='utf-8', newline='')
+        except (OSError, BadZipfile, LargeZipFile) as e:
+            raise StoreException("Unable to open %s" % path) from e
+
+        try:
+            with handle:
+                yield from self._convert_export_rows(csv.reader(handle))
+        except (csv.Error, BadZipfile, UnicodeDecodeError) as e:
+            raise StoreException("Error parsing %s" % path) from e
+
+    def _convert_export_rows(self, reader: Iterator[List[str]]) \
+            -> Iterator[Sequence]:
+        # Exports may or may not start with a header row. Without one, the
+        # columns are in the standard order.
+        positions = list(range(2, 2 + len(self.EXPORT_HEADERS)))
+        ticker_pos, date_pos = 0, 1
+        first = next(reader, None)
+        if first is None:
+            return
+        header = self._parse_header(first)
+        first_line = 2
+        if header is not None:
+            ticker_pos, date_pos, positions = header
+        else:
+            reader = _prepend(first, reader)
+            first_line = 1
+
+        width = max(positions + [ticker_pos, date_pos]) + 1
+        for line_number, row in enumerate(reader, start=first_line):
+            if not row:
+                continue
+            if len(row) < width:
+                raise StoreException("Too few columns on line %d"
+                                     % line_number)
+            try:
+                year, month, day = row[date_pos].split("-")
+                ordinal = date(int(year), int(month), int(day)).toordinal()
+                values = [float(row[p]) if row[p] else None
+                          for p in positions]
+            except ValueError as e:
+                raise StoreException("Bad value on line %d"
+                                     % line_number) from e
+            yield [row[ticker_pos], ordinal] + values
+
+    def _parse_header(self, row: List[str]) -> Optional[tuple]:
+        names = {name.strip().lower(): i for i, name in enumerate(row)}
+        if 'ticker' not in names or 'date' not in names:
+            return None
+        missing = [h for h in self.EXPORT_HEADERS if h not in names]
+        if missing:
+            raise StoreException("Export lacks columns: %s"
+                                 % ", ".join(missing))
+        positions = [names[h] for h in self.EXPORT_HEADERS]
+        return names['ticker'], names['date'], positions
+
+    def symbols(self) -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT symbol FROM prices ORDER BY symbol").fetchall()
+        return [row[0] for row in rows]
+
+    def symbol_count(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(DISTINCT symbol) FROM prices").fetchone()[0]
+
+
+def _prepend(first: List[str], rest: Iterator[List[str]]) \
+        -> Iterator[List[str]]:
+    yield first
+    yield from rest
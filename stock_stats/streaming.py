@@ -0,0 +1,193 @@
+import codecs
+import json
+import re
+import time
+from itertools import islice
+from typing import Any, BinaryIO, Iterable, List, Optional, Sequence
+
+from .profiling import Profiler
+from .timeseries import Timeseries
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _JsonScanner(object):
+    """
+    Pulls JSON text from a binary file-handle a chunk at a time, and decodes it
+    one value at a time. Only the part of the document that has not been
+    consumed yet is kept in memory.
+    """
+
+    def __init__(self, handle: BinaryIO, chunk_size: int):
+        self._handle = handle
+        self._chunk_size = chunk_size
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """
+        :return: False if there was no more data to read
+        """
+        if self._eof:
+            return False
+        chunk = self._handle.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            text = self._utf8.decode(b'', final=True)
+        else:
+            text = self._utf8.decode(chunk)
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """
+        :return: The next non-whitespace character, without consuming it
+        :raises ValueError: At the end of the document
+        """
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON data")
+
+    def take(self, expected: str) -> str:
+        """
+        Consumes the next non-whitespace character, which must be one of the
+        expected ones.
+        """
+        found = self.peek()
+        if found not in expected:
+            raise ValueError("Expected one of %r in JSON data, got %r"
+                             % (expected, found))
+        self._pos += 1
+        return found
+
+    def value(self) -> Any:
+        """
+        :return: The next complete JSON value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+
+            # A value running right up to the end of what we have so far may
+            # be a truncated number, so it only counts once more text follows.
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def members(self):
+        """
+        Yields the keys of a JSON object one at a time. After each key the
+        caller must consume exactly one value.
+        """
+        self.take('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("Expected an object key in JSON data")
+            self.take(':')
+            yield key
+            if self.take(',}') == '}':
+                return
+
+    def elements(self):
+        """
+        Yields the items of a JSON array one at a time.
+        """
+        self.take('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.take(',]') == ']':
+                return
+
+
+def _append_rows(series: Timeseries, rows: Iterable[List], date_index: int,
+                 profiler: Profiler = None) -> None:
+    if profiler is None or not profiler.enabled:
+        for row in rows:
+            series.append_row(row, date_index)
+        return
+
+    # Timing every row would cost about as much as converting it, so rows
+    # are scanned a batch at a time and only their conversion is timed
+    rows = iter(rows)
+    seconds = 0.0
+    count = 0
+    for batch in iter(lambda: list(islice(rows, 1024)), []):
+        started = time.perf_counter()
+        for row in batch:
+            series.append_row(row, date_index)
+        seconds += time.perf_counter() - started
+        count += len(batch)
+    profiler.record(Profiler.CONVERT, seconds, rows=count)
+
+
+def decode_dataset(handle: BinaryIO, date_column: str = 'Date',
+                   chunk_size: int = 64 * 1024,
+                   columns: Sequence[str] = None,
+                   profiler: Profiler = None) -> Timeseries:
+    """
+    Decodes a Quandl dataset response straight from the network, filling a
+    Timeseries with each row as soon as its bytes have arrived.
+
+    The whole response is never held in memory. The one exception is a
+    response that lists its rows before its "column_names", in which case
+    those rows must wait until we know what their columns are.
+
+    :param handle: Binary file-like object holding the response body
+    :param date_column: Name of the column holding ISO-formatted dates
+    :param chunk_size: How many bytes to read at a time
+    :param columns: Keep only these of the non-date columns, if given
+    :param profiler: If given, records the time spent converting rows into
+        the Timeseries as its CONVERT phase
+    :raises ValueError: If the data is not a well-formed dataset response
+    """
+    scanner = _JsonScanner(handle, chunk_size)
+    series = None  # type: Optional[Timeseries]
+    date_index = 0
+    waiting = []  # type: List[List]
+    found = False
+
+    for key in scanner.members():
+        if key != 'dataset_data':
+            scanner.value()
+            continue
+        found = True
+        for field in scanner.members():
+            if field == 'column_names':
+                headers = scanner.value()
+                series = Timeseries.from_headers(headers, date_column,
+                                                 columns)
+                date_index = headers.index(date_column)
+                _append_rows(series, waiting, date_index, profiler)
+                waiting = []
+            elif field == 'data':
+                if series is None:
+                    waiting.extend(scanner.elements())
+                else:
+                    _append_rows(series, scanner.elements(), date_index,
+                                 profiler)
+            else:
+                scanner.value()
+
+    if not found or series is None:
+        raise ValueError("Response has no dataset columns")
+    return series
@@ -0,0 +1,181 @@
+from array import array
+from collections import OrderedDict
+from datetime import date
+from itertools import compress
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# For each "YYYY-MM" seen so far, the ordinal of the day before the 1st of
+# the month, and the number of days in it. A few decades of daily rows only
+# span a few hundred months.
+_MONTHS = {}  # type: Dict[str, Tuple[int, int]]
+
+
+def parse_ordinal(text: str) -> int:
+    """
+    :param text: An ISO-8601 date, such as "2017-06-30"
+    :return: Its ordinal, as from date.toordinal()
+    :raises ValueError: If it isn't a valid date
+    """
+    # Most dates fall in a month we've seen, and then it's one addition
+    # instead of building a date object.
+    month = _MONTHS.get(text[:7])
+    if month is not None and text[7:8] == '-':
+        day = int(text[8:])
+        if 0 < day <= month[1]:
+            return month[0] + day
+
+    year, month_number, day = map(int, text.split("-"))
+    ordinal = date(year, month_number, day).toordinal()
+    key = "%04d-%02d" % (year, month_number)
+    if text.startswith(key):
+        first = date(year, month_number, 1).toordinal()
+        following = date(year + month_number // 12,
+                         month_number % 12 + 1, 1).toordinal()
+        _MONTHS[key] = (first - 1, following - first)
+    return ordinal
+
+
+class Timeseries(object):
+    """
+    Column-oriented storage for a daily price series.
+
+    Each numeric column is kept as a contiguous array of doubles, and the dates
+    are kept as an array of proleptic Gregorian ordinals (see date.toordinal),
+    rather than one dictionary and one date object per trading day. Rows keep
+    whatever order they were added in, which for the Quandl API is reverse-
+    chronological.
+
+    Missing (null) values are stored as NaN.
+    """
+
+    def __init__(self, column_names: Iterable[str], date_column: str = 'Date'):
+        """
+        :param column_names: Names of the value columns, excluding the date
+        :param date_column: Name the date column had in the source data
+        """
+        self.date_column = date_column
+        # Where append_row() finds each column's value, if not simply every
+        # position besides the date
+        self.row_indexes = None  # type: Optional[List[int]]
+        self.ordinals = array('l')
+        self.columns = OrderedDict(
+            (name, array('d')) for name in column_names
+        )  # type: Dict[str, array]
+
+    @classmethod
+    def from_headers(cls, headers: Sequence[str], date_column: str = 'Date',
+                     columns: Sequence[str] = None) -> 'Timeseries':
+        """
+        :param headers: Every column name of the source data, including dates
+        :param date_column: Name of the column holding ISO-formatted dates
+        :param columns: Keep only these of the non-date columns, if given.
+            Rows added with append_row() then skip the other values.
+        :return: A new, empty timeseries with the non-date columns
+        :raises ValueError: If there is no date column
+        """
+        if date_column not in headers:
+            raise ValueError("No %r column" % date_column)
+        if columns is None:
+            return cls([h for h in headers if h != date_column], date_column)
+        kept = [h for h in headers if h != date_column and h in columns]
+        series = cls(kept, date_column)
+        series.row_indexes = [headers.index(h) for h in kept]
+        return series
+
+    @classmethod
+    def from_dataset(cls, dataset: Dict, date_column: str = 'Date',
+                     columns: Sequence[str] = None) -> 'Timeseries':
+        """
+        :param dataset: The "dataset_data" portion of an API response
+        :param date_column: Name of the column holding ISO-formatted dates
+        :param columns: Keep only these of the non-date columns, if given
+        :return: A new timeseries holding every row of the dataset
+        """
+        headers = dataset['column_names']
+        date_index = headers.index(date_column)
+        series = cls.from_headers(headers, date_column, columns)
+        for row in dataset['data']:
+            series.append_row(row, date_index)
+        return series
+
+    @property
+    def column_names(self) -> List[str]:
+        return list(self.columns.keys())
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def append(self, ordinal: int, values: Sequence) -> None:
+        """
+        :param ordinal: Date of the row, as from date.toordinal()
+        :param values: One value per column, in column order
+        """
+        if len(values) != len(self.columns):
+            raise ValueError("Expected %d values, got %d"
+                             % (len(self.columns), len(values)))
+        self.ordinals.append(ordinal)
+        for column, value in zip(self.columns.values(), values):
+            column.append(float('nan') if value is None else value)
+
+    def append_row(self, row: Sequence, date_index: int = 0) -> None:
+        """
+        Appends a raw API row, with its date still an ISO string.
+
+        :param row: Values in source-column order
+        :param date_index: Position of the date within the row
+        """
+        ordinal = parse_ordinal(row[date_index])
+        if self.row_indexes is None:
+            self.append(ordinal, row[:date_index] + row[date_index + 1:])
+        else:
+            self.append(ordinal, [row[i] for i in self.row_indexes])
+
+    def column(self, name: str) -> array:
+        """
+        :param name: Column name, such as "Open"
+        :return: All values of that column, in row order
+        :raises KeyError: If the series has no such column
+        """
+        return self.columns[name]
+
+    def date(self, index: int) -> date:
+        """
+        :param index: Row index
+        :return: The date of that row
+        """
+        return date.fromordinal(self.ordinals[index])
+
+    def between(self, start: date, end: date) -> 'Timeseries':
+        """
+        :return: The rows dated within the inclusive range, in the same
+            order. If that is every row, the series itself.
+        """
+        first, last = start.toordinal(), end.toordinal()
+        keep = [first <= ordinal <= last for ordinal in self.ordinals]
+        if all(keep):
+            return self
+        part = Timeseries(self.columns.keys(), self.date_column)
+        part.ordinals = array('l', compress(self.ordinals, keep))
+        for name, values in self.columns.items():
+            part.columns[name] = array('d', compress(values, keep))
+        return part
+
+    def extend(self, older: 'Timeseries') -> None:
+        """
+        Appends the rows of a series that continues this one further back in
+        time, skipping any it shares with this one at the edge.
+
+        :raises ValueError: If the series have different columns
+        """
+        if older.column_names != self.column_names:
+            raise ValueError("Expected columns %r, got %r"
+                             % (self.column_names, older.column_names))
+        skip = 0
+        if self.ordinals:
+            oldest = self.ordinals[-1]
+            while skip < len(older) and older.ordinals[skip] >= oldest:
+                skip += 1
+        self.ordinals.extend(older.ordinals[skip:])
+        for name, values in self.columns.items():
+            values.extend(older.columns[name][skip:])
+
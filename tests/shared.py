@@ -1,11 +1,21 @@
+import json
 import os
 import sys
 from contextlib import contextmanager
-from io import StringIO
+from io import BytesIO, StringIO
 from tempfile import mkstemp
 from typing import Dict, List, Tuple
 
-from stock_stats.http import HttpClient
+from stock_stats.http import HttpClient, HttpNotModified
+
+
+def get_data(filename: str) -> bytes:
+    """
+    Loads a canned fixture from the tests/data directory.
+    """
+    data_dir = os.path.join(os.path.dirname(__file__), "data")
+    with open(os.path.join(data_dir, filename), 'rb') as f:
+        return f.read()
 
 
 @contextmanager
@@ -28,6 +38,7 @@ class MockHttpClient(HttpClient):
         super().__init__()
         self.responses = {}  # type: Dict[str, Tuple[str, Dict[str, str]]]
         self.tempfiles = []  # type: List[str]
+        self.requests = []  # type: List[Tuple[str, Dict[str, str]]]
 
     def get(self, url: str, extra_params: Dict = None) \
             -> Tuple[bytes, Dict[str, str]]:
@@ -35,6 +46,16 @@ class MockHttpClient(HttpClient):
         final_url = self._get_final_url(url, extra_params)
         content, headers = self.responses.get(final_url, (None, None))
 
+        column = (extra_params or {}).get('column_index')
+        if content is None and column is not None:
+            # Like the API, answer with only the date and the chosen column
+            params = dict(extra_params)
+            del params['column_index']
+            content, headers = self.responses.get(
+                self._get_final_url(url, params), (None, None))
+            if content is not None:
+                content = self._select_column(content, column)
+
         if content is None:
             raise Exception("No preset response for URL '%s'" % final_url)
         if isinstance(content, str):
@@ -42,6 +63,32 @@ class MockHttpClient(HttpClient):
 
         return content, headers
 
+    @staticmethod
+    def _select_column(content: bytes, column: int) -> bytes:
+        try:
+            response = json.loads(content.decode('utf-8'))
+            dataset = response['dataset_data']
+        except (ValueError, KeyError):
+            return content
+        picks = [0, column]
+        dataset['column_names'] = [dataset['column_names'][i] for i in picks]
+        dataset['data'] = [[row[i] for i in picks] for row in dataset['data']]
+        return json.dumps(response).encode('utf-8')
+
+    @contextmanager
+    def stream(self, url: str, extra_params: Dict = None,
+               headers: Dict[str, str] = None):
+        content, response_headers = self.get(url, extra_params)
+        self.requests.append((self._get_final_url(url, extra_params),
+                              headers or {}))
+
+        # Emulate conditional requests against the canned validators
+        etag = (response_headers or {}).get('ETag')
+        if etag is not None and (headers or {}).get('If-None-Match') == etag:
+            raise HttpNotModified(status=304, headers=response_headers)
+
+        yield BytesIO(content), response_headers
+
     def download(self, url: str, extra_params: Dict = None) \
             -> Tuple[str, Dict[str, str]]:
 
@@ -0,0 +1,132 @@
+import json
+import unittest
+from datetime import date
+
+from stock_stats.batch import FetchPlan, read_jobs, run_batch
+from stock_stats.client import StockClient
+from stock_stats.command_line import compute_busy_days, \
+    compute_month_averages
+from stock_stats.jsonout import iter_json
+from tests.shared import MockHttpClient, get_data
+
+
+class TestFetchPlan(unittest.TestCase):
+
+    def test_merge(self):
+        plan = FetchPlan()
+        plan.add('MSFT', date(2017, 1, 1), date(2017, 3, 31))
+        plan.add('GOOGL', date(2017, 4, 1), date(2017, 6, 30))
+        plan.add('GOOGL', date(2017, 1, 1), date(2017, 3, 31))
+        plan.add('GOOGL', date(2017, 2, 1), date(2017, 2, 28))
+        plan.add('GOOGL', date(2010, 1, 1), date(2010, 1, 31))
+        self.assertEqual(list(plan.fetches()), [
+            ('MSFT', date(2017, 1, 1), date(2017, 3, 31)),
+            ('GOOGL', date(2010, 1, 1), date(2010, 1, 31)),
+            ('GOOGL', date(2017, 1, 1), date(2017, 6, 30)),
+        ])
+
+
+class TestRunBatch(unittest.TestCase):
+    """
+    Runs overlapping queries over canned HTTP responses, which should each be
+    requested only once.
+    """
+    SYMBOLS = ["GOOGL", "MSFT"]
+
+    def setUp(self):
+        self.http_client = MockHttpClient()
+        for symbol in self.SYMBOLS:
+            url = 'http://example.com/v3/datasets/WIKI/%s/data.json' \
+                  '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01' \
+                  % symbol
+            self.http_client.responses[url] = (get_data('averages1.json'), {})
+        self.client = StockClient(self.http_client, "KEY",
+                                  "http://example.com/")
+
+    def tearDown(self):
+        self.http_client.cleanup()
+
+    def _expected(self, result) -> dict:
+        return {'result': json.loads(''.join(iter_json(result)))}
+
+    def test_shared_fetches(self):
+        jobs = read_jobs('\n'.join(json.dumps(job) for job in [
+            {'action': 'month-averages', 'symbols': ['GOOGL'],
+             'start_month': '2017-01', 'end_month': '2017-06'},
+            {'action': 'busy-days', 'symbols': self.SYMBOLS,
+             'start_month': '2017-01', 'end_month': '2017-06',
+             'adjusted': True},
+            {'action': 'rolling', 'symbols': ['MSFT'],
+             'start_month': '2017-02', 'end_month': '2017-03', 'window': 5},
+            {'action': 'no-such-thing'},
+            {'action': 'report', 'symbols': ['MSFT'],
+             'start_month': '2017-13', 'end_month': '2017-06'},
+        ]))
+        results = [json.loads(''.join(iter_json(result)))
+                   for result in run_batch(self.client, jobs, workers=2)]
+        self.assertEqual(len(self.http_client.requests), len(self.SYMBOLS))
+
+        self.assertEqual(results[0], self._expected(compute_month_averages(
+            self.client, ['GOOGL'], date(2017, 1, 1), date(2017, 6, 30))))
+        self.assertEqual(results[1], self._expected(compute_busy_days(
+            self.client, self.SYMBOLS, date(2017, 1, 1), date(2017, 6, 30),
+            adjusted=True)))
+
+        # Only the days asked for, out of the shared series
+        days = list(results[2]['result']['MSFT'])
+        self.assertEqual(days[-1], '2017-03-31')
+        self.assertGreater(days[0], '2017-02-01')
+
+        self.assertIn('error', results[3])
+        self.assertIn('start_month', results[4]['error'])
+
+    def test_fetch_window(self):
+        symbols = ['A', 'B', 'C', 'D', 'E']
+        for symbol in symbols:
+            url = 'http://example.com/v3/datasets/WIKI/%s/data.json' \
+                  '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01' \
+                  % symbol
+            self.http_client.responses[url] = (get_data('averages1.json'), {})
+        jobs = [{'action': 'month-averages', 'symbols': [symbol],
+                 'start_month': '2017-01', 'end_month': '2017-06'}
+                for symbol in symbols]
+        results = run_batch(self.client, jobs, workers=1)
+
+        self.assertIn('result', next(results))
+        # Only as far ahead as the window, rather than every fetch at once
+        self.assertLessEqual(len(self.http_client.requests), 2)
+        self.assertEqual(len([r for r in results if 'result' in r]), 4)
+        self.assertEqual(len(self.http_client.requests), len(symbols))
+
+    def test_fetch_error(self):
+        url = 'http://example.com/v3/datasets/WIKI/ABC/data.json' \
+              '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01'
+        self.http_client.responses[url] = (b'{"dataset_data": ', {})
+        jobs = read_jobs(json.dumps([
+            {'action': 'month-averages', 'symbols': ['ABC'],
+             'start_month': '2017-01', 'end_month': '2017-06'},
+            {'action': 'month-averages', 'symbols': ['GOOGL'],
+             'start_month': '2017-01', 'end_month': '2017-06'},
+        ]))
+        results = list(run_batch(self.client, jobs))
+        self.assertEqual(results[0], {'error': 'Data encoding error'})
+        self.assertIn('result', results[1])
+
+    def test_unexpected_error(self):
+        def get_busy_days(*args, **kwargs):
+            raise ZeroDivisionError("division by zero")
+
+        self.client.get_busy_days = get_busy_days
+        jobs = [
+            {'action': 'busy-days', 'symbols': ['GOOGL'],
+             'start_month': '2017-01', 'end_month': '2017-06'},
+            {'action': 'month-averages', 'symbols': ['GOOGL'],
+             'start_month': '2017-01', 'end_month': '2017-06'},
+        ]
+        results = list(run_batch(self.client, jobs))
+        self.assertIn('division by zero', results[0]['error'])
+        self.assertIn('result', results[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from datetime import date
+
+from benchmarks.run import compare, run
+from benchmarks.synthetic import generate_dataset, symbol_names
+from stock_stats.timeseries import Timeseries
+from tests.shared import captured_output
+
+
+class TestBenchmarks(unittest.TestCase):
+    """
+    Runs the benchmark suite on a tiny amount of synthetic data.
+    """
+
+    def test_synthetic_data(self):
+        first = generate_dataset('AAAA', 2)
+        self.assertEqual(first, generate_dataset('AAAA', 2))
+        self.assertNotEqual(first, generate_dataset('AAAB', 2))
+
+        series = Timeseries.from_dataset(first)
+        self.assertEqual(series.date(0), date(2017, 12, 29))
+        self.assertGreater(len(series), 2 * 250)
+        self.assertTrue(all(lo <= hi for lo, hi in zip(
+            series.column('Low'), series.column('High'))))
+        self.assertEqual(symbol_names(27)[-2:], ['AAAZ', 'AABA'])
+
+    def test_run_and_compare(self):
+        results = run(symbols=2, years=1, repeat=1)
+        self.assertEqual(list(results['benchmarks']), [
+            'decode_dataset', 'decode_one_column', 'group_by_month',
+            'get_monthly_averages', 'get_top_variance_day', 'get_busy_days',
+            'get_losing_day_count', 'print_json'])
+
+        slower = {'config': results['config'], 'benchmarks': {
+            name: dict(result, best=result['best'] * 2)
+            for name, result in results['benchmarks'].items()}}
+        with captured_output() as (out, err):
+            self.assertEqual(compare(results, slower, 1.2), [])
+            self.assertEqual(len(compare(slower, results, 1.2)), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
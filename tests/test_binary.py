@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+
+from stock_stats.binary import RECORD_SIZE, BinaryPriceStore
+from stock_stats.client import StockClient
+from stock_stats.store import StoreException
+from stock_stats.timeseries import Timeseries
+from tests.shared import MockHttpClient, get_data
+
+
+class TestBinaryPriceStore(unittest.TestCase):
+    """
+    Writes the canned API response to a binary price file and checks that the
+    memory-mapped slices analyze the same as the original series.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = BinaryPriceStore(self.directory)
+        dataset = json.loads(get_data('averages1.json'))['dataset_data']
+        self.series = Timeseries.from_dataset(dataset)
+        self.store.write('GOOGL', self.series)
+        self.client = StockClient(None, "KEY", store=self.store)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_same_analysis(self):
+        mapped = self.store.get_timeseries('GOOGL', date(2017, 1, 1),
+                                           date(2017, 6, 30))
+        self.assertEqual(len(mapped), len(self.series))
+        self.assertEqual(mapped.ordinals, self.series.ordinals)
+        for adjusted in (False, True):
+            self.assertEqual(
+                self.client.get_report(mapped, adjusted),
+                self.client.get_report(self.series, adjusted))
+            self.assertEqual(
+                self.client.get_busy_days(mapped, adjusted),
+                self.client.get_busy_days(self.series, adjusted))
+
+    def test_window(self):
+        mapped = self.client.get_standard_timeseries(
+            'GOOGL', date(2017, 3, 1), date(2017, 3, 31))
+        self.assertEqual(len(mapped), 23)
+        self.assertEqual(mapped.date(0), date(2017, 3, 31))
+        self.assertEqual(mapped.date(22), date(2017, 3, 1))
+
+        empty = self.store.get_timeseries('GOOGL', date(2018, 1, 1),
+                                          date(2018, 12, 31))
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(list(empty.column('Close')), [])
+
+    def test_between(self):
+        whole = self.store.get_timeseries('GOOGL', date(2017, 1, 1),
+                                          date(2017, 6, 30))
+        self.assertIs(whole.between(date(2016, 1, 1), date(2018, 1, 1)),
+                      whole)
+        march = whole.between(date(2017, 3, 1), date(2017, 3, 31))
+        expected = self.series.between(date(2017, 3, 1), date(2017, 3, 31))
+        self.assertEqual(len(march), 23)
+        self.assertEqual(march.ordinals, expected.ordinals)
+        self.assertEqual(list(march.column('Close')),
+                         list(expected.column('Close')))
+
+    def test_append(self):
+        newer = Timeseries(self.series.column_names)
+        newer.append(date(2017, 7, 3).toordinal(),
+                     [1.0] * len(self.series.column_names))
+        newer.append(date(2017, 6, 30).toordinal(),
+                     [2.0] * len(self.series.column_names))
+        rows, size = self.store.append('GOOGL', newer)
+        self.assertEqual((rows, size), (1, RECORD_SIZE))
+        mapped = self.store.get_timeseries('GOOGL', date(2017, 6, 30),
+                                           date(2017, 7, 31))
+        self.assertEqual(list(mapped.column('Open')), [1.0, 943.99])
+
+    def test_partial_record_ignored(self):
+        with open(self.store.path('GOOGL'), 'ab') as fh:
+            fh.write(b'\0' * 10)
+        mapped = self.store.get_timeseries('GOOGL', date(2017, 1, 1),
+                                           date(2017, 6, 30))
+        self.assertEqual(len(mapped), len(self.series))
+
+    def test_missing_symbol(self):
+        with self.assertRaises(StoreException):
+            self.store.get_timeseries('MSFT', date(2017, 1, 1),
+                                      date(2017, 6, 30))
+        with self.assertRaises(StoreException):
+            self.store.path(os.path.join('..', 'etc'))
+
+    def test_refresh(self):
+        # Hold only the first quarter, as if earlier runs had fetched that
+        quarter = Timeseries(self.series.column_names)
+        for i in range(len(self.series)):
+            if self.series.ordinals[i] <= date(2017, 3, 31).toordinal():
+                quarter.append(self.series.ordinals[i],
+                               [c[i] for c in self.series.columns.values()])
+        self.store.write('GOOGL', quarter)
+
+        http_client = MockHttpClient()
+        url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
+              '?api_key=KEY&end_date=2017-06-30&start_date=2017-04-01'
+        http_client.responses[url] = (get_data('averages1.json'), {})
+        client = StockClient(http_client, "KEY", "http://example.com/")
+
+        added = len(self.series) - len(quarter)
+        self.assertEqual(
+            client.refresh('GOOGL', self.store, date(2017, 1, 1),
+                           date(2017, 6, 30)),
+            (added, added * RECORD_SIZE))
+        mapped = self.store.get_timeseries('GOOGL', date(2017, 1, 1),
+                                           date(2017, 6, 30))
+        self.assertEqual(mapped.ordinals, self.series.ordinals)
+
+        # Nothing left to ask for
+        self.assertEqual(
+            client.refresh('GOOGL', self.store, date(2017, 1, 1),
+                           date(2017, 6, 30)), (0, 0))
+        self.assertEqual(len(http_client.requests), 1)
+
+        # Today's row isn't final yet, so it is left for a later refresh
+        today = date.today()
+        self.assertEqual(client.refresh('MSFT', self.store, today, today),
+                         (0, 0))
+        self.assertEqual(len(http_client.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,249 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import date
+
+from stock_stats.cache import ListingCache, TimeseriesCache
+from stock_stats.client import StockClient, StockException
+from stock_stats.timeseries import Timeseries
+from tests.shared import MockHttpClient, get_data
+
+
+class TestTimeseriesCache(unittest.TestCase):
+    """
+    Exercises the on-disk cache directly, and through StockClient with canned
+    HTTP responses.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = TimeseriesCache(self.directory)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def _series(self, *days: date) -> Timeseries:
+        series = Timeseries(['Open', 'Close'])
+        for day in days:
+            series.append(day.toordinal(), [float(day.day), day.day + 0.5])
+        return series
+
+    def test_empty(self):
+        missing = self.cache.missing_ranges('GOOGL', date(2017, 1, 1),
+                                            date(2017, 1, 31))
+        self.assertEqual(missing, [(date(2017, 1, 1), date(2017, 1, 31))])
+        with self.assertRaises(KeyError):
+            self.cache.load('GOOGL', date(2017, 1, 1), date(2017, 1, 31))
+
+    def test_gaps(self):
+        self.cache.store('GOOGL', self._series(date(2017, 1, 10)),
+                         date(2017, 1, 10), date(2017, 1, 15))
+        self.cache.store('GOOGL', self._series(date(2017, 1, 20)),
+                         date(2017, 1, 20), date(2017, 1, 25))
+        missing = self.cache.missing_ranges('GOOGL', date(2017, 1, 1),
+                                            date(2017, 1, 31))
+        self.assertEqual(missing, [
+            (date(2017, 1, 1), date(2017, 1, 9)),
+            (date(2017, 1, 16), date(2017, 1, 19)),
+            (date(2017, 1, 26), date(2017, 1, 31)),
+        ])
+        inner = self.cache.missing_ranges('GOOGL', date(2017, 1, 11),
+                                          date(2017, 1, 14))
+        self.assertEqual(inner, [])
+
+    def test_round_trip(self):
+        self.cache.store('GOOGL', self._series(date(2017, 1, 4),
+                                               date(2017, 1, 3)),
+                         date(2017, 1, 1), date(2017, 1, 4))
+        self.cache.store('GOOGL', self._series(date(2017, 1, 5)),
+                         date(2017, 1, 5), date(2017, 1, 8))
+        series = self.cache.load('GOOGL', date(2017, 1, 1), date(2017, 1, 31))
+        self.assertEqual(series.column_names, ['Open', 'Close'])
+        self.assertEqual([series.date(i) for i in range(len(series))],
+                         [date(2017, 1, 5), date(2017, 1, 4),
+                          date(2017, 1, 3)])
+        self.assertEqual(list(series.column('Close')), [5.5, 4.5, 3.5])
+
+    def test_eviction(self):
+        self.cache.max_bytes = 16 * 3
+        self.cache.store('OLD', self._series(date(2017, 1, 3),
+                                             date(2017, 1, 4)),
+                         date(2017, 1, 1), date(2017, 1, 31))
+        self.cache.store('NEW', self._series(date(2017, 1, 3),
+                                             date(2017, 1, 4)),
+                         date(2017, 1, 1), date(2017, 1, 31))
+        with self.assertRaises(KeyError):
+            self.cache.load('OLD', date(2017, 1, 1), date(2017, 1, 31))
+        self.assertEqual(len(self.cache.load('NEW', date(2017, 1, 1),
+                                             date(2017, 1, 31))), 2)
+
+    def test_client_fetches_only_gaps(self):
+        http_client = MockHttpClient()
+        client = StockClient(http_client, "KEY", "http://example.com/",
+                             cache=self.cache)
+        url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
+              '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01'
+        http_client.responses[url] = (get_data('averages1.json'), {})
+        first = client.get_standard_timeseries('GOOGL', date(2017, 1, 1),
+                                               date(2017, 6, 30))
+
+        # A second identical request must not touch the network at all
+        http_client.responses.clear()
+        second = client.get_standard_timeseries('GOOGL', date(2017, 1, 1),
+                                                date(2017, 6, 30))
+        self.assertEqual(first.ordinals, second.ordinals)
+        self.assertEqual(first.columns, second.columns)
+        self.assertEqual(client.get_monthly_averages(first, False),
+                         client.get_monthly_averages(second, False))
+
+        # A wider one only asks for the part we don't have
+        url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
+              '?api_key=KEY&end_date=2017-07-31&start_date=2017-07-01'
+        http_client.responses[url] = (
+            b'{"dataset_data": {"column_names": ["Date", "Open", "High", '
+            b'"Low", "Close", "Volume", "Ex-Dividend", "Split Ratio", '
+            b'"Adj. Open", "Adj. High", "Adj. Low", "Adj. Close", '
+            b'"Adj. Volume"], "data": [["2017-07-03", 1, 2, 3, 4, 5, 6, 7, '
+            b'8, 9, 10, 11, 12]]}}',
+            {})
+        wider = client.get_standard_timeseries('GOOGL', date(2017, 1, 1),
+                                               date(2017, 7, 31))
+        self.assertEqual(len(wider), len(first) + 1)
+        self.assertEqual(wider.date(0), date(2017, 7, 3))
+        http_client.cleanup()
+
+    def test_evicted_before_load(self):
+        http_client = MockHttpClient()
+        client = StockClient(http_client, "KEY", "http://example.com/",
+                             cache=self.cache)
+        url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
+              '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01'
+        http_client.responses[url] = (get_data('averages1.json'), {})
+
+        # As if another process made room straight after each store
+        store = self.cache.store
+
+        def store_then_evict(symbol, *args):
+            store(symbol, *args)
+            with self.cache._db:
+                self.cache._delete_symbol(symbol)
+        self.cache.store = store_then_evict
+
+        series = client.get_standard_timeseries('GOOGL', date(2017, 1, 1),
+                                                date(2017, 6, 30))
+        self.assertEqual(series.date(0), date(2017, 6, 30))
+        self.assertEqual(len(http_client.requests), 2)
+        http_client.cleanup()
+
+    def test_single_columns_kept_apart(self):
+        http_client = MockHttpClient()
+        client = StockClient(http_client, "KEY", "http://example.com/",
+                             cache=self.cache)
+        url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
+              '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01'
+        http_client.responses[url] = (get_data('averages1.json'), {})
+        start, end = date(2017, 1, 1), date(2017, 6, 30)
+        volumes = client.get_standard_timeseries('GOOGL', start, end,
+                                                 ['Volume'])
+        whole = client.get_standard_timeseries('GOOGL', start, end)
+        self.assertEqual(volumes.column_names, ['Volume'])
+        self.assertEqual(len(whole.column_names), 12)
+        self.assertEqual(len(http_client.requests), 2)
+
+        # Both are held now, and several columns are read from whole rows
+        http_client.responses.clear()
+        again = client.get_standard_timeseries('GOOGL', start, end,
+                                               ['Volume'])
+        self.assertEqual(again.column('Volume'), whole.column('Volume'))
+        client.get_standard_timeseries('GOOGL', start, end, ['Open', 'Close'])
+        http_client.cleanup()
+
+
+class TestListingCache(unittest.TestCase):
+    """
+    Checks that the symbol listing is revalidated rather than re-downloaded.
+    """
+    URL = 'http://example.com/v3/databases/WIKI/codes?api_key=KEY'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = ListingCache(self.directory)
+        self.http_client = MockHttpClient()
+        self.client = StockClient(self.http_client, "KEY",
+                                  "http://example.com/",
+                                  listing_cache=self.cache)
+        self.http_client.responses[self.URL] = (
+            get_data('symbols.zip'),
+            {StockClient.HEADER_CONTENT_TYPE: StockClient.CONTENT_TYPE_ZIP,
+             'ETag': '"v1"'}
+        )
+
+    def tearDown(self):
+        self.http_client.cleanup()
+        shutil.rmtree(self.directory)
+
+    def test_fresh_listing_skips_network(self):
+        first = self.client.get_symbols()
+        second = self.client.get_symbols()
+        self.assertEqual(first, second)
+        self.assertEqual(list(second.keys()), ['AAPL', 'ABC', 'AA'])
+        self.assertEqual(len(self.http_client.requests), 1)
+
+    def test_revalidation(self):
+        self.client.get_symbols()
+        self.cache.ttl = 0
+        symbols = self.client.get_symbols()
+        self.assertEqual(list(symbols.keys()), ['AAPL', 'ABC', 'AA'])
+        url, headers = self.http_client.requests[-1]
+        self.assertEqual(headers, {'If-None-Match': '"v1"'})
+
+    def test_changed_listing(self):
+        self.client.get_symbols()
+        self.cache.ttl = 0
+        self.http_client.responses[self.URL] = (get_data('symbols.csv'),
+                                                {'ETag': '"v2"'})
+        self.client.get_symbols()
+        self.assertEqual(self.cache.load()['etag'], '"v2"')
+
+    def test_offline(self):
+        self.client.offline = True
+        with self.assertRaises(StockException):
+            self.client.get_symbols()
+        self.client.offline = False
+        self.client.get_symbols()
+        self.cache.ttl = 0
+        self.client.offline = True
+        self.http_client.responses.clear()
+        self.assertIn('AAPL', self.client.get_symbols())
+
+    def test_concurrent_writes(self):
+        errors = []
+
+        def save(n):
+            try:
+                for i in range(20):
+                    self.cache.save([('S%d' % n, str(i))], {})
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save, args=(n,))
+                   for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertIsNotNone(self.cache.load())
+        self.assertEqual(os.listdir(self.directory), [ListingCache.FILE_NAME])
+
+    def test_failed_write(self):
+        with self.assertRaises(TypeError):
+            self.cache.save([('AAPL', object())], {})
+        # Neither a half-written listing nor its temporary file is left
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
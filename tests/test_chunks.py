@@ -0,0 +1,186 @@
+import json
+import unittest
+from contextlib import contextmanager
+from datetime import date, timedelta
+from io import BytesIO
+
+from benchmarks.synthetic import generate_dataset
+from stock_stats.client import StockClient, StockException
+from stock_stats.http import HttpException
+from stock_stats.jsonout import iter_json
+from stock_stats.scheduler import RequestScheduler
+from stock_stats.timeseries import Timeseries
+from tests.shared import MockHttpClient
+
+URL = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
+      '?api_key=KEY&end_date=%s&start_date=%s'
+
+
+class _FailingOnceHttpClient(MockHttpClient):
+    """
+    Breaks off the first response for each of the given URLs.
+    """
+
+    def __init__(self, failing):
+        super().__init__()
+        self.failing = set(failing)
+
+    def stream(self, url, extra_params=None, headers=None):
+        final_url = self._get_final_url(url, extra_params)
+        if final_url in self.failing:
+            self.failing.discard(final_url)
+            self.requests.append((final_url, headers or {}))
+            raise HttpException("Connection reset") \
+                from ConnectionResetError()
+        return super().stream(url, extra_params, headers)
+
+
+class _BrokenBody(BytesIO):
+    """
+    A response body whose connection resets half-way through.
+    """
+
+    def read(self, size=-1):
+        if self.tell() >= len(self.getvalue()) // 2:
+            raise HttpException from ConnectionResetError()
+        return super().read(min(size, 1024) if size > 0 else 1024)
+
+
+class _BreakingOnceHttpClient(MockHttpClient):
+    """
+    Breaks off the body of the first response for each of the given URLs,
+    after part of it has arrived.
+    """
+
+    def __init__(self, failing):
+        super().__init__()
+        self.failing = set(failing)
+
+    @contextmanager
+    def stream(self, url, extra_params=None, headers=None):
+        final_url = self._get_final_url(url, extra_params)
+        with super().stream(url, extra_params, headers) as (body, headers):
+            if final_url in self.failing:
+                self.failing.discard(final_url)
+                body = _BrokenBody(body.read())
+            yield body, headers
+
+
+class _NotFoundHttpClient(MockHttpClient):
+
+    def stream(self, url, extra_params=None, headers=None):
+        self.requests.append((self._get_final_url(url, extra_params),
+                              headers or {}))
+        raise HttpException("Not found", status=404)
+
+
+class TestChunkedDownload(unittest.TestCase):
+    """
+    Splits a five-year range into chunks, and checks that merging them gives
+    just what a single request would have.
+    """
+    START, END = date(2013, 1, 1), date(2017, 12, 29)
+
+    def setUp(self):
+        self.dataset = generate_dataset('GOOGL', years=5, end=self.END)
+
+    def _respond(self, http_client: MockHttpClient, start: date, end: date):
+        # The server may well include a day either side, which must not end
+        # up in the merged series twice.
+        first, last = start - timedelta(days=3), end + timedelta(days=3)
+        rows = [row for row in self.dataset['data']
+                if first.isoformat() <= row[0] <= last.isoformat()]
+        body = {'dataset_data': dict(self.dataset, data=rows)}
+        http_client.responses[URL % (end, start)] = (
+            json.dumps(body).encode('utf-8'), {})
+
+    def _client(self, http_client: MockHttpClient, chunk_jobs: int):
+        return StockClient(http_client, "KEY", "http://example.com/",
+                           chunk_jobs=chunk_jobs)
+
+    def _chunks(self):
+        return self._client(None, 2)._chunks(self.START, self.END)
+
+    def test_chunks(self):
+        self.assertEqual(self._chunks(), [
+            (date(2016, 1, 1), date(2017, 12, 29)),
+            (date(2013, 1, 1), date(2015, 12, 31)),
+        ])
+        client = self._client(None, 8)
+        self.assertEqual(len(client._chunks(self.START, self.END)), 5)
+        self.assertEqual(client._chunks(date(2017, 1, 1), self.END),
+                         [(date(2017, 1, 1), self.END)])
+
+    def test_same_as_single_request(self):
+        http_client = MockHttpClient()
+        whole = Timeseries.from_dataset(self.dataset)
+        for start, end in self._client(None, 8)._chunks(self.START,
+                                                        self.END):
+            self._respond(http_client, start, end)
+        series = self._client(http_client, 8).get_standard_timeseries(
+            'GOOGL', self.START, self.END)
+        self.assertEqual(len(http_client.requests), 5)
+        self.assertEqual(series.ordinals, whole.ordinals)
+        self.assertEqual(series.columns, whole.columns)
+
+        client = self._client(None, 1)
+        for adjusted in (False, True):
+            self.assertEqual(
+                ''.join(iter_json(client.get_report(series, adjusted))),
+                ''.join(iter_json(client.get_report(whole, adjusted))))
+
+    def test_retry_chunk(self):
+        newer, older = self._chunks()
+        http_client = _FailingOnceHttpClient([URL % (older[1], older[0])])
+        for start, end in (newer, older):
+            self._respond(http_client, start, end)
+        # Retries are left to the scheduler alone
+        scheduler = RequestScheduler(http_client, rate=1000.0, backoff=0.001)
+        series = self._client(scheduler, 2).get_standard_timeseries(
+            'GOOGL', self.START, self.END)
+        self.assertEqual(len(series), len(self.dataset['data']))
+        # Only the chunk that failed was asked for again
+        self.assertEqual(len(http_client.requests), 3)
+
+        http_client.failing.add(URL % (older[1], older[0]))
+        with self.assertRaises(StockException):
+            self._client(http_client, 2).get_standard_timeseries(
+                'GOOGL', self.START, self.END)
+        self.assertEqual(len(http_client.requests), 5)
+
+    def test_retry_broken_body(self):
+        newer, older = self._chunks()
+        http_client = _BreakingOnceHttpClient([URL % (older[1], older[0])])
+        for start, end in (newer, older):
+            self._respond(http_client, start, end)
+        scheduler = RequestScheduler(http_client, rate=1000.0, backoff=0.001)
+        series = self._client(scheduler, 2).get_standard_timeseries(
+            'GOOGL', self.START, self.END)
+        self.assertEqual(len(series), len(self.dataset['data']))
+        self.assertEqual(len(http_client.requests), 3)
+
+        # Without a scheduler too
+        http_client.failing.add(URL % (older[1], older[0]))
+        series = self._client(http_client, 2).get_standard_timeseries(
+            'GOOGL', self.START, self.END)
+        self.assertEqual(len(series), len(self.dataset['data']))
+        self.assertEqual(len(http_client.requests), 6)
+
+        # Within the scheduler's number of retries
+        scheduler.max_retries = 0
+        http_client.failing.add(URL % (older[1], older[0]))
+        with self.assertRaises(StockException):
+            self._client(scheduler, 2).get_standard_timeseries(
+                'GOOGL', self.START, self.END)
+
+    def test_missing_symbol(self):
+        http_client = _NotFoundHttpClient()
+        client = self._client(http_client, 2)
+        with self.assertRaises(StockException):
+            client.get_standard_timeseries('GOOGL', self.START, self.END)
+        # Not worth asking again, nor waiting for the other chunk
+        self.assertLessEqual(len(http_client.requests), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
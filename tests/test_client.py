@@ -1,8 +1,11 @@
+import json
 import os
 import unittest
 from datetime import date
+from urllib.parse import parse_qs, urlsplit
 
 from stock_stats.client import StockClient, StockException
+from stock_stats.timeseries import Timeseries
 from tests.shared import MockHttpClient
 
 
@@ -52,6 +55,21 @@ class TestStockClient(unittest.TestCase):
         }
         self.assertEqual(expected, symbols)
 
+    def test_iter_symbols(self):
+        url = 'http://example.com/v3/databases/WIKI/codes?api_key=KEY'
+        self.http_client.responses[url] = (
+            self._get_data('symbols.zip'),
+            {StockClient.HEADER_CONTENT_TYPE: StockClient.CONTENT_TYPE_ZIP}
+        )
+        symbols = self.stock_client.iter_symbols()
+        self.assertEqual(next(symbols), (
+            'AAPL',
+            'Apple Inc (AAPL) Prices, Dividends, Splits and Trading Volume'
+        ))
+        self.assertEqual([s for (s, _) in symbols], ['ABC', 'AA'])
+        # Nothing should have gone through a temporary file
+        self.assertEqual(self.http_client.tempfiles, [])
+
     def test_bad_zip_data(self):
         url = 'http://example.com/v3/databases/WIKI/codes?api_key=KEY'
         with self.assertRaises(StockException):
@@ -88,6 +106,23 @@ class TestStockClient(unittest.TestCase):
             self.assertAlmostEqual(actuals['average_open'], expectations[k][0])
             self.assertAlmostEqual(actuals['average_close'], expectations[k][1])
 
+    def test_monthly_averages_any_order(self):
+        dataset = json.loads(self._get_data('averages1.json'))['dataset_data']
+        expected = self.stock_client.get_monthly_averages(
+            Timeseries.from_dataset(dataset), adjusted=True)
+
+        shuffled = dict(dataset, data=list(dataset['data']))
+        for order in (reversed, lambda rows: rows[1::2] + rows[0::2]):
+            shuffled['data'] = list(order(dataset['data']))
+            data = self.stock_client.get_monthly_averages(
+                Timeseries.from_dataset(shuffled), adjusted=True)
+            self.assertEqual(sorted(data.keys()), sorted(expected.keys()))
+            for k, actuals in data.items():
+                self.assertAlmostEqual(actuals['average_open'],
+                                       expected[k]['average_open'])
+                self.assertAlmostEqual(actuals['average_close'],
+                                       expected[k]['average_close'])
+
     def test_top_variance_days(self):
         url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
               '?api_key=KEY&end_date=2017-06-01&start_date=2017-01-01'
@@ -162,6 +197,41 @@ class TestStockClient(unittest.TestCase):
             self.assertIn(exp_day, data['busy_days'])
             self.assertEqual(exp_vol, data['busy_days'][exp_day])
 
+    def test_single_column(self):
+        url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
+              '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01'
+        self.http_client.responses[url] = (self._get_data('averages1.json'), {})
+        start, end = date(2017, 1, 1), date(2017, 6, 30)
+        whole = self.stock_client.get_standard_timeseries('GOOGL', start, end)
+
+        for adjusted in (False, True):
+            columns = self.stock_client.columns_for('busy_days', adjusted)
+            series = self.stock_client.get_standard_timeseries(
+                'GOOGL', start, end, columns)
+            self.assertEqual(series.column_names, list(columns))
+            self.assertEqual(
+                self.stock_client.get_busy_days(series, adjusted),
+                self.stock_client.get_busy_days(whole, adjusted))
+        # Asked for by its position, Adj. Volume then Volume
+        self.assertEqual(
+            [parse_qs(urlsplit(request).query)['column_index']
+             for request, _ in self.http_client.requests[1:]],
+            [['12'], ['5']])
+
+    def test_some_columns(self):
+        url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
+              '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01'
+        self.http_client.responses[url] = (self._get_data('averages1.json'), {})
+        columns = self.stock_client.columns_for('top_variance_day', False)
+        series = self.stock_client.get_standard_timeseries(
+            'GOOGL', date(2017, 1, 1), date(2017, 6, 30), columns)
+        # Everything is downloaded, but only what's needed is kept
+        self.assertEqual(self.http_client.requests[0][0], url)
+        self.assertEqual(series.column_names, ['Adj. High', 'Adj. Low'])
+        self.assertEqual(
+            self.stock_client.get_top_variance_day(series, False)['date'],
+            date(2017, 6, 9))
+
     def test_bad_days(self):
         url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
               '?api_key=KEY&end_date=2017-06-01&start_date=2017-01-01'
@@ -177,6 +247,55 @@ class TestStockClient(unittest.TestCase):
         expected_count = 52
         self.assertEqual(count, expected_count)
 
+    def test_no_trading_days(self):
+        series = Timeseries(['Open', 'Close', 'Low', 'High', 'Volume',
+                             'Adj. Open', 'Adj. Close', 'Adj. Low',
+                             'Adj. High', 'Adj. Volume'])
+        for adjusted in (False, True):
+            busy = self.stock_client.get_busy_days(series, adjusted)
+            self.assertEqual(busy, {'average_volume': None, 'busy_days': {}})
+            self.assertEqual(
+                busy, self.stock_client.get_report(series, adjusted)[
+                    'busy_days'])
+
+    def test_report(self):
+        url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
+              '?api_key=KEY&end_date=2017-06-01&start_date=2017-01-01'
+        self.http_client.responses[url] = (self._get_data('averages1.json'), {})
+
+        series = self.stock_client.get_standard_timeseries(
+            'GOOGL',
+            date(2017, 1, 1),
+            date(2017, 6, 1)
+        )
+        for adjusted in (False, True):
+            report = self.stock_client.get_report(series, adjusted)
+
+            averages = self.stock_client.get_monthly_averages(series, adjusted)
+            self.assertEqual(list(report['month_averages'].keys()),
+                             list(averages.keys()))
+            for k, actuals in averages.items():
+                self.assertAlmostEqual(
+                    report['month_averages'][k]['average_open'],
+                    actuals['average_open'])
+                self.assertAlmostEqual(
+                    report['month_averages'][k]['average_close'],
+                    actuals['average_close'])
+
+            self.assertEqual(
+                report['top_variance_day'],
+                self.stock_client.get_top_variance_day(series, adjusted))
+
+            busy = self.stock_client.get_busy_days(series, adjusted)
+            self.assertAlmostEqual(report['busy_days']['average_volume'],
+                                   busy['average_volume'])
+            self.assertEqual(report['busy_days']['busy_days'],
+                             busy['busy_days'])
+
+            self.assertEqual(
+                report['losing_days'],
+                self.stock_client.get_losing_day_count(series, adjusted))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,17 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
 import unittest
+from datetime import date
 
-from stock_stats.command_line import create_parser
-from tests.shared import captured_output
+from stock_stats.client import StockClient
+from stock_stats.command_line import action_biggest_loser, \
+    action_cross_section, action_month_averages, action_report, \
+    create_parser, main
+from stock_stats.store import LocalStore
+from tests.shared import MockHttpClient, captured_output, get_data
 
 
 # We suppress these inspections because Pycharm seems to misunderstand the
@@ -65,6 +75,174 @@ class TestArgumentParsing(unittest.TestCase):
                 self.fail("Expected to end with error")
         self.assertEqual(ecm.exception.code, 2)
 
+    def test_jobs(self):
+        cmdline = ["busy-days", "--key", "mykey", "--jobs", "8",
+                   "2017-01", "2017-02", "GOOGL"]
+        with captured_output() as (out, err):
+            args = self.parser.parse_args(cmdline)
+        self.assertEqual(args.jobs, 8)
+
+    def test_ingest(self):
+        cmdline = ["ingest", "export.zip", "--store", "prices.db"]
+        with captured_output() as (out, err):
+            args = self.parser.parse_args(cmdline)
+        self.assertEqual(args.export, "export.zip")
+        self.assertEqual(args.store, "prices.db")
+
+    def test_local_source(self):
+        cmdline = ["report", "--key", "mykey", "--source", "local",
+                   "2017-01", "2017-02", "GOOGL"]
+        with captured_output() as (out, err):
+            args = self.parser.parse_args(cmdline)
+        self.assertEqual(args.source, "local")
+
+    def test_bad_jobs(self):
+        cmdline = ["busy-days", "--key", "mykey", "--jobs", "0",
+                   "2017-01", "2017-02", "GOOGL"]
+        with self.assertRaises(SystemExit) as ecm:
+            with captured_output() as (out, err):
+                self.parser.parse_args(cmdline)
+                self.fail("Expected to end with error")
+        self.assertEqual(ecm.exception.code, 2)
+
+
+class TestActions(unittest.TestCase):
+    """
+    Runs the sub-command actions against canned HTTP responses and checks what
+    they print.
+    """
+    SYMBOLS = ["GOOGL", "MSFT", "AAPL", "COF"]
+
+    def setUp(self):
+        self.http_client = MockHttpClient()
+        self.stock_client = StockClient(self.http_client, "KEY",
+                                        "http://example.com/")
+        for symbol in self.SYMBOLS:
+            url = 'http://example.com/v3/datasets/WIKI/%s/data.json' \
+                  '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01' \
+                  % symbol
+            self.http_client.responses[url] = (get_data('averages1.json'), {})
+
+    def tearDown(self):
+        self.http_client.cleanup()
+
+    def _run(self, action, **kwargs) -> str:
+        with captured_output() as (out, err):
+            code = action(self.stock_client, self.SYMBOLS,
+                          date(2017, 1, 1), date(2017, 6, 30), **kwargs)
+        self.assertEqual(code, 0)
+        return out.getvalue()
+
+    def test_parallel_matches_serial(self):
+        serial = self._run(action_month_averages, jobs=1)
+        parallel = self._run(action_month_averages, jobs=3)
+        self.assertEqual(serial, parallel)
+        self.assertEqual(list(json.loads(parallel).keys()), self.SYMBOLS)
+
+    def test_report(self):
+        data = json.loads(self._run(action_report, jobs=2))
+        self.assertEqual(list(data['symbols'].keys()), self.SYMBOLS)
+        googl = data['symbols']['GOOGL']
+        self.assertAlmostEqual(
+            googl['month_averages']['2017-01']['average_open'], 829.854)
+        self.assertEqual(googl['top_variance_day']['date'], '2017-06-09')
+        self.assertEqual(googl['busy_days']['busy_days']['2017-01-03'],
+                         1959033)
+        self.assertEqual(data['biggest_loser'],
+                         {'days': 52, 'symbols': self.SYMBOLS})
+
+    def test_ndjson(self):
+        lines = self._run(action_report, jobs=3,
+                          output_format='ndjson').splitlines()
+        self.assertEqual(len(lines), len(self.SYMBOLS) + 1)
+        records = [json.loads(line) for line in lines]
+        self.assertCountEqual([r['symbol'] for r in records[:-1]],
+                              self.SYMBOLS)
+        whole = json.loads(self._run(action_report, jobs=1))
+        for record in records[:-1]:
+            self.assertEqual(record['result'],
+                             whole['symbols'][record['symbol']])
+        self.assertEqual(records[-1], {'biggest_loser': whole['biggest_loser']})
+
+    def test_cross_section(self):
+        data = json.loads(self._run(action_cross_section, jobs=2))
+        # Every symbol has the same prices here
+        self.assertEqual(list(data['correlation']), self.SYMBOLS)
+        for row in data['correlation'].values():
+            for value in row.values():
+                self.assertAlmostEqual(value, 1.0)
+        day = data['days']['2017-06-30']
+        self.assertEqual(day['symbols'], len(self.SYMBOLS))
+        self.assertIn(day['declining'], (0.0, 1.0))
+        self.assertEqual(day['volume_ranks'], self.SYMBOLS)
+
+    def test_top_losers_of_universe(self):
+        url = 'http://example.com/v3/databases/WIKI/codes?api_key=KEY'
+        self.http_client.responses[url] = (get_data('symbols.csv'), {})
+        for symbol, body in [('AAPL', get_data('averages1.json')),
+                             ('ABC', b'{"dataset_data": '),
+                             ('AA', get_data('averages1.json'))]:
+            url = 'http://example.com/v3/datasets/WIKI/%s/data.json' \
+                  '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01' \
+                  % symbol
+            self.http_client.responses[url] = (body, {})
+
+        with captured_output() as (out, err):
+            code = action_biggest_loser(self.stock_client, [],
+                                        date(2017, 1, 1), date(2017, 6, 30),
+                                        top=5, all_symbols=True)
+        self.assertEqual(code, 0)
+        self.assertEqual(json.loads(out.getvalue()), {
+            'losers': [{'symbol': 'AAPL', 'days': 52},
+                       {'symbol': 'AA', 'days': 52}],
+            'failed': ['ABC'],
+        })
+        self.assertIn("3/3 symbols", err.getvalue())
+
+
+class TestUniverse(unittest.TestCase):
+    """
+    Ranks every symbol of a local price database using worker processes.
+    """
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.directory, 'prices.db')
+        rows = json.loads(get_data('averages1.json'))['dataset_data']['data']
+        export = os.path.join(self.directory, 'export.csv')
+        with open(export, 'wt', newline='') as fh:
+            writer = csv.writer(fh)
+            # Fewer days means fewer losing days
+            for i, symbol in enumerate(['AAA', 'BBB', 'CCC', 'DDD']):
+                writer.writerows([symbol] + row for row in rows[i * 20:])
+        store = LocalStore(self.store_path)
+        store.ingest(export)
+        store.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _run(self, *extra) -> dict:
+        args = create_parser().parse_args([
+            "biggest-loser", "--key", "mykey", "--source", "local",
+            "--store", self.store_path, "2017-01", "2017-06"] + list(extra))
+        with captured_output() as (out, err):
+            self.assertEqual(main(args), 0)
+        return json.loads(out.getvalue())
+
+    def test_processes_match_serial(self):
+        serial = self._run("--all-symbols", "--top", "3")
+        parallel = self._run("--all-symbols", "--top", "3", "--jobs", "2")
+        self.assertEqual(serial, parallel)
+        self.assertEqual([loser['symbol'] for loser in serial['losers']],
+                         ['AAA', 'BBB', 'CCC'])
+        self.assertEqual(serial['failed'], [])
+
+    def test_symbols_or_universe(self):
+        args = create_parser().parse_args([
+            "biggest-loser", "--key", "mykey", "2017-01", "2017-06"])
+        with captured_output() as (out, err):
+            self.assertEqual(main(args), 2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,140 @@
+import math
+import random
+import unittest
+from collections import OrderedDict
+from datetime import date
+
+from stock_stats import crosssection
+from stock_stats.client import StockClient
+from stock_stats.timeseries import Timeseries
+
+NAN = float('nan')
+
+
+def _pearson(xs, ys):
+    pairs = [(x, y) for x, y in zip(xs, ys) if x == x and y == y]
+    if len(pairs) < 2:
+        return None
+    mean_x = sum(x for x, _ in pairs) / len(pairs)
+    mean_y = sum(y for _, y in pairs) / len(pairs)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in pairs)
+    var_x = sum((x - mean_x) ** 2 for x, _ in pairs)
+    var_y = sum((y - mean_y) ** 2 for _, y in pairs)
+    if var_x == 0 or var_y == 0:
+        return None
+    return covariance / math.sqrt(var_x * var_y)
+
+
+class TestCrossSection(unittest.TestCase):
+
+    def test_date_index(self):
+        self.assertEqual(crosssection.date_index([[9, 7, 4], [8, 7, 3], []]),
+                         [9, 8, 7, 4, 3])
+
+    def test_align(self):
+        index = [9, 8, 7, 4]
+        self.assertEqual(list(crosssection.align(index, [9, 7], [1.0, 2.0],
+                                                 0.0)),
+                         [1.0, 0.0, 2.0, 0.0])
+        aligned = crosssection.align(index, [8], [5.0])
+        self.assertEqual(aligned[1], 5.0)
+        self.assertTrue(math.isnan(aligned[0]))
+
+    def test_returns(self):
+        changes = crosssection.returns([12.0, 10.0, 0.0, 4.0])
+        self.assertEqual(len(changes), 3)
+        self.assertAlmostEqual(changes[0], 0.2)
+        self.assertTrue(math.isnan(changes[1]))
+        self.assertEqual(changes[2], -1.0)
+
+    def test_correlation_matches_pairwise(self):
+        rng = random.Random(3)
+        rows = [[rng.gauss(0, 0.02) for _ in range(60)] for _ in range(4)]
+        rows.append([x * 2 + 0.01 for x in rows[0]])
+        # Gaps in some rows, and one with too few values to compare
+        for i in range(0, 60, 7):
+            rows[1][i] = NAN
+        rows[2][:50] = [NAN] * 50
+        rows.append([NAN] * 59 + [0.01])
+
+        matrix = crosssection.correlation_matrix(rows)
+        for i, row in enumerate(rows):
+            for j, other in enumerate(rows):
+                expected = _pearson(row, other)
+                if expected is None:
+                    self.assertIsNone(matrix[i][j], (i, j))
+                else:
+                    self.assertAlmostEqual(matrix[i][j], expected,
+                                           msg=(i, j))
+        self.assertAlmostEqual(matrix[0][4], 1.0)
+
+    def test_rank_columns(self):
+        rows = [[1.0, NAN], [3.0, 2.0], [1.0, 1.0]]
+        self.assertEqual(crosssection.rank_columns(rows), [[1, 0, 2], [1, 2]])
+        self.assertEqual(crosssection.column_sums(rows)[0], 5.0)
+
+
+class TestGetCrossSection(unittest.TestCase):
+
+    @staticmethod
+    def _series(rows, columns=('Open', 'Close', 'Volume')):
+        series = Timeseries(list(columns))
+        for day, values in rows:
+            series.append(date(2017, 6, day).toordinal(), values)
+        return series
+
+    def test_missing_days(self):
+        client = StockClient(None, "KEY")
+        series = OrderedDict([
+            ('A', self._series([(30, [10.0, 11.0, 300.0]),
+                                (29, [10.0, 10.0, 100.0]),
+                                (28, [11.0, 9.0, 200.0])])),
+            # No row on the 29th
+            ('B', self._series([(30, [22.0, 20.0, 100.0]),
+                                (28, [19.0, 20.0, 100.0])])),
+        ])
+        results = client.get_cross_section(series, False)
+
+        self.assertEqual(list(results['days']),
+                         [date(2017, 6, 30), date(2017, 6, 29),
+                          date(2017, 6, 28)])
+        self.assertEqual(results['days'][date(2017, 6, 30)], {
+            'declining':    0.5,
+            'symbols':      2,
+            'volume_ranks': ['A', 'B'],
+        })
+        self.assertEqual(results['days'][date(2017, 6, 29)], {
+            'declining':    0.0,
+            'symbols':      1,
+            'volume_ranks': ['A'],
+        })
+        self.assertEqual(results['days'][date(2017, 6, 28)]['volume_ranks'],
+                         ['A', 'B'])
+
+        # The only day both have a return on is the 30th
+        correlation = results['correlation']
+        self.assertEqual(list(correlation), ['A', 'B'])
+        self.assertAlmostEqual(correlation['A']['A'], 1.0)
+        self.assertIsNone(correlation['A']['B'])
+
+    def test_volume_columns(self):
+        client = StockClient(None, "KEY")
+        columns = ('Open', 'Close', 'Adj. Open', 'Adj. Close', 'Volume',
+                   'Adj. Volume')
+        # A is busier than usual on the 30th by raw volume, B by adjusted
+        series = OrderedDict([
+            ('A', self._series([(30, [1.0, 1.0, 1.0, 1.0, 300.0, 100.0]),
+                                (29, [1.0, 1.0, 1.0, 1.0, 100.0, 300.0])],
+                               columns)),
+            ('B', self._series([(30, [1.0, 1.0, 1.0, 1.0, 100.0, 300.0]),
+                                (29, [1.0, 1.0, 1.0, 1.0, 300.0, 100.0])],
+                               columns)),
+        ])
+        for adjusted, busiest in ((False, 'A'), (True, 'B')):
+            days = client.get_cross_section(series, adjusted)['days']
+            self.assertEqual(days[date(2017, 6, 30)]['volume_ranks'][0],
+                             busiest)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import gzip
+import socket
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from stock_stats.http import HttpClient, HttpException, HttpNotModified
+from stock_stats.profiling import Profiler
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer only arrived in Python 3.7
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    BODY = b'{"hello": "world"}' * 100
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        if self.path.startswith('/etag'):
+            if self.headers.get('If-None-Match') == '"v1"':
+                self._reply(304, b'', {'ETag': '"v1"'})
+            else:
+                self._reply(200, self.BODY, {'ETag': '"v1"'})
+        elif self.path.startswith('/moved'):
+            self._reply(302, b'', {'Location': '/plain'})
+        elif self.path.startswith('/missing'):
+            self._reply(404, b'nope', {})
+        elif self.path.startswith('/plain'):
+            self._reply(200, self.BODY, {})
+        elif 'gzip' in self.headers.get('Accept-Encoding', ''):
+            self._reply(200, gzip.compress(self.BODY),
+                        {'Content-Encoding': 'gzip'})
+        else:
+            self._reply(200, self.BODY, {})
+
+    def _reply(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHttpClient(unittest.TestCase):
+    """
+    Runs the real HttpClient against a small local server.
+    """
+
+    def setUp(self):
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.server.connections = 0
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.05,), daemon=True)
+        self.thread.start()
+        self.base = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.client = HttpClient()
+
+    def tearDown(self):
+        self.client.close()
+        self.client.cleanup()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_keep_alive(self):
+        for _ in range(5):
+            body, headers = self.client.get(self.base + '/plain', {'a': 1})
+            self.assertEqual(body, _Handler.BODY)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_gzip(self):
+        body, headers = self.client.get(self.base + '/data')
+        self.assertEqual(body, _Handler.BODY)
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_stream(self):
+        with self.client.stream(self.base + '/data') as (body, headers):
+            self.assertEqual(body.read(5), _Handler.BODY[:5])
+        # Partly-read responses are drained so the connection can be reused
+        self.client.get(self.base + '/data')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_profile(self):
+        profiler = Profiler()
+        client = HttpClient(profiler=profiler)
+        try:
+            body, headers = client.get(self.base + '/data')
+        finally:
+            client.close()
+        self.assertEqual(body, _Handler.BODY)
+        network = profiler.report()['totals'][Profiler.NETWORK]
+        # Counted as sent, compressed
+        self.assertEqual(network['bytes'], len(gzip.compress(_Handler.BODY)))
+        self.assertEqual(network['calls'], 1)
+
+    def test_redirect(self):
+        body, headers = self.client.get(self.base + '/moved')
+        self.assertEqual(body, _Handler.BODY)
+
+    def test_error_status(self):
+        with self.assertRaises(HttpException) as ecm:
+            self.client.get(self.base + '/missing')
+        self.assertEqual(ecm.exception.status, 404)
+
+    def test_not_modified(self):
+        with self.client.stream(self.base + '/etag') as (body, headers):
+            self.assertEqual(headers['ETag'], '"v1"')
+        with self.assertRaises(HttpNotModified):
+            with self.client.stream(self.base + '/etag', None,
+                                    {'If-None-Match': '"v1"'}):
+                self.fail("Expected no body")
+
+    def test_download(self):
+        path, headers = self.client.download(self.base + '/data')
+        with open(path, 'rb') as fh:
+            self.assertEqual(fh.read(), _Handler.BODY)
+
+    def test_connection_refused(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        with self.assertRaises(HttpException):
+            self.client.get('http://127.0.0.1:%d/plain' % port)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import json
+import unittest
+from collections import OrderedDict
+from datetime import date
+
+from stock_stats.jsonout import dumps, iter_json
+
+
+class TestIterJson(unittest.TestCase):
+    """
+    Checks that the chunked encoder matches json.dumps() as print_json() used
+    to call it, and that it writes dates as ISO-8601 strings.
+    """
+    VALUE = OrderedDict([
+        ('text', 'café "quoted"\n'),
+        ('numbers', [0, -3, 1.5, 1e100, float('nan'), float('inf'), True,
+                     False, None]),
+        ('empty', [{}, [], '']),
+        ('nested', {'b': {'x': [1, {'y': 2}]}, 'a': 0.1}),
+        (7, 'integer key'),
+    ])
+
+    def _encode(self, value, pretty=False) -> str:
+        return ''.join(iter_json(value, pretty))
+
+    def test_same_as_json(self):
+        self.assertEqual(self._encode(self.VALUE), json.dumps(self.VALUE))
+        self.assertEqual(self._encode(self.VALUE['nested'], pretty=True),
+                         json.dumps(self.VALUE['nested'], sort_keys=True,
+                                    indent=4, separators=(',', ': ')))
+
+    def test_dates(self):
+        value = {'busy_days': {date(2017, 1, 4): 10, date(2017, 1, 3): 20},
+                 'date': date(2017, 6, 9)}
+        self.assertEqual(
+            self._encode(value),
+            '{"busy_days": {"2017-01-04": 10, "2017-01-03": 20}, '
+            '"date": "2017-06-09"}')
+        self.assertEqual(json.loads(self._encode(value, pretty=True)), {
+            'busy_days': {'2017-01-03': 20, '2017-01-04': 10},
+            'date': '2017-06-09'})
+
+    def test_unsupported(self):
+        with self.assertRaises(TypeError):
+            self._encode({'a': object()})
+        with self.assertRaises(TypeError):
+            self._encode({(1, 2): 'tuple key'})
+
+
+class TestDumps(unittest.TestCase):
+    """
+    Checks that whole documents encode the same as they do a piece at a time.
+    """
+
+    def test_same_as_iter_json(self):
+        value = OrderedDict([
+            ('days', OrderedDict([(date(2017, 1, 4), {'volume': 10}),
+                                  (date(2017, 1, 3), {'volume': 20})])),
+            ('date', date(2017, 6, 9)),
+            ('rows', [[date(2017, 1, 3), 1.5], ({'x': date(2017, 1, 2)},)]),
+        ])
+        for pretty in (False, True):
+            self.assertEqual(dumps(value, pretty),
+                             ''.join(iter_json(value, pretty)))
+
+    def test_unsupported(self):
+        with self.assertRaises(TypeError):
+            dumps({'a': object()})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import time
+import unittest
+from datetime import date
+
+from stock_stats.client import StockClient
+from stock_stats.profiling import Profiler
+from tests.shared import MockHttpClient, get_data
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_nested_phases(self):
+        profiler = Profiler()
+        with profiler.symbol('GOOGL'):
+            with profiler.phase(Profiler.DECODE) as counters:
+                counters['rows'] = 10
+                profiler.record(Profiler.NETWORK, 5.0, bytes=100, retries=1)
+                with profiler.phase(Profiler.CONVERT):
+                    time.sleep(0.01)
+        with profiler.phase(Profiler.OUTPUT):
+            pass
+
+        report = profiler.report()
+        googl = report['symbols']['GOOGL']
+        self.assertEqual(googl[Profiler.NETWORK]['bytes'], 100)
+        self.assertEqual(googl[Profiler.NETWORK]['retries'], 1)
+        self.assertEqual(googl[Profiler.DECODE]['rows'], 10)
+        self.assertGreaterEqual(googl[Profiler.CONVERT]['seconds'], 0.01)
+        # Decoding is charged neither for the network, nor for conversion
+        self.assertLess(googl[Profiler.DECODE]['seconds'], 0.01)
+        self.assertNotIn(Profiler.OUTPUT, googl)
+        self.assertEqual(report['totals'][Profiler.OUTPUT]['calls'], 1)
+        self.assertEqual(report['totals'][Profiler.NETWORK]['seconds'], 5.0)
+
+    def test_hooks(self):
+        measurements = []
+        profiler = Profiler(hooks=[measurements.append])
+        with profiler.symbol('MSFT'):
+            profiler.record(Profiler.NETWORK, 1.5, bytes=7)
+        self.assertEqual(measurements, [{'symbol': 'MSFT', 'phase': 'network',
+                                         'seconds': 1.5, 'bytes': 7}])
+
+    def test_disabled(self):
+        measurements = []
+        profiler = Profiler(enabled=False, hooks=[measurements.append])
+        with profiler.symbol('MSFT'), profiler.phase(Profiler.DECODE):
+            profiler.record(Profiler.NETWORK, 1.5)
+        self.assertEqual(profiler.report(), {'symbols': {}, 'totals': {}})
+        self.assertEqual(measurements, [])
+
+    def test_client_phases(self):
+        http_client = MockHttpClient()
+        url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
+              '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01'
+        http_client.responses[url] = (get_data('averages1.json'), {})
+        profiler = Profiler()
+        client = StockClient(http_client, "KEY", "http://example.com/",
+                             profiler=profiler)
+        series = client.get_standard_timeseries('GOOGL', date(2017, 1, 1),
+                                                date(2017, 6, 30))
+        phases = profiler.report()['symbols']['GOOGL']
+        self.assertEqual(phases[Profiler.DECODE]['rows'], len(series))
+        self.assertEqual(phases[Profiler.DECODE]['calls'], 1)
+        self.assertEqual(phases[Profiler.CONVERT]['rows'], len(series))
+
+    def test_listing_phase(self):
+        http_client = MockHttpClient()
+        url = 'http://example.com/v3/databases/WIKI/codes?api_key=KEY'
+        http_client.responses[url] = (
+            get_data('symbols.zip'),
+            {StockClient.HEADER_CONTENT_TYPE: StockClient.CONTENT_TYPE_ZIP})
+        profiler = Profiler()
+        client = StockClient(http_client, "KEY", "http://example.com/",
+                             profiler=profiler)
+        symbols = client.get_symbols()
+        decode = profiler.report()['totals'][Profiler.DECODE]
+        self.assertEqual(decode['rows'], len(symbols))
+
+
+if __name__ == '__main__':
+    unittest.main()
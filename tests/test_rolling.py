@@ -0,0 +1,103 @@
+import random
+import statistics
+import unittest
+from datetime import date
+
+from stock_stats import rolling
+from stock_stats.client import StockClient
+from tests.shared import MockHttpClient, get_data
+
+
+class TestRolling(unittest.TestCase):
+    """
+    Compares the incremental window calculations against recomputing every
+    window from scratch.
+    """
+
+    def setUp(self):
+        generator = random.Random(42)
+        self.values = [generator.uniform(100, 1000) for _ in range(300)]
+
+    def _windows(self, window: int):
+        for i in range(len(self.values)):
+            if i + 1 < window:
+                yield None
+            else:
+                yield self.values[i + 1 - window:i + 1]
+
+    def _check(self, actual, window, reduce):
+        expected = [None if w is None else reduce(w)
+                    for w in self._windows(window)]
+        actual = list(actual)
+        self.assertEqual(len(actual), len(expected))
+        for a, e in zip(actual, expected):
+            if e is None:
+                self.assertIsNone(a)
+            else:
+                self.assertAlmostEqual(a, e, places=6)
+
+    def test_mean(self):
+        for window in (1, 5, 20, 200):
+            self._check(rolling.rolling_mean(self.values, window), window,
+                        statistics.mean)
+
+    def test_variance(self):
+        for window in (1, 5, 20, 200):
+            self._check(rolling.rolling_variance(self.values, window), window,
+                        statistics.pvariance)
+
+    def test_extremes(self):
+        for window in (1, 5, 20, 200):
+            self._check(rolling.rolling_max(self.values, window), window, max)
+            self._check(rolling.rolling_min(self.values, window), window, min)
+
+    def test_trailing_mean(self):
+        means = list(rolling.trailing_mean([1.0, 2.0, 3.0, 4.0], 2))
+        self.assertEqual(means, [None, None, 1.5, 2.5])
+
+    def test_chronological(self):
+        self.assertEqual(list(rolling.chronological([3, 2, 1])), [2, 1, 0])
+        self.assertEqual(list(rolling.chronological([1, 2, 3])), [0, 1, 2])
+
+
+class TestClientRolling(unittest.TestCase):
+    """
+    Runs the rolling-window analyses on the canned API response.
+    """
+
+    def setUp(self):
+        http_client = MockHttpClient()
+        self.client = StockClient(http_client, "KEY", "http://example.com/")
+        url = 'http://example.com/v3/datasets/WIKI/GOOGL/data.json' \
+              '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01'
+        http_client.responses[url] = (get_data('averages1.json'), {})
+        self.series = self.client.get_standard_timeseries(
+            'GOOGL', date(2017, 1, 1), date(2017, 6, 30))
+
+    def test_rolling_stats(self):
+        stats = self.client.get_rolling_stats(self.series, False, 5)
+        self.assertEqual(len(stats), len(self.series) - 4)
+        days = list(stats.keys())
+        self.assertEqual(days, sorted(days))
+        self.assertEqual(days[0], self.series.date(len(self.series) - 5))
+
+        closes = self.series.column('Close')
+        newest = stats[self.series.date(0)]
+        self.assertAlmostEqual(newest['average_close'],
+                               statistics.mean(closes[0:5]))
+        self.assertAlmostEqual(newest['range'],
+                               max(self.series.column('High')[0:5]) -
+                               min(self.series.column('Low')[0:5]))
+
+    def test_trailing_busy_days(self):
+        data = self.client.get_busy_days(self.series, False, trailing_window=10)
+        volumes = self.series.column('Adj. Volume')
+        expected = [
+            self.series.date(i) for i in range(len(self.series) - 10)
+            if volumes[i] > statistics.mean(volumes[i + 1:i + 11]) * 1.10
+        ]
+        self.assertEqual(list(data['busy_days'].keys()), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from io import BytesIO
+
+from stock_stats.http import HttpException, HttpNotModified
+from stock_stats.profiling import Profiler
+from stock_stats.scheduler import RequestScheduler, TokenBucket
+
+
+def _connection_reset() -> HttpException:
+    error = HttpException("Connection reset")
+    error.__cause__ = ConnectionResetError()
+    return error
+
+
+class _FlakyHttpClient(object):
+    """
+    Fails with the given errors in turn, then answers every request.
+    """
+
+    def __init__(self, errors=(), delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self.profiler = Profiler()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stream(self, url, extra_params=None, headers=None):
+        with self._lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+            self.in_flight += 1
+            self.most_in_flight = max(self.most_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if error is not None:
+                raise error
+            yield BytesIO(b'body'), {}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def get(self, url, extra_params=None):
+        with self.stream(url, extra_params) as (body, headers):
+            return body.read(), headers
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2.0, burst=3, clock=lambda: now[0])
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 0])
+        # Further requests are spaced half a second apart
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+        now[0] = 10.0
+        self.assertEqual(bucket.reserve(), 0)
+
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def _scheduler(self, http_client, **kwargs):
+        kwargs.setdefault('backoff', 0.001)
+        return RequestScheduler(http_client, rate=1000.0, **kwargs)
+
+    def test_retries_overload(self):
+        http_client = _FlakyHttpClient([HttpException(status=503),
+                                        HttpException(status=429),
+                                        _connection_reset()])
+        scheduler = self._scheduler(http_client, max_concurrency=8)
+        self.assertEqual(scheduler.get('http://example.com/')[0], b'body')
+        self.assertEqual(http_client.calls, 4)
+        # Halved three times down to one, then grown by the success
+        self.assertEqual(scheduler.concurrency, 2)
+
+        throttle = http_client.profiler.report()['totals'][Profiler.THROTTLE]
+        self.assertEqual(throttle['retries'], 3)
+
+    def test_concurrency_recovers(self):
+        http_client = _FlakyHttpClient([HttpException(status=503)])
+        scheduler = self._scheduler(http_client, max_concurrency=4)
+        scheduler.get('http://example.com/')
+        self.assertEqual(scheduler.concurrency, 2)
+        for _ in range(10):
+            scheduler.get('http://example.com/')
+        self.assertEqual(scheduler.concurrency, 4)
+
+    def test_gives_up(self):
+        http_client = _FlakyHttpClient([HttpException(status=500)] * 10)
+        scheduler = self._scheduler(http_client, max_retries=2)
+        with self.assertRaises(HttpException):
+            scheduler.get('http://example.com/')
+        self.assertEqual(http_client.calls, 3)
+
+    def test_client_errors_not_retried(self):
+        for error in [HttpException(status=404),
+                      HttpNotModified(status=304),
+                      HttpException("Unsupported URL: ftp://example.com/")]:
+            http_client = _FlakyHttpClient([error])
+            scheduler = self._scheduler(http_client)
+            with self.assertRaises(type(error)):
+                scheduler.get('http://example.com/')
+            self.assertEqual(http_client.calls, 1)
+
+    def test_retry_after(self):
+        http_client = _FlakyHttpClient([
+            HttpException(status=429, headers={'Retry-After': '0'})])
+        scheduler = self._scheduler(http_client)
+        scheduler.get('http://example.com/')
+        self.assertEqual(http_client.calls, 2)
+
+        # Rather than stall for an hour, give up
+        http_client = _FlakyHttpClient([
+            HttpException(status=429, headers={'retry-after': '3600'})])
+        scheduler = self._scheduler(http_client)
+        with self.assertRaises(HttpException):
+            scheduler.get('http://example.com/')
+        self.assertEqual(http_client.calls, 1)
+
+        self.assertAlmostEqual(RequestScheduler._retry_after(
+            {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}), 0)
+        self.assertIsNone(RequestScheduler._retry_after({}))
+
+    def test_no_retry_once_reading(self):
+        http_client = _FlakyHttpClient()
+        scheduler = self._scheduler(http_client)
+        with self.assertRaises(HttpException):
+            with scheduler.stream('http://example.com/') as (body, headers):
+                raise HttpException(status=503)
+        self.assertEqual(http_client.calls, 1)
+
+    def test_caller_failure_is_neutral(self):
+        http_client = _FlakyHttpClient([HttpException(status=503)])
+        scheduler = self._scheduler(http_client, max_concurrency=4)
+        scheduler.get('http://example.com/')
+        self.assertEqual(scheduler.concurrency, 2)
+        for _ in range(10):
+            with self.assertRaises(ValueError):
+                with scheduler.stream('http://example.com/'):
+                    raise ValueError("Malformed body")
+        self.assertEqual(scheduler.concurrency, 2)
+        self.assertEqual(http_client.in_flight, 0)
+
+    def test_max_concurrency(self):
+        http_client = _FlakyHttpClient(delay=0.02)
+        scheduler = self._scheduler(http_client, max_concurrency=2)
+        threads = [threading.Thread(target=scheduler.get,
+                                    args=('http://example.com/',))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(http_client.calls, 6)
+        self.assertEqual(http_client.most_in_flight, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
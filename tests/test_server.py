@@ -0,0 +1,112 @@
+import http.client
+import json
+import threading
+import unittest
+from datetime import date
+
+from stock_stats.cache import MemoryCache
+from stock_stats.client import StockClient
+from stock_stats.command_line import compute_busy_days, compute_report
+from stock_stats.jsonout import iter_json
+from stock_stats.server import QueryServer
+from tests.shared import MockHttpClient, captured_output, get_data
+
+
+class TestQueryServer(unittest.TestCase):
+    """
+    Sends queries to a local QueryServer whose client answers from canned
+    HTTP responses.
+    """
+    SYMBOLS = ["GOOGL", "MSFT"]
+
+    def setUp(self):
+        self.http_client = MockHttpClient()
+        for symbol in self.SYMBOLS:
+            url = 'http://example.com/v3/datasets/WIKI/%s/data.json' \
+                  '?api_key=KEY&end_date=2017-06-30&start_date=2017-01-01' \
+                  % symbol
+            self.http_client.responses[url] = (get_data('averages1.json'), {})
+        self.client = StockClient(self.http_client, "KEY",
+                                  "http://example.com/",
+                                  memory=MemoryCache())
+
+        self.server = QueryServer(('127.0.0.1', 0), self.client, jobs=2)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.05,), daemon=True)
+        self.thread.start()
+        self.connection = http.client.HTTPConnection(
+            '127.0.0.1', self.server.server_address[1])
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.http_client.cleanup()
+
+    def _query(self, action: str, params) -> tuple:
+        self.connection.request('POST', '/' + action,
+                                body=json.dumps(params).encode('utf-8'))
+        response = self.connection.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_same_as_command_line(self):
+        params = {'symbols': self.SYMBOLS, 'start_month': '2017-01',
+                  'end_month': '2017-06', 'trailing_window': 10}
+        status, result = self._query('busy-days', params)
+        self.assertEqual(status, 200)
+        expected = compute_busy_days(self.client, self.SYMBOLS,
+                                     date(2017, 1, 1), date(2017, 6, 30),
+                                     trailing_window=10)
+        self.assertEqual(result, json.loads(''.join(iter_json(expected))))
+
+        status, result = self._query('report', params={
+            'symbols': self.SYMBOLS, 'start_month': '2017-01',
+            'end_month': '2017-06', 'adjusted': True})
+        self.assertEqual(status, 200)
+        expected = compute_report(self.client, self.SYMBOLS,
+                                  date(2017, 1, 1), date(2017, 6, 30), True)
+        self.assertEqual(result, json.loads(''.join(iter_json(expected))))
+
+    def test_series_stay_warm(self):
+        params = {'symbols': self.SYMBOLS, 'start_month': '2017-01',
+                  'end_month': '2017-06'}
+        for _ in range(3):
+            status, result = self._query('month-averages', params)
+            self.assertEqual(status, 200)
+        self.assertEqual(len(self.http_client.requests), len(self.SYMBOLS))
+
+    def test_bad_queries(self):
+        status, result = self._query('month-averages', {
+            'symbols': self.SYMBOLS, 'start_month': '2017-13',
+            'end_month': '2017-06'})
+        self.assertEqual(status, 400)
+        self.assertIn('start_month', result['error'])
+
+        status, result = self._query('rolling', {
+            'symbols': self.SYMBOLS, 'start_month': '2017-01',
+            'end_month': '2017-06', 'window': 0})
+        self.assertEqual(status, 400)
+
+        status, result = self._query('no-such-thing', {})
+        self.assertEqual(status, 404)
+
+    def test_unexpected_error(self):
+        def run_query(action, params):
+            raise ZeroDivisionError("division by zero")
+
+        self.server.run_query = run_query
+        with captured_output():
+            status, result = self._query('busy-days', {})
+        self.assertEqual(status, 500)
+        self.assertIn('division by zero', result['error'])
+
+        # The connection is still good for the next query
+        del self.server.run_query
+        status, result = self._query('month-averages', {
+            'symbols': self.SYMBOLS, 'start_month': '2017-01',
+            'end_month': '2017-06'})
+        self.assertEqual(status, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
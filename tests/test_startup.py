@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "-X importtime needs Python 3.7")
+class TestStartup(unittest.TestCase):
+    """
+    Runs a fresh interpreter with -X importtime, to keep the command-line
+    tool quick to start when scripts call it over and over.
+    """
+    # Generous, so that slow machines pass. Where this was written, importing
+    # everything eagerly took about 160ms, and lazily about 65ms.
+    BUDGET_MICROSECONDS = 120000
+
+    # Only some sub-commands need these, and they take a while to import
+    HEAVY_MODULES = {
+        'dateutil', 'sqlite3', 'csv', 'zipfile', 'http.client', 'tempfile',
+        'concurrent.futures.thread', 'multiprocessing',
+    }
+
+    # Nor does building the parser need the caches or price stores
+    STORAGE_MODULES = {
+        'stock_stats.binary', 'stock_stats.cache', 'stock_stats.store',
+    }
+
+    def _import_times(self, script: str) -> dict:
+        """
+        :return: Cumulative import time of each module, in microseconds
+        """
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=root, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            check=True).stderr.decode('utf-8')
+        times = {}
+        for line in output.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative)
+        return times
+
+    def test_parser(self):
+        times = self._import_times(
+            "from stock_stats.command_line import create_parser\n"
+            "create_parser().parse_args(['list-symbols', '--key', 'KEY'])")
+        self.assertFalse(self.HEAVY_MODULES & set(times),
+                         "Imported eagerly")
+        self.assertFalse(self.STORAGE_MODULES & set(times),
+                         "Imported eagerly")
+
+        # Best of a few runs, since any one of them may be unlucky
+        best = min(
+            self._import_times("import stock_stats.command_line")
+            ['stock_stats.command_line'] for _ in range(3))
+        self.assertLess(best, self.BUDGET_MICROSECONDS)
+
+    def test_binary_source(self):
+        # Reading binary price files needs neither SQLite nor the network
+        with tempfile.TemporaryDirectory() as directory:
+            times = self._import_times(
+                "from stock_stats.command_line import create_parser, "
+                "_create_client\n"
+                "_create_client(create_parser().parse_args(["
+                "'report', '--key', 'KEY', '--source', 'binary', "
+                "'--binary-dir', %r, '2017-01', '2017-06', 'GOOGL']))"
+                % directory)
+        self.assertFalse(self.HEAVY_MODULES & set(times),
+                         "Imported eagerly")
+
+
+if __name__ == '__main__':
+    unittest.main()
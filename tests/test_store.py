@@ -0,0 +1,98 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from zipfile import ZipFile
+
+from stock_stats.client import StockClient, StockException
+from stock_stats.store import LocalStore, StoreException
+from stock_stats.timeseries import Timeseries
+from tests.shared import MockHttpClient, get_data
+
+
+class TestLocalStore(unittest.TestCase):
+    """
+    Loads bulk exports built from the canned API response, and checks that
+    analyses of the local data match analyses of the downloaded data.
+    """
+    HEADER = ['ticker', 'date', 'open', 'high', 'low', 'close', 'volume',
+              'ex-dividend', 'split_ratio', 'adj_open', 'adj_high', 'adj_low',
+              'adj_close', 'adj_volume']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = LocalStore(os.path.join(self.directory, 'prices.db'))
+        dataset = json.loads(get_data('averages1.json'))['dataset_data']
+        self.expected = Timeseries.from_dataset(dataset)
+        self.rows = [['GOOGL'] + row for row in dataset['data']]
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def _write_csv(self, name: str, header: bool) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, 'wt', newline='') as fh:
+            writer = csv.writer(fh)
+            if header:
+                writer.writerow(self.HEADER)
+            writer.writerows(self.rows)
+        return path
+
+    def test_ingest_csv(self):
+        path = self._write_csv('export.csv', header=True)
+        self.assertEqual(self.store.ingest(path, chunk_rows=7), len(self.rows))
+        self.assertEqual(self.store.symbol_count(), 1)
+
+        series = self.store.get_timeseries('GOOGL', date(2017, 1, 1),
+                                           date(2017, 6, 30))
+        self.assertEqual(series.column_names, self.expected.column_names)
+        self.assertEqual(series.ordinals, self.expected.ordinals)
+        self.assertEqual(series.columns, self.expected.columns)
+
+    def test_ingest_zip_without_header(self):
+        csv_path = self._write_csv('export.csv', header=False)
+        zip_path = os.path.join(self.directory, 'export.zip')
+        with ZipFile(zip_path, 'w') as archive:
+            archive.write(csv_path, 'WIKI_PRICES.csv')
+        self.assertEqual(self.store.ingest(zip_path), len(self.rows))
+
+        series = self.store.get_timeseries('GOOGL', date(2017, 3, 1),
+                                           date(2017, 3, 31))
+        self.assertEqual(series.date(0), date(2017, 3, 31))
+        self.assertEqual(series.date(len(series) - 1), date(2017, 3, 1))
+
+    def test_reingest_replaces(self):
+        path = self._write_csv('export.csv', header=True)
+        self.store.ingest(path)
+        self.store.ingest(path)
+        series = self.store.get_timeseries('GOOGL', date(2017, 1, 1),
+                                           date(2017, 6, 30))
+        self.assertEqual(len(series), len(self.rows))
+
+    def test_bad_export(self):
+        path = os.path.join(self.directory, 'bad.csv')
+        with open(path, 'wt') as fh:
+            fh.write("GOOGL,2017-01-03,abc\n")
+        with self.assertRaises(StoreException):
+            self.store.ingest(path)
+
+    def test_client_uses_store(self):
+        self.store.ingest(self._write_csv('export.csv', header=True))
+        http_client = MockHttpClient()  # No canned responses at all
+        client = StockClient(http_client, "KEY", store=self.store)
+        series = client.get_standard_timeseries('GOOGL', date(2017, 1, 1),
+                                                date(2017, 6, 30))
+        self.assertEqual(client.get_losing_day_count(series, False), 52)
+        self.assertEqual(client.get_top_variance_day(series, False)['date'],
+                         date(2017, 6, 9))
+        with self.assertRaises(StockException):
+            client.get_standard_timeseries('MSFT', date(2017, 1, 1),
+                                           date(2017, 6, 30))
+
+
+if __name__ == '__main__':
+    unittest.main()
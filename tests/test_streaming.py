@@ -0,0 +1,60 @@
+import json
+import unittest
+from io import BytesIO
+
+from stock_stats.streaming import decode_dataset
+from stock_stats.timeseries import Timeseries
+from tests.shared import get_data
+
+
+class TestDecodeDataset(unittest.TestCase):
+    """
+    Checks that incremental decoding gives the same series as parsing the
+    whole response at once, however the bytes happen to be split up.
+    """
+
+    def _assertSameSeries(self, expected: Timeseries, actual: Timeseries):
+        self.assertEqual(expected.column_names, actual.column_names)
+        self.assertEqual(expected.ordinals, actual.ordinals)
+        self.assertEqual(expected.columns, actual.columns)
+
+    def test_matches_full_parse(self):
+        raw = get_data('averages1.json')
+        expected = Timeseries.from_dataset(json.loads(raw)['dataset_data'])
+        for chunk_size in (1, 7, 4096, len(raw)):
+            actual = decode_dataset(BytesIO(raw), chunk_size=chunk_size)
+            self._assertSameSeries(expected, actual)
+
+    def test_rows_before_columns(self):
+        raw = b'{"other": {"a": [1, 2]}, "dataset_data": {' \
+              b'"data": [["2017-01-04", 1.5, 12345.25], ' \
+              b'["2017-01-03", 2, 6]], ' \
+              b'"column_names": ["Date", "Open", "Volume"], "limit": null}}'
+        series = decode_dataset(BytesIO(raw), chunk_size=3)
+        self.assertEqual(series.column_names, ['Open', 'Volume'])
+        self.assertEqual(list(series.column('Volume')), [12345.25, 6.0])
+
+    def test_multibyte_split(self):
+        raw = '{"dataset_data": {"name": "café ☃", ' \
+              '"column_names": ["Date", "Open"], ' \
+              '"data": [["2017-01-03", 1.0]]}}'.encode('utf-8')
+        series = decode_dataset(BytesIO(raw), chunk_size=1)
+        self.assertEqual(len(series), 1)
+
+    def test_empty_data(self):
+        raw = b'{"dataset_data": {"column_names": ["Date", "Open"], ' \
+              b'"data": []}}'
+        self.assertEqual(len(decode_dataset(BytesIO(raw))), 0)
+
+    def test_truncated(self):
+        raw = get_data('averages1.json')[:-200]
+        with self.assertRaises(ValueError):
+            decode_dataset(BytesIO(raw), chunk_size=100)
+
+    def test_no_dataset(self):
+        with self.assertRaises(ValueError):
+            decode_dataset(BytesIO(b'{"quandl_error": {"code": "X"}}'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import math
+import unittest
+from datetime import date, timedelta
+
+from stock_stats.timeseries import Timeseries, parse_ordinal
+
+
+class TestTimeseries(unittest.TestCase):
+    """
+    Checks the columnar container that replaced per-day dictionaries.
+    """
+    DATASET = {
+        'column_names': ['Date', 'Open', 'Close'],
+        'data': [
+            ['2017-06-30', 943.99, 929.68],
+            ['2017-06-29', 951.35, None],
+        ]
+    }
+
+    def test_from_dataset(self):
+        series = Timeseries.from_dataset(self.DATASET)
+        self.assertEqual(len(series), 2)
+        self.assertEqual(series.column_names, ['Open', 'Close'])
+        self.assertEqual(list(series.column('Open')), [943.99, 951.35])
+        self.assertEqual(series.date(0), date(2017, 6, 30))
+        self.assertEqual(series.ordinals[1], date(2017, 6, 29).toordinal())
+
+    def test_null_values(self):
+        series = Timeseries.from_dataset(self.DATASET)
+        self.assertTrue(math.isnan(series.column('Close')[1]))
+
+    def test_wrong_width(self):
+        series = Timeseries(['Open', 'Close'])
+        with self.assertRaises(ValueError):
+            series.append(date(2017, 1, 3).toordinal(), [1.0])
+
+    def test_unknown_column(self):
+        series = Timeseries.from_dataset(self.DATASET)
+        with self.assertRaises(KeyError):
+            series.column('Volume')
+
+
+class TestParseOrdinal(unittest.TestCase):
+
+    def test_days(self):
+        day = date(1999, 12, 1)
+        for _ in range(800):
+            self.assertEqual(parse_ordinal(day.isoformat()), day.toordinal())
+            day += timedelta(days=1)
+
+    def test_invalid(self):
+        # Including days past the end of months already seen
+        parse_ordinal('2017-02-01')
+        for text in ['2017-02-29', '2017-02-00', '2017-13-01', '2017-06',
+                     'June 30']:
+            with self.assertRaises(ValueError, msg=text):
+                parse_ordinal(text)
+
+
+if __name__ == '__main__':
+    unittest.main()